@@ -88,6 +88,11 @@ LOCH_S3_CANVAS_DATA_PATH_CURRENT_TERM = 'canvas/path/to/current/term'
 CYCLICAL_API_IMPORT_BATCH_SIZE = 5000
 HIST_ENR_REGISTRATIONS_IMPORT_BATCH_SIZE = 20000
 
+# Redshift, RDS and LRS connections are pooled per database. Up to DB_POOL_MAX_SIZE idle connections are kept for
+# reuse, and closed after DB_POOL_MAX_IDLE_SECONDS unused.
+DB_POOL_MAX_IDLE_SECONDS = 300
+DB_POOL_MAX_SIZE = 5
+
 DEGREE_PROGRESS_API_URL = 'https://secreturl.berkeley.edu/PSFT_CS'
 DEGREE_PROGRESS_API_USERNAME = 'secretuser'
 DEGREE_PROGRESS_API_PASSWORD = 'secretpassword'
@@ -160,6 +165,18 @@ LOCH_S3_PROTECTED_BUCKET = 'protected_bucket_name'
 LOCH_S3_PUBLIC_BUCKET = 'public_bucket_name'
 LOCH_S3_REGION = 'us-west-2'
 
+# Most S3 object copies run at once by s3.copy_many, and attempts made at each copy on transient errors.
+LOCH_S3_COPY_ATTEMPTS = 3
+LOCH_S3_COPY_MAX_THREADS = 10
+
+# Files synced from a URL by s3.upload_from_url_ranged are fetched by HTTP Range requests in parts of this many bytes
+# (no fewer than 5 MB), each uploaded as one part of a multipart upload, with up to LOCH_S3_RANGED_SYNC_MAX_THREADS
+# parts in flight. Each part is attempted up to LOCH_S3_RANGED_SYNC_ATTEMPTS times. A part size of 0 disables ranged
+# requests.
+LOCH_S3_RANGED_SYNC_ATTEMPTS = 3
+LOCH_S3_RANGED_SYNC_MAX_THREADS = 4
+LOCH_S3_RANGED_SYNC_PART_SIZE = 64 * 1024 * 1024
+
 LOCH_S3_CANVAS_DATA_PATH = 'canvas-data'
 LOCH_S3_CANVAS_DATA_PATH_DAILY = 'canvas/path/to/daily'
 LOCH_S3_CANVAS_DATA_PATH_HISTORICAL = 'canvas/path/to/historical'
@@ -185,6 +202,22 @@ LOGGING_LOCATION = 'nessie.log'
 LOGGING_LEVEL = logging.DEBUG
 LOGGING_PROPAGATION_LEVEL = logging.INFO
 
+# Longest wait, in seconds, for a LISTEN/NOTIFY message on the merged enrollment term job queue before the queue is
+# polled regardless.
+MERGED_ENROLLMENT_TERM_NOTIFY_TIMEOUT = 60
+
+# Number of worker processes over which GenerateMergedStudentFeeds spreads CPU-bound profile parsing. A value of 1
+# keeps all parsing in the job's own thread.
+MERGED_PROFILE_PROCESSES = 1
+
+# If true, a full refresh of RDS student indexes compares per-SID row hashes with Redshift and sends only changed rows
+# over dblink. If false, RDS tables are truncated and reloaded.
+MERGED_RDS_INDEX_DELTA_SYNC = True
+
+# Seconds for which background jobs share the results of student population queries, such as the list of all SIDs.
+# Jobs that rebuild population schemas invalidate cached results on completion. A value of 0 disables the cache.
+QUERY_CACHE_TTL_SECONDS = 3600
+
 # These RDS schemas are copied from the Redshift schemas below and contain a subset of index tables.
 RDS_SCHEMA_ADVISING_NOTES = 'boac_advising_notes'
 RDS_SCHEMA_ADVISOR = 'boac_advisor'
@@ -206,6 +239,21 @@ REDSHIFT_USER = 'username'
 
 REDSHIFT_IAM_ROLE = 'iam role'
 
+# Number of rows retrieved per round trip when large query results are streamed from a server-side cursor.
+REDSHIFT_FETCH_SIZE = 1000
+
+# Most connections on which independent statements of a DDL script are run at once. A value of 1 runs all statements
+# in order on a single connection.
+REDSHIFT_DDL_MAX_CONCURRENCY = 4
+
+# Number of gzipped files into which staged data is split for COPY by manifest, so that slices load in parallel. If
+# None, one file per slice, as counted in STV_SLICES.
+REDSHIFT_COPY_FILE_COUNT = None
+
+# SQL dialect spoken by the Redshift connection, where statements differ between Redshift and Postgres: 'redshift' or
+# 'postgres'.
+REDSHIFT_SQL_DIALECT = 'redshift'
+
 # BOA limited access credentials to nessie rds and redshift
 RDS_APP_BOA_USER = 'boa rds username'
 REDSHIFT_APP_BOA_USER = 'boa redshift username'
@@ -241,6 +289,18 @@ REDSHIFT_SCHEMA_SIS = 'External SIS schema name'
 REDSHIFT_SCHEMA_SIS_ADVISING_NOTES = 'External SIS Advising Notes schema name'
 REDSHIFT_SCHEMA_UNDERGRADS_EXTERNAL = 'External Undergrads schema name'
 
+# SID lists longer than this are shipped to RDS or Redshift in a temporary table, indexed in RDS and sorted by SID in
+# Redshift, rather than inline as an array literal whose size burdens statement parsing and planning.
+SID_ARRAY_MAX_LENGTH = 1000
+
+# Destination for generated staging rows prior to COPY into Redshift: 'file' spools rows to a local temporary file
+# before upload; 's3' streams them directly to S3 by multipart upload.
+STAGING_ROW_SINK = 'file'
+
+# With STAGING_ROW_SINK = 's3', uncompressed bytes of rows streamed to each staging part before it is closed and the
+# next begun. One part per table is open at a time.
+STAGING_S3_PART_SIZE = 32 * 1024 * 1024
+
 STUDENT_API_ID = 'secretid'
 STUDENT_API_KEY = 'secretkey'
 STUDENT_API_URL = 'https://secreturl.berkeley.edu/sis/v2/students'
@@ -251,6 +311,10 @@ STUDENT_API_MAX_THREADS = 5
 STUDENT_API_PWD = None
 STUDENT_API_USER = None
 
+# If true, full refreshes of student schema tables from staging build a shadow table by ALTER TABLE APPEND and swap it
+# in by rename. If false, destination tables are truncated and rows copied from staging by INSERT.
+STUDENT_SCHEMA_TABLE_SWAP = True
+
 TERMS_API_ID = 'secretid'
 TERMS_API_KEY = 'secretkey'
 TERMS_API_URL = 'https://secreturl.berkeley.edu/terms'
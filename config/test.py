@@ -34,6 +34,9 @@ EARLIEST_LEGACY_TERM = 'Summer 2016'
 LOCH_S3_BUCKET = 'mock-bucket'
 LOCH_S3_PUBLIC_BUCKET = 'mock-bucket'
 
+# Test data changes between tests, so query results are not cached.
+QUERY_CACHE_TTL_SECONDS = 0
+
 RDS_SCHEMA_ASC = 'asc_test'
 RDS_SCHEMA_COE = 'coe_test'
 RDS_SCHEMA_E_I = 'e_i_test'
@@ -47,6 +50,10 @@ REDSHIFT_PASSWORD = 'nessie'
 REDSHIFT_PORT = 5432
 REDSHIFT_USER = 'nessie'
 
+# The Postgres stand-in for Redshift has no STV_SLICES.
+REDSHIFT_COPY_FILE_COUNT = 2
+REDSHIFT_SQL_DIALECT = 'postgres'
+
 RDS_APP_BOA_USER = 'nessie'
 REDSHIFT_APP_BOA_USER = 'nessie'
 
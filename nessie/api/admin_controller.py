@@ -29,7 +29,9 @@ import dateutil.parser
 from flask import current_app as app, request
 from nessie.api.auth_helper import auth_required
 from nessie.lib import metadata
+from nessie.lib.db import get_connection_pool_stats
 from nessie.lib.http import tolerant_jsonify
+from nessie.lib.query_metrics import get_query_metrics, reset_query_metrics
 
 
 @app.route('/api/admin/runnable_jobs')
@@ -48,6 +50,20 @@ def console_available_jobs():
     return tolerant_jsonify(job_api_endpoints)
 
 
+@app.route('/api/admin/connection_pools')
+@auth_required
+def connection_pools():
+    return tolerant_jsonify(get_connection_pool_stats())
+
+
+@app.route('/api/admin/query_metrics', methods=['GET', 'DELETE'])
+@auth_required
+def query_metrics():
+    if request.method == 'DELETE':
+        reset_query_metrics()
+    return tolerant_jsonify(get_query_metrics())
+
+
 @app.route('/api/admin/background_job_status', methods=['POST'])
 @auth_required
 def background_job_status():
@@ -63,6 +79,7 @@ def background_job_status():
             'status': row['status'],
             'instanceId': row['instance_id'],
             'details': row['details'],
+            'phases': row.get('phases'),
             'started': row['created_at'].strftime(date_format),
             'finished': row['updated_at'].strftime(date_format),
         }
@@ -216,7 +216,11 @@ def generate_merged_hist_enr_feeds():
 @app.route('/api/job/generate_merged_student_feeds/<term_id>', methods=['POST'])
 @auth_required
 def generate_merged_student_feeds(term_id):
-    job_started = GenerateMergedStudentFeeds(term_id=term_id).run_async()
+    args = get_json_args(request)
+    load_mode = (args and args.get('load_mode')) or 'changed'
+    if load_mode not in ['all', 'changed']:
+        raise BadRequestError('Unrecognized mode for merged student feeds generation.')
+    job_started = GenerateMergedStudentFeeds(term_id=term_id, load_mode=load_mode).run_async()
     return respond_with_status(job_started)
 
 
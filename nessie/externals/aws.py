@@ -0,0 +1,139 @@
+"""
+Copyright ©2019. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from functools import partial
+import threading
+
+import boto3
+from botocore.credentials import CredentialProvider, CredentialResolver, RefreshableCredentials
+from botocore.session import get_session as get_botocore_session
+from flask import current_app as app
+
+"""Shared credentials and clients for AWS services, under the app's assumed role."""
+
+CREDENTIALS_DURATION_SECONDS = 900
+
+# Assumed-role credentials renew themselves once within this margin of expiry, and block requests until renewed once
+# within half of it. Clients and sessions share the credentials, and so never hold expired ones.
+CREDENTIALS_REFRESH_MARGIN_SECONDS = 300
+
+_lock = threading.Lock()
+_credentials = None
+_session = None
+_clients = {}
+
+
+class SharedCredentialProvider(CredentialProvider):
+    """Credential provider that hands a botocore session the app's shared, self-renewing credentials."""
+
+    METHOD = 'shared-assume-role'
+
+    def __init__(self, credentials):
+        super().__init__()
+        self.credentials = credentials
+
+    def load(self):
+        return self.credentials
+
+
+def clear_cache():
+    global _credentials, _session
+    with _lock:
+        _credentials = None
+        _session = None
+        _clients.clear()
+
+
+def get_client(service_name, **kwargs):
+    """Return a client for the service, shared between threads, whose credentials are renewed as they near expiry."""
+    key = (service_name, tuple(sorted(kwargs.items())))
+    with _lock:
+        session = _get_cached_session()
+        client = _clients.get(key)
+        if client is None:
+            # Clients are thread-safe, but sessions are not, so clients are only created under the lock.
+            client = session.client(service_name, **kwargs)
+            _clients[key] = client
+        return client
+
+
+def get_credentials():
+    """Return the app's assumed-role credentials, which renew themselves as they near expiry."""
+    with _lock:
+        _get_cached_session()
+        return _credentials
+
+
+def get_session():
+    """Return a new session, for use by a single thread, sharing the app's self-renewing credentials."""
+    return _session_with_credentials(get_credentials())
+
+
+def _assume_role(role_arn):
+    # Called by botocore to renew credentials, possibly outside the app context.
+    credentials = boto3.client('sts').assume_role(
+        RoleArn=role_arn,
+        RoleSessionName='AssumeAppRoleSession',
+        DurationSeconds=CREDENTIALS_DURATION_SECONDS,
+    )['Credentials']
+    return {
+        'access_key': credentials['AccessKeyId'],
+        'secret_key': credentials['SecretAccessKey'],
+        'token': credentials['SessionToken'],
+        'expiry_time': credentials['Expiration'].isoformat(),
+    }
+
+
+def _get_cached_session():
+    global _credentials, _session
+    if _session is None:
+        _credentials = _refreshable_credentials(partial(_assume_role, app.config['AWS_APP_ROLE_ARN']))
+        _session = _session_with_credentials(_credentials)
+    return _session
+
+
+def _refreshable_credentials(refresh_using):
+    """Return credentials that call refresh_using for new metadata within CREDENTIALS_REFRESH_MARGIN_SECONDS of expiry.
+
+    By default, botocore begins renewal 15 minutes before expiry, which for 15-minute credentials would mean on every
+    request. It offers no public setting for the margin, so this overrides the private refresh timeouts of the
+    RefreshableCredentials instance. These attributes are those of the botocore version pinned in requirements.txt, and
+    test_credentials_no_early_refresh fails if an upgrade stops honoring them.
+    """
+    credentials = RefreshableCredentials.create_from_metadata(
+        metadata=refresh_using(),
+        refresh_using=refresh_using,
+        method='assume-role',
+    )
+    credentials._advisory_refresh_timeout = CREDENTIALS_REFRESH_MARGIN_SECONDS
+    credentials._mandatory_refresh_timeout = CREDENTIALS_REFRESH_MARGIN_SECONDS / 2
+    return credentials
+
+
+def _session_with_credentials(credentials):
+    botocore_session = get_botocore_session()
+    # A provider that returns the credentials object itself, rather than keys, keeps them refreshable.
+    botocore_session.register_component('credential_provider', CredentialResolver([SharedCredentialProvider(credentials)]))
+    return boto3.Session(botocore_session=botocore_session)
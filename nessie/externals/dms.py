@@ -23,9 +23,9 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
-import boto3
 from botocore.exceptions import ClientError, ConnectionError
 from flask import current_app as app
+from nessie.externals import aws
 
 """Client code to run AWS DMS operations."""
 
@@ -58,29 +58,8 @@ def create_s3_target(identifier, path):
         return None
 
 
-def get_sts_credentials():
-    sts_client = boto3.client('sts')
-    role_arn = app.config['AWS_APP_ROLE_ARN']
-    assumed_role_object = sts_client.assume_role(
-        RoleArn=role_arn,
-        RoleSessionName='AssumeAppRoleSession',
-        DurationSeconds=900,
-    )
-    return assumed_role_object['Credentials']
-
-
-def get_session():
-    credentials = get_sts_credentials()
-    return boto3.Session(
-        aws_access_key_id=credentials['AccessKeyId'],
-        aws_secret_access_key=credentials['SecretAccessKey'],
-        aws_session_token=credentials['SessionToken'],
-    )
-
-
 def get_client():
-    session = get_session()
-    return session.client(
+    return aws.get_client(
         'dms',
         region_name=app.config['LOCH_S3_REGION'],
     )
@@ -27,7 +27,7 @@ from contextlib import contextmanager
 from datetime import datetime
 
 from flask import current_app as app
-from nessie.lib.db import get_psycopg_cursor
+from nessie.lib.db import get_connection_pool, get_psycopg_cursor
 import psycopg2
 import psycopg2.extras
 
@@ -53,11 +53,12 @@ def fetch(sql):
 @contextmanager
 def _get_cursor(operation):
     try:
-        with get_psycopg_cursor(
-            operation=operation,
-            autocommit=True,
+        pool = get_connection_pool(
+            app.config['DB_POOL_MAX_SIZE'],
+            app.config['DB_POOL_MAX_IDLE_SECONDS'],
             uri=app.config.get('LRS_DATABASE_URI'),
-        ) as cursor:
+        )
+        with get_psycopg_cursor(operation=operation, autocommit=True, pool=pool) as cursor:
             yield cursor
     except psycopg2.Error as e:
         error_str = str(e)
@@ -24,30 +24,38 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 
 from contextlib import contextmanager
-from datetime import datetime
+from datetime import date, datetime
+import select
+import tempfile
+from time import sleep
 
 from flask import current_app as app
-from nessie.lib.db import get_psycopg_cursor
+from nessie.lib.db import get_connection_pool, get_psycopg_cursor, sid_list, sql_text
+from nessie.lib.query_metrics import record_query
 import psycopg2
 import psycopg2.extras
+import psycopg2.sql
 
 """Client code to run queries against RDS."""
 
+# Characters of COPY data held in memory before spooling to a temporary file.
+COPY_BUFFER_MAX_MEMORY = 16 * 1024 * 1024
 
-def execute(sql, params=None, log_query=True):
+
+def execute(sql, params=None, log_query=True, sids=None):
     with _get_cursor() as cursor:
         if not cursor:
             return None
         else:
-            return _execute(sql, cursor, params, 'write', log_query)
+            return _execute(sql, cursor, params, 'write', log_query, sids)
 
 
-def fetch(sql, params=None, log_query=True):
+def fetch(sql, params=None, log_query=True, sids=None):
     with _get_cursor(operation='read') as cursor:
         if not cursor:
             return None
         else:
-            return _execute(sql, cursor, params, 'read', log_query)
+            return _execute(sql, cursor, params, 'read', log_query, sids)
 
 
 class Transaction():
@@ -55,8 +63,14 @@ class Transaction():
         self.cursor = cursor
         self.execute('BEGIN TRANSACTION')
 
-    def execute(self, sql, params=None, log_query=True):
-        return _execute(sql, self.cursor, params, 'write', log_query)
+    def execute(self, sql, params=None, log_query=True, sids=None):
+        return _execute(sql, self.cursor, params, 'write', log_query, sids)
+
+    def fetch(self, sql, params=None, log_query=True, sids=None):
+        return _execute(sql, self.cursor, params, 'read', log_query, sids)
+
+    def copy_rows(self, table, columns, rows):
+        return _copy_rows(table, columns, self.cursor, rows)
 
     def insert_bulk(self, sql, rows):
         return _insert_bulk(sql, self.cursor, rows)
@@ -74,34 +88,144 @@ def transaction():
         yield Transaction(cursor)
 
 
+class NotificationListener():
+    """Wait on Postgres NOTIFY messages sent to a channel.
+
+    If the LISTEN connection cannot be made or is lost, wait falls back to sleeping for fallback_interval seconds, so
+    that callers can carry on polling as they would without notifications. A new connection is tried on the next wait.
+    """
+
+    def __init__(self, channel, fallback_interval):
+        self.channel = channel
+        self.fallback_interval = fallback_interval
+        self.connection = None
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def listen(self):
+        try:
+            self.connection = psycopg2.connect(app.config.get('SQLALCHEMY_DATABASE_URI'))
+            # Notifications are delivered only outside a transaction.
+            self.connection.autocommit = True
+            with self.connection.cursor() as cursor:
+                cursor.execute(psycopg2.sql.SQL('LISTEN {channel}').format(channel=psycopg2.sql.Identifier(self.channel)))
+            return True
+        except psycopg2.Error as e:
+            _log_db_error(e, f'LISTEN {self.channel}')
+            self.close()
+            return False
+
+    def wait(self, timeout):
+        """Block until a notification arrives or timeout seconds pass, returning the payloads of any notifications."""
+        if self.connection is None and not self.listen():
+            sleep(self.fallback_interval)
+            return []
+        try:
+            self.connection.poll()
+            if not self.connection.notifies and select.select([self.connection], [], [], timeout) != ([], [], []):
+                self.connection.poll()
+            payloads = [notify.payload for notify in self.connection.notifies]
+            del self.connection.notifies[:]
+            return payloads
+        except (psycopg2.Error, OSError) as e:
+            app.logger.warning(f'Lost LISTEN connection on channel {self.channel}, falling back to polling: {e}')
+            self.close()
+            sleep(self.fallback_interval)
+            return []
+
+
+@contextmanager
+def notification_listener(channel, fallback_interval):
+    listener = NotificationListener(channel, fallback_interval)
+    listener.listen()
+    try:
+        yield listener
+    finally:
+        listener.close()
+
+
 @contextmanager
 def _get_cursor(autocommit=True, operation='write'):
-    with get_psycopg_cursor(
-        operation=operation,
-        autocommit=autocommit,
+    pool = get_connection_pool(
+        app.config['DB_POOL_MAX_SIZE'],
+        app.config['DB_POOL_MAX_IDLE_SECONDS'],
         uri=app.config.get('SQLALCHEMY_DATABASE_URI'),
-    ) as cursor:
+    )
+    with get_psycopg_cursor(operation=operation, autocommit=autocommit, pool=pool) as cursor:
         yield cursor
 
 
-def _execute(sql, cursor, params=None, operation='write', log_query=True):
+def _execute(sql, cursor, params=None, operation='write', log_query=True, sids=None):
+    """Execute SQL, filling any '{sids}' placeholder, as in 'sid = ANY({sids})', with the given list of SIDs.
+
+    Long SID lists are shipped in a temporary table rather than an array literal.
+    """
     result = None
+    ts = datetime.now().timestamp()
     try:
-        ts = datetime.now().timestamp()
-        cursor.execute(sql, params)
-        result = cursor.statusmessage
-        query_time = datetime.now().timestamp() - ts
-        if log_query:
-            app.logger.debug(f'RDS query returned status {result} in {query_time} seconds: \n{sql}\n{params or ""}')
+        with sid_list(cursor.connection, sids, app.config['SID_ARRAY_MAX_LENGTH'], dialect='postgres') as sids_sql:
+            if sids_sql is not None:
+                sql = psycopg2.sql.SQL(sql).format(sids=sids_sql)
+            ts = datetime.now().timestamp()
+            cursor.execute(sql, params)
+            result = cursor.statusmessage
+            query_time = datetime.now().timestamp() - ts
+            record_query('rds', sql_text(sql, cursor), query_time, rows=cursor.rowcount)
+            if log_query:
+                app.logger.debug(f'RDS query returned status {result} in {query_time} seconds: \n{sql_text(sql, cursor)}\n{params or ""}')
     except psycopg2.Error as e:
-        _log_db_error(e, sql)
+        record_query('rds', sql_text(sql, cursor), datetime.now().timestamp() - ts, error=True)
+        _log_db_error(e, sql_text(sql, cursor))
     if operation == 'read':
+        if result is None:
+            return None
         rows = cursor.fetchall()
         return [dict(r) for r in rows]
     else:
         return result
 
 
+def _copy_rows(table, columns, cursor, rows):
+    """Load rows (sequences of values ordered as columns) through COPY FROM STDIN, which is much faster than INSERT.
+
+    Rows are written as COPY text format to a buffer that spills to disk if large.
+    """
+    result = None
+    sql = f'COPY {table} ({", ".join(columns)}) FROM STDIN'
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=COPY_BUFFER_MAX_MEMORY, mode='w+', encoding='utf-8') as buf:
+            row_count = 0
+            for row in rows:
+                buf.write('\t'.join(_copy_value(value) for value in row) + '\n')
+                row_count += 1
+            buf.seek(0)
+            ts = datetime.now().timestamp()
+            cursor.copy_expert(sql, buf)
+            result = cursor.statusmessage
+            query_time = datetime.now().timestamp() - ts
+            record_query('rds', sql, query_time, rows=row_count)
+            app.logger.debug(f'RDS copy of {row_count} rows returned status {result} in {query_time} seconds: \n{sql}')
+    except psycopg2.Error as e:
+        _log_db_error(e, sql)
+    return result
+
+
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value).translate(_COPY_ESCAPES)
+
+
 def _insert_bulk(sql, cursor, rows):
     result = None
     try:
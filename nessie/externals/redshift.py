@@ -23,20 +23,27 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
-from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager, ExitStack
 from datetime import datetime
 import io
 import re
+import uuid
 
 from flask import current_app as app
 from nessie.externals import s3
-from nessie.lib.db import get_psycopg_cursor
+from nessie.lib.db import get_connection_pool, get_psycopg_cursor, sid_list, sql_text
+from nessie.lib.query_metrics import record_query
+import numpy
 import psycopg2
 import psycopg2.extras
 import psycopg2.sql
 
 """Client code to run queries against Redshift."""
 
+# Slice count of the cluster, read once from STV_SLICES.
+_slice_count = None
+
 
 def execute(sql, **kwargs):
     """Execute SQL write operation with optional keyword arguments for formatting, returning a status string."""
@@ -46,7 +53,7 @@ def execute(sql, **kwargs):
         return _execute(sql, operation='write', cursor=cursor, **kwargs)
 
 
-def execute_ddl_script(sql):
+def execute_ddl_script(sql, max_concurrency=None):
     """Handle Redshift DDL scripts, which are exceptional in a number of ways.
 
     * CREATE EXTERNAL SCHEMA must be executed separately from any later references to that schema.
@@ -55,31 +62,179 @@ def execute_ddl_script(sql):
     * DROP EXTERNAL TABLE and CREATE EXTERNAL TABLE will fail with a 'cannot run inside a transaction block'
       message unless autocommit is enabled.
 
+    Statements which only write a single schema-qualified table or view run concurrently, on up to max_concurrency
+    connections (by default REDSHIFT_DDL_MAX_CONCURRENCY), once all earlier statements that read or write the same
+    objects have completed. Any other statement, such as schema creation, grants, or work on temporary tables, waits for
+    all earlier statements and runs alone on the script's own connection. No statement is started after one fails.
+
     WARNING: This will break horribly if a semicolon terminated statement is inside a block quote.
     """
     statements = sql.split(';')
     # Remove any trailing debris after the last SQL statement.
     del statements[-1]
+    max_concurrency = max_concurrency or app.config['REDSHIFT_DDL_MAX_CONCURRENCY']
     with _get_cursor() as cursor:
         if not cursor:
             app.logger.error('Failed to get cursor to execute DDL script; aborting.')
             return False
-        for index, statement in enumerate(statements):
-            app.logger.info(f'Executing DDL script {index + 1} of {len(statements)}')
-            result = _execute(statement, operation='write', cursor=cursor)
-            if not result:
-                app.logger.error('Error executing statement from DDL script; aborting remainder of script.')
-                return False
-    return True
+        if max_concurrency > 1:
+            result = _execute_ddl_statements_concurrently(statements, cursor, max_concurrency)
+        else:
+            result = all(_execute_ddl_statement(statements, index, cursor) for index in range(len(statements)))
+    if not result:
+        app.logger.error('Error executing statement from DDL script; aborting remainder of script.')
+    return result
+
+
+def ddl_statement_dependencies(statements):
+    """Return, for each DDL statement, the indexes of earlier statements that must complete before it can start.
+
+    A statement whose only target is a schema-qualified table or view depends on earlier statements writing objects it
+    reads or writes, and on earlier statements reading objects it writes. Any other statement is a barrier, returned
+    as None, which depends on all earlier statements and on which all later statements depend.
+    """
+    temp_tables = set()
+    parsed = []
+    for statement in statements:
+        text = _strip_sql_comments(statement).strip().lower()
+        for temp_table in re.findall(r'^create\s+temp(?:orary)?\s+table\s+(\w+)', text):
+            temp_tables.add(temp_table)
+        target = re.match(_DDL_TARGET_PATTERN, text)
+        # Temporary tables exist only in the session that created them.
+        if target and not any(re.search(rf'\b{t}\b', text) for t in temp_tables):
+            parsed.append(({target.group(1)}, set(re.findall(r'\b\w+\.\w+\b', text))))
+        else:
+            parsed.append(None)
+    dependencies = []
+    last_barrier = None
+    for index, statement in enumerate(parsed):
+        if statement is None:
+            dependencies.append(None)
+            last_barrier = index
+            continue
+        (writes, reads) = statement
+        after = index if last_barrier is None else last_barrier + 1
+        depends_on = set() if last_barrier is None else {last_barrier}
+        for earlier in range(after, index):
+            (earlier_writes, earlier_reads) = parsed[earlier]
+            if earlier_writes & (reads | writes) or writes & earlier_reads:
+                depends_on.add(earlier)
+        dependencies.append(depends_on)
+    return dependencies
+
+
+# Statements creating, altering, dropping or loading one schema-qualified table or view.
+_DDL_TARGET_PATTERN = re.compile(
+    r'^(?:create\s+(?:external\s+)?table(?:\s+if\s+not\s+exists)?'
+    r'|create\s+(?:or\s+replace\s+)?view'
+    r'|drop\s+(?:table|view)(?:\s+if\s+exists)?'
+    r'|alter\s+table'
+    r'|insert\s+into'
+    r'|delete\s+from'
+    r'|update'
+    r')\s+(\w+\.\w+)\b',
+)
+
+
+def _execute_ddl_statement(statements, index, cursor):
+    app.logger.info(f'Executing DDL script {index + 1} of {len(statements)}')
+    return _execute(statements[index], operation='write', cursor=cursor)
+
+
+def _execute_ddl_statement_in_app_context(app_obj, statements, index):
+    with app_obj.app_context():
+        with _get_cursor() as cursor:
+            return cursor and _execute_ddl_statement(statements, index, cursor)
+
+
+def _execute_ddl_statements_concurrently(statements, cursor, max_concurrency):
+    dependencies = ddl_statement_dependencies(statements)
+    app_obj = app._get_current_object()
+    completed = set()
+    pending = list(range(len(statements)))
+    running = {}
+    failed = False
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        while (pending and not failed) or running:
+            if pending and not failed and dependencies[pending[0]] is None:
+                # A barrier runs on the script's own connection once everything before it has completed.
+                if not running:
+                    index = pending.pop(0)
+                    if _execute_ddl_statement(statements, index, cursor):
+                        completed.add(index)
+                    else:
+                        failed = True
+                    continue
+            elif not failed:
+                for index in list(pending):
+                    if dependencies[index] is None:
+                        break
+                    if len(running) < max_concurrency and dependencies[index] <= completed:
+                        pending.remove(index)
+                        running[executor.submit(_execute_ddl_statement_in_app_context, app_obj, statements, index)] = index
+            if running:
+                (done, _) = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    if future.result():
+                        completed.add(index)
+                    else:
+                        failed = True
+    return not failed
+
+
+def _strip_sql_comments(sql):
+    sql = re.sub(r'/\*.*?\*/', ' ', sql, flags=re.DOTALL)
+    return re.sub(r'--[^\n]*', ' ', sql)
+
+
+def append_from_table(schema, table, source_schema, source_table):
+    """Move all rows of the source table into the target table, leaving the source table empty."""
+    identifiers = {
+        'schema': psycopg2.sql.Identifier(schema),
+        'table': psycopg2.sql.Identifier(table),
+        'source_schema': psycopg2.sql.Identifier(source_schema),
+        'source_table': psycopg2.sql.Identifier(source_table),
+    }
+    # In a test environment, Postgres has no ALTER TABLE APPEND, and so rows are copied and the source truncated.
+    if app.config['NESSIE_ENV'] == 'test':
+        return execute(
+            'INSERT INTO {schema}.{table} (SELECT * FROM {source_schema}.{source_table}); TRUNCATE {source_schema}.{source_table}',
+            **identifiers,
+        )
+    # Real Redshift moves the source's storage without rewriting rows.
+    else:
+        return execute('ALTER TABLE {schema}.{table} APPEND FROM {source_schema}.{source_table}', **identifiers)
+
+
+def copy_manifest_keys(s3_stem):
+    """Return the manifest key and part keys under which COPY input is split, so that each slice loads one part."""
+    part_keys = [copy_part_key(s3_stem, part) for part in range(get_copy_file_count())]
+    return f'{s3_stem}.manifest', part_keys
+
 
+def copy_part_key(s3_stem, part):
+    return f'{s3_stem}_{part:04}.tsv.gz'
 
-def copy_tsv_from_s3(table, s3_key):
+
+def copy_tsv_from_s3(table, s3_key, gzip=False, manifest=False):
     # In a test environment, retrieve object contents from mock S3 and use Postgres COPY FROM STDIN.
     if app.config['NESSIE_ENV'] == 'test':
+        if manifest:
+            manifest_json = s3.get_object_json(s3_key)
+            if not manifest_json:
+                return False
+            s3_prefix = s3.build_s3_url('')
+            keys = [entry['url'][len(s3_prefix):] for entry in manifest_json['entries']]
+        else:
+            keys = [s3_key]
         try:
-            buf = io.StringIO(s3.get_object_text(s3_key))
             with _get_cursor(operation='read') as cursor:
-                cursor.copy_from(buf, table)
+                for key in keys:
+                    buf = s3.get_unzipped_text_reader(key) if gzip else io.StringIO(s3.get_object_text(key))
+                    if buf is None:
+                        return False
+                    cursor.copy_from(buf, table)
             return True
         except psycopg2.Error as e:
             error_str = str(e)
@@ -91,7 +246,8 @@ def copy_tsv_from_s3(table, s3_key):
     else:
         iam_role = app.config['REDSHIFT_IAM_ROLE']
         s3_prefix = 's3://' + app.config['LOCH_S3_BUCKET'] + '/'
-        return execute(f"COPY {table} FROM '{s3_prefix}{s3_key}' IAM_ROLE '{iam_role}' DELIMITER '\\t';")
+        options = (' GZIP' if gzip else '') + (' MANIFEST' if manifest else '')
+        return execute(f"COPY {table} FROM '{s3_prefix}{s3_key}' IAM_ROLE '{iam_role}' DELIMITER '\\t'{options};")
 
 
 def create_external_schema(external_schema, role):
@@ -143,6 +299,20 @@ def drop_external_schema(schema_name):
     execute(sql)
 
 
+def get_copy_file_count():
+    """Return the number of files into which COPY input is split: REDSHIFT_COPY_FILE_COUNT, or else the slice count."""
+    global _slice_count
+    if app.config['REDSHIFT_COPY_FILE_COUNT']:
+        return app.config['REDSHIFT_COPY_FILE_COUNT']
+    if _slice_count is None:
+        result = fetch('SELECT COUNT(*) AS slice_count FROM stv_slices')
+        if not result:
+            app.logger.warning('Failed to count Redshift slices; COPY input will not be split.')
+            return 1
+        _slice_count = result[0]['slice_count']
+    return _slice_count
+
+
 def fetch(sql, **kwargs):
     """Execute SQL read operation with optional keyword arguments for formatting, returning an array of dictionaries."""
     with _get_cursor(operation='read') as cursor:
@@ -156,6 +326,139 @@ def fetch(sql, **kwargs):
             return [r.copy() for r in rows]
 
 
+def iter_fetch(sql, fetch_size=None, **kwargs):
+    """Execute SQL read operation through a server-side cursor, returning an iterator of dictionaries.
+
+    Where fetch holds the full result set in memory, iter_fetch retrieves rows from the server in batches of fetch_size
+    (by default REDSHIFT_FETCH_SIZE) as the iterator is consumed. The first batch is fetched immediately so that, as with
+    fetch, a failed query returns None. The connection goes back to the pool once the iterator is exhausted, closed with
+    its close() method, or garbage-collected, whether or not any rows were read. Keyword arguments are handled as by
+    fetch.
+    """
+    fetch_size = fetch_size or app.config['REDSHIFT_FETCH_SIZE']
+    stack = ExitStack()
+    cursor = None
+    try:
+        # Server-side cursors must be declared within a transaction.
+        cursor = stack.enter_context(get_psycopg_cursor(
+            operation='read',
+            autocommit=False,
+            cursor_name=f'nessie_{uuid.uuid4().hex}',
+            pool=_connection_pool(),
+        ))
+        ts = datetime.now().timestamp()
+        sids = kwargs.pop('sids', None)
+        if sids is not None:
+            kwargs['sids'] = stack.enter_context(_sid_list(cursor.connection, sids))
+            # Any temporary table must outlive the server-side cursor reading from it.
+            stack.callback(cursor.close)
+        params = None
+        if kwargs:
+            params = kwargs.pop('params', None)
+            sql = psycopg2.sql.SQL(sql).format(**kwargs)
+        cursor.execute(sql, params)
+        first_batch = cursor.fetchmany(fetch_size)
+        query_time = datetime.now().timestamp() - ts
+        sql_for_log = sql_text(sql, cursor)
+        record_query('redshift', sql_for_log, query_time)
+        app.logger.debug(f'Redshift query opened server-side cursor in {query_time} seconds:\n{sql_for_log}\n{params or ""}')
+    except psycopg2.Error as e:
+        sql_for_log = sql
+        if cursor is not None:
+            # Composed SQL must be rendered before the cursor is closed.
+            sql_for_log = sql_text(sql, cursor)
+            record_query('redshift', sql_for_log, datetime.now().timestamp() - ts, error=True)
+        stack.close()
+        _log_error(e, sql_for_log)
+        return None
+    return _RowIterator(stack, cursor, first_batch, fetch_size)
+
+
+def fetch_columns(sql, dtypes, fetch_size=None):
+    """Execute SQL read operation through a server-side cursor, returning a dict of NumPy arrays keyed by column name.
+
+    The dtypes argument maps result column names to NumPy dtypes. Rows are converted to typed arrays a batch of
+    fetch_size at a time, so that a large result is never held as Python row objects; NULLs in float columns become NaN.
+    Returns None if the query fails, or if a value, such as a NULL in an integer column, cannot take its column's dtype.
+    """
+    fetch_size = fetch_size or app.config['REDSHIFT_FETCH_SIZE']
+    chunks = {column: [] for column in dtypes}
+    try:
+        with get_psycopg_cursor(
+            operation='read_columns',
+            autocommit=False,
+            cursor_name=f'nessie_{uuid.uuid4().hex}',
+            pool=_connection_pool(),
+        ) as cursor:
+            ts = datetime.now().timestamp()
+            cursor.execute(sql)
+            row_count = 0
+            while True:
+                batch = cursor.fetchmany(fetch_size)
+                if not batch:
+                    break
+                row_count += len(batch)
+                positions = [d[0] for d in cursor.description]
+                for column, dtype in dtypes.items():
+                    position = positions.index(column)
+                    try:
+                        chunks[column].append(numpy.array([row[position] for row in batch], dtype=dtype))
+                    except (TypeError, ValueError) as e:
+                        record_query('redshift', sql, datetime.now().timestamp() - ts, error=True)
+                        app.logger.error(f'Failed to convert Redshift column {column} to {dtype}: {e}\n{sql}')
+                        return None
+            query_time = datetime.now().timestamp() - ts
+            record_query('redshift', sql, query_time, rows=row_count)
+            app.logger.debug(f'Redshift query returned {row_count} rows as columns in {query_time} seconds:\n{sql}')
+    except psycopg2.Error as e:
+        record_query('redshift', sql, 0, error=True)
+        _log_error(e, sql)
+        return None
+    return {column: numpy.concatenate(chunks[column]) if chunks[column] else numpy.array([], dtype=dtype) for column, dtype in dtypes.items()}
+
+
+class _RowIterator():
+    """Iterator over the rows of a server-side cursor, which releases the cursor's connection once closed.
+
+    A generator would release its connection only if iteration had begun, and so leak it if discarded unconsumed.
+    """
+
+    def __init__(self, stack, cursor, batch, fetch_size):
+        self._stack = stack
+        self._cursor = cursor
+        self._batch = iter(batch)
+        self._fetch_size = fetch_size
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while self._stack is not None:
+            row = next(self._batch, None)
+            if row is not None:
+                # As in fetch, copy psycopg's dict-like row objects to real dicts.
+                return row.copy()
+            try:
+                batch = self._cursor.fetchmany(self._fetch_size)
+            except Exception:
+                self.close()
+                raise
+            if not batch:
+                self.close()
+            self._batch = iter(batch)
+        raise StopIteration
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        stack = self._stack
+        self._stack = None
+        self._cursor = None
+        if stack is not None:
+            stack.close()
+
+
 class Transaction():
     def __init__(self, cursor):
         self.cursor = cursor
@@ -177,17 +480,27 @@ def transaction():
         yield Transaction(cursor)
 
 
+def _connection_params():
+    return {
+        'dbname': app.config.get('REDSHIFT_DATABASE'),
+        'host': app.config.get('REDSHIFT_HOST'),
+        'port': app.config.get('REDSHIFT_PORT'),
+        'user': app.config.get('REDSHIFT_USER'),
+        'password': app.config.get('REDSHIFT_PASSWORD'),
+    }
+
+
+def _connection_pool():
+    return get_connection_pool(app.config['DB_POOL_MAX_SIZE'], app.config['DB_POOL_MAX_IDLE_SECONDS'], **_connection_params())
+
+
 @contextmanager
 def _get_cursor(autocommit=True, operation='write'):
     try:
         with get_psycopg_cursor(
             operation=operation,
             autocommit=autocommit,
-            dbname=app.config.get('REDSHIFT_DATABASE'),
-            host=app.config.get('REDSHIFT_HOST'),
-            port=app.config.get('REDSHIFT_PORT'),
-            user=app.config.get('REDSHIFT_USER'),
-            password=app.config.get('REDSHIFT_PASSWORD'),
+            pool=_connection_pool(),
         ) as cursor:
             yield cursor
     except psycopg2.Error as e:
@@ -202,30 +515,51 @@ def _execute(sql, operation, cursor, **kwargs):
     """Execute SQL string with optional keyword arguments for formatting.
 
     If 'operation' is set to 'write', a transaction is enforced and a status string is returned. If 'operation' is
-    set to 'read', results are returned as an array of named tuples.
+    set to 'read', results are returned as an array of named tuples. A 'sids' keyword argument fills a '{sids}'
+    placeholder, as in 'sid = ANY({sids})', with an array literal or, for long lists, a temporary table subquery.
     """
     result = None
+    sql_for_log = sql
+    ts = datetime.now().timestamp()
     try:
-        params = None
-        if kwargs:
-            params = kwargs.pop('params', None)
-            sql = psycopg2.sql.SQL(sql).format(**kwargs)
-        # Don't log sensitive credentials in the SQL.
-        sql_for_log = re.sub(r"CREDENTIALS '[^']+'", "CREDENTIALS '<credentials>'", str(sql))
-        ts = datetime.now().timestamp()
-        cursor.execute(sql, params)
-        if operation == 'read':
-            result = [row for row in cursor]
-            query_time = datetime.now().timestamp() - ts
-            app.logger.debug(f'Redshift query returned {len(result)} rows in {query_time} seconds:\n{sql_for_log}\n{params or ""}')
-        else:
-            result = cursor.statusmessage
-            query_time = datetime.now().timestamp() - ts
-            app.logger.debug(f'Redshift query returned status {result} in {query_time} seconds:\n{sql_for_log}\n{params or ""}')
+        with _sid_list(cursor.connection, kwargs.pop('sids', None)) as sids:
+            params = None
+            if sids is not None:
+                kwargs['sids'] = sids
+            if kwargs:
+                params = kwargs.pop('params', None)
+                sql = psycopg2.sql.SQL(sql).format(**kwargs)
+            # Don't log sensitive credentials in the SQL.
+            sql_for_log = re.sub(r"CREDENTIALS '[^']+'", "CREDENTIALS '<credentials>'", sql_text(sql, cursor))
+            ts = datetime.now().timestamp()
+            cursor.execute(sql, params)
+            if operation == 'read':
+                result = [row for row in cursor]
+                query_time = datetime.now().timestamp() - ts
+                record_query('redshift', sql_for_log, query_time, rows=len(result))
+                app.logger.debug(f'Redshift query returned {len(result)} rows in {query_time} seconds:\n{sql_for_log}\n{params or ""}')
+            else:
+                result = cursor.statusmessage
+                query_time = datetime.now().timestamp() - ts
+                record_query('redshift', sql_for_log, query_time, rows=cursor.rowcount)
+                app.logger.debug(f'Redshift query returned status {result} in {query_time} seconds:\n{sql_for_log}\n{params or ""}')
     except psycopg2.Error as e:
         error_str = str(e)
         if e.pgcode:
             error_str += f'{e.pgcode}: {e.pgerror}\n'
         error_str += f'on SQL: {sql_for_log}'
         app.logger.warning(error_str)
+        record_query('redshift', sql_for_log, datetime.now().timestamp() - ts, error=True)
     return result
+
+
+def _sid_list(connection, sids):
+    return sid_list(connection, sids, app.config['SID_ARRAY_MAX_LENGTH'], dialect=app.config['REDSHIFT_SQL_DIALECT'])
+
+
+def _log_error(e, sql):
+    error_str = str(e)
+    if e.pgcode:
+        error_str += f'{e.pgcode}: {e.pgerror}\n'
+    error_str += f'on SQL: {sql}'
+    app.logger.warning(error_str)
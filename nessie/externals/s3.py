@@ -23,21 +23,37 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from gzip import GzipFile
 import io
 import json
+import re
 import socket
+import tempfile
+import time
 
-import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError, ConnectionError
 from botocore.vendored.requests.packages.urllib3.exceptions import TimeoutError
 from flask import current_app as app
+from nessie.externals import aws
 from nessie.lib import metadata
 import requests
 import smart_open
 
 """Client code to run file operations against S3."""
 
+# Objects larger than this cannot be copied by a single CopyObject request.
+MAX_SINGLE_COPY_SIZE = 5 * 1024 * 1024 * 1024
+
+# Smallest part allowed in a multipart upload, other than the last.
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+# Error codes on which a failed request may succeed if retried. Shared clients renew their own credentials, so that a
+# request failing on an expired token may be retried with a fresh one.
+TRANSIENT_ERROR_CODES = ['ExpiredToken', 'InternalError', 'RequestTimeout', 'ServiceUnavailable', 'SlowDown', 'Throttling']
+
 
 def build_s3_url(key):
     bucket = app.config['LOCH_S3_BUCKET']
@@ -62,6 +78,34 @@ def copy(source_bucket, source_key, dest_bucket, dest_key):
         return False
 
 
+def copy_many(copies, max_threads=None, source_sizes=None):
+    """Copy objects on a bounded thread pool, given (source_bucket, source_key, dest_bucket, dest_key) tuples.
+
+    Up to max_threads copies (by default LOCH_S3_COPY_MAX_THREADS) run at once. Each is attempted up to
+    LOCH_S3_COPY_ATTEMPTS times if errors are transient. Objects larger than MAX_SINGLE_COPY_SIZE are copied in parts;
+    sizes are taken from source_sizes, a dict mapping source keys to sizes as listed, or else from a HEAD request.
+    Returns a dict mapping each (dest_bucket, dest_key) to True if copied or False if not.
+    """
+    copies = list(copies)
+    max_threads = max_threads or app.config['LOCH_S3_COPY_MAX_THREADS']
+    attempts = app.config['LOCH_S3_COPY_ATTEMPTS']
+    encryption = app.config['LOCH_S3_ENCRYPTION']
+    client = get_client()
+    source_sizes = source_sizes or {}
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_threads) as executor:
+        futures = [
+            executor.submit(_copy_with_retries, client, copy, source_sizes.get(copy[1]), encryption, attempts) for copy in copies
+        ]
+        for (source_bucket, source_key, dest_bucket, dest_key), future in zip(copies, futures):
+            error = future.result()
+            if error:
+                app.logger.error(f'Error on S3 object copy: ({source_bucket}/{source_key} to {dest_bucket}/{dest_key}, error={error}')
+            results[(dest_bucket, dest_key)] = error is None
+    app.logger.info(f'Copied {sum(results.values())} of {len(copies)} S3 objects.')
+    return results
+
+
 def delete_objects(keys, bucket=None):
     client = get_client()
     if not bucket:
@@ -98,29 +142,12 @@ def delete_objects_with_prefix(prefix, whitelist=[]):
         return False
 
 
-def get_sts_credentials():
-    sts_client = boto3.client('sts')
-    role_arn = app.config['AWS_APP_ROLE_ARN']
-    assumed_role_object = sts_client.assume_role(
-        RoleArn=role_arn,
-        RoleSessionName='AssumeAppRoleSession',
-        DurationSeconds=900,
-    )
-    return assumed_role_object['Credentials']
-
-
 def get_session():
-    credentials = get_sts_credentials()
-    return boto3.Session(
-        aws_access_key_id=credentials['AccessKeyId'],
-        aws_secret_access_key=credentials['SecretAccessKey'],
-        aws_session_token=credentials['SessionToken'],
-    )
+    return aws.get_session()
 
 
 def get_client():
-    session = get_session()
-    return session.client('s3', region_name=app.config['LOCH_S3_REGION'])
+    return aws.get_client('s3', region_name=app.config['LOCH_S3_REGION'])
 
 
 def get_keys_with_prefix(prefix, full_objects=False, bucket=None):
@@ -143,12 +170,61 @@ def get_keys_with_prefix(prefix, full_objects=False, bucket=None):
     return objects
 
 
+def get_child_keys_and_prefixes(prefix, bucket=None):
+    """Return the keys and common prefixes directly under prefix, listed with a '/' delimiter, or None on error."""
+    client = get_client()
+    if not bucket:
+        bucket = app.config['LOCH_S3_BUCKET']
+    children = []
+    paginator = client.get_paginator('list_objects_v2')
+    page_iterator = paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter='/')
+    try:
+        for page in page_iterator:
+            children += [p['Prefix'] for p in page.get('CommonPrefixes', [])]
+            children += [o['Key'] for o in page.get('Contents', [])]
+    except (ClientError, ConnectionError, ValueError) as e:
+        app.logger.error(f'Error listing S3 keys with prefix: bucket={bucket}, prefix={prefix}, error={e}')
+        return None
+    return children
+
+
+def get_object_sizes_with_prefix(prefix, bucket=None, sub_prefixes=None, max_threads=None):
+    """Return a dict mapping each key under prefix to its size in bytes, or None on error.
+
+    Keys are listed once by ListObjectsV2. If sub_prefixes are given, only keys under prefix + sub_prefix are listed,
+    each sub-prefix on its own thread, up to max_threads (by default LOCH_S3_COPY_MAX_THREADS) at once.
+    """
+    if not bucket:
+        bucket = app.config['LOCH_S3_BUCKET']
+    prefixes = [prefix + sub_prefix for sub_prefix in sub_prefixes] if sub_prefixes else [prefix]
+    max_threads = max_threads or app.config['LOCH_S3_COPY_MAX_THREADS']
+    client = get_client()
+    sizes = {}
+    with ThreadPoolExecutor(max_workers=min(max_threads, len(prefixes))) as executor:
+        futures = [executor.submit(_list_object_sizes, client, bucket, listed_prefix) for listed_prefix in prefixes]
+        for listed_prefix, future in zip(prefixes, futures):
+            (listed_sizes, error) = future.result()
+            if error:
+                app.logger.error(f'Error listing S3 keys with prefix: bucket={bucket}, prefix={listed_prefix}, error={error}')
+                return None
+            sizes.update(listed_sizes)
+    return sizes
+
+
 def get_object_json(s3_key):
     text = get_object_text(s3_key)
     if text:
         return json.loads(text)
 
 
+def get_object_jsonl_gz(key):
+    """Return an iterator over records in a gzip-compressed, newline-delimited JSON object, parsing one line at a time."""
+    reader = get_unzipped_text_reader(key)
+    if reader is None:
+        return None
+    return (json.loads(line) for line in reader if line.strip())
+
+
 def get_object_text(key):
     client = get_client()
     bucket = app.config['LOCH_S3_BUCKET']
@@ -164,6 +240,33 @@ def get_object_text(key):
         return None
 
 
+def get_upload_stream(s3_key, bucket=None, min_part_size=None):
+    """Return a writable file-like object that streams to S3 by multipart upload, so that content is never held in full.
+
+    Up to min_part_size bytes (by default smart_open's own setting) are buffered before each part is sent.
+    """
+    if bucket is None:
+        bucket = app.config['LOCH_S3_BUCKET']
+    s3_upload_args = {'ServerSideEncryption': app.config['LOCH_S3_ENCRYPTION']}
+    transport_params = dict(session=get_session(), multipart_upload_kwargs=s3_upload_args)
+    if min_part_size:
+        transport_params['min_part_size'] = min_part_size
+    return smart_open.open(
+        f's3://{bucket}/{s3_key}',
+        'wb',
+        ignore_ext=True,
+        transport_params=transport_params,
+    )
+
+
+@contextmanager
+def get_gzip_upload_stream(s3_key, bucket=None):
+    """Yield a writable file-like object that gzip-compresses content on the fly and streams it to S3 by multipart upload."""
+    with get_upload_stream(s3_key, bucket) as s3_out:
+        with GzipFile(None, 'wb', fileobj=s3_out) as gzipped:
+            yield gzipped
+
+
 def get_unzipped_text_reader(key):
     """Iterate over millions of rows with minimal memory consumption."""
     client = get_client()
@@ -227,6 +330,20 @@ def upload_json(obj, s3_key):
     return upload_data(data, s3_key)
 
 
+def upload_jsonl_gz(records, s3_key):
+    """Stream records to S3 as gzip-compressed JSON, one record per line, without holding the full document in memory."""
+    bucket = app.config['LOCH_S3_BUCKET']
+    try:
+        with get_gzip_upload_stream(s3_key) as gzipped:
+            for record in records:
+                gzipped.write(json.dumps(record, default=_json_default).encode() + b'\n')
+    except (ClientError, ConnectionError, ValueError) as e:
+        app.logger.error(f'Error on S3 upload: bucket={bucket}, key={s3_key}, error={e}')
+        return False
+    app.logger.info(f'S3 upload complete: bucket={bucket}, key={s3_key}')
+    return True
+
+
 def upload_from_url(url, s3_key, on_stream_opened=None):
     bucket = app.config['LOCH_S3_BUCKET']
     s3_url = build_s3_url(s3_key)
@@ -264,6 +381,258 @@ def upload_from_url(url, s3_key, on_stream_opened=None):
         return s3_response
 
 
+def upload_from_url_ranged(url, s3_key, on_stream_opened=None):
+    """Sync a large file from a URL to S3 by parallel HTTP Range requests, each uploaded as one part of a multipart upload.
+
+    Up to LOCH_S3_RANGED_SYNC_MAX_THREADS parts of LOCH_S3_RANGED_SYNC_PART_SIZE bytes are in flight at once, and the
+    size of the uploaded object is checked against the source. A source that does not honor Range requests, or that
+    fits in a single part, is streamed by upload_from_url instead.
+    """
+    part_size = app.config['LOCH_S3_RANGED_SYNC_PART_SIZE']
+    source_size = _ranged_source_size(url) if part_size else None
+    if not source_size or source_size <= part_size:
+        return upload_from_url(url, s3_key, on_stream_opened=on_stream_opened)
+    if on_stream_opened:
+        on_stream_opened({'Content-Length': str(source_size)})
+
+    bucket = app.config['LOCH_S3_BUCKET']
+    attempts = app.config['LOCH_S3_RANGED_SYNC_ATTEMPTS']
+    s3_upload_args = {'ServerSideEncryption': app.config['LOCH_S3_ENCRYPTION']}
+    if s3_key.endswith('.gz'):
+        s3_upload_args.update({
+            'ContentEncoding': 'gzip',
+            'ContentType': 'text/plain',
+        })
+    byte_ranges = [(start, min(start + part_size, source_size) - 1) for start in range(0, source_size, part_size)]
+    client = get_client()
+    upload_id = client.create_multipart_upload(Bucket=bucket, Key=s3_key, **s3_upload_args)['UploadId']
+    try:
+        with ThreadPoolExecutor(max_workers=app.config['LOCH_S3_RANGED_SYNC_MAX_THREADS']) as executor:
+            futures = [
+                executor.submit(_upload_range, client, url, bucket, s3_key, upload_id, part_number, byte_range, attempts)
+                for part_number, byte_range in enumerate(byte_ranges, 1)
+            ]
+            parts = []
+            for future in futures:
+                (part, error) = future.result()
+                if error:
+                    for pending in futures:
+                        pending.cancel()
+                    raise error if isinstance(error, (ClientError, ValueError)) else ConnectionError(error=error)
+                parts.append(part)
+        client.complete_multipart_upload(Bucket=bucket, Key=s3_key, UploadId=upload_id, MultipartUpload={'Parts': parts})
+    except (ClientError, ConnectionError, ValueError) as e:
+        app.logger.error(f'Error on S3 ranged upload: source_url={url}, bucket={bucket}, key={s3_key}, error={e}')
+        client.abort_multipart_upload(Bucket=bucket, Key=s3_key, UploadId=upload_id)
+        raise e
+    s3_response = client.head_object(Bucket=bucket, Key=s3_key)
+    if s3_response['ContentLength'] != source_size:
+        app.logger.error(f'S3 object size {s3_response["ContentLength"]} does not match source size {source_size}: source_url={url}, key={s3_key}')
+        raise ValueError(f'Size mismatch on S3 ranged upload of {s3_key}')
+    app.logger.info(f'S3 upload complete: source_url={url}, bucket={bucket}, key={s3_key}, parts={len(parts)}')
+    return s3_response
+
+
+def reconcile_keys(source_sizes, dest_sizes, dest_key_for):
+    """Compare listings of key to size, as returned by get_object_sizes_with_prefix, in time linear in their length.
+
+    The dest_key_for function maps each source key to the destination key expected for it. Returns sorted lists of
+    source keys with no destination object ('missing') and with a destination object of another size ('size_mismatched').
+    """
+    missing = []
+    size_mismatched = []
+    for source_key, size in source_sizes.items():
+        dest_size = dest_sizes.get(dest_key_for(source_key))
+        if dest_size is None:
+            missing.append(source_key)
+        elif dest_size != size:
+            size_mismatched.append(source_key)
+    return {
+        'missing': sorted(missing),
+        'size_mismatched': sorted(size_mismatched),
+    }
+
+
+def upload_copy_manifest(keys, manifest_key):
+    """Write a Redshift COPY manifest listing objects that must all be present for the load to succeed."""
+    manifest = {'entries': [{'url': build_s3_url(key), 'mandatory': True} for key in keys]}
+    return upload_json(manifest, manifest_key)
+
+
+def upload_files(uploads, max_threads=None):
+    """Upload (s3_key, fileobj) pairs on a bounded thread pool, returning True if every upload succeeded.
+
+    Each upload is attempted up to LOCH_S3_COPY_ATTEMPTS times if errors are transient.
+    """
+    uploads = list(uploads)
+    max_threads = max_threads or app.config['LOCH_S3_COPY_MAX_THREADS']
+    attempts = app.config['LOCH_S3_COPY_ATTEMPTS']
+    bucket = app.config['LOCH_S3_BUCKET']
+    encryption = app.config['LOCH_S3_ENCRYPTION']
+    client = get_client()
+    success = True
+    with ThreadPoolExecutor(max_workers=max_threads) as executor:
+        futures = [executor.submit(_put_object, client, bucket, s3_key, fileobj, encryption, attempts) for s3_key, fileobj in uploads]
+        for (s3_key, fileobj), future in zip(uploads, futures):
+            error = future.result()
+            if error:
+                app.logger.error(f'Error on S3 upload: bucket={bucket}, key={s3_key}, error={error}')
+                success = False
+    if success:
+        app.logger.info(f'S3 upload complete: bucket={bucket}, {len(uploads)} keys')
+    return success
+
+
 def upload_tsv_rows(rows, s3_key):
     data = b'\n'.join(rows)
     return upload_data(data, s3_key)
+
+
+def upload_tsv_rows_gz(rows, s3_key):
+    """Stream encoded TSV rows from any iterable to S3 with gzip compression, so that the full file is never held in memory."""
+    bucket = app.config['LOCH_S3_BUCKET']
+    try:
+        with get_gzip_upload_stream(s3_key) as gzipped:
+            for row in rows:
+                gzipped.write(row + b'\n')
+    except (ClientError, ConnectionError, ValueError) as e:
+        app.logger.error(f'Error on S3 upload: bucket={bucket}, key={s3_key}, error={e}')
+        return False
+    app.logger.info(f'S3 upload complete: bucket={bucket}, key={s3_key}')
+    return True
+
+
+def upload_tsv_rows_gz_parts(rows, s3_keys):
+    """Deal encoded TSV rows in turn to gzipped parts, one per key, and upload the parts in parallel.
+
+    Parts are spooled to temporary files so that memory use does not grow with row count. Returns the keys of parts
+    uploaded, leaving out any that received no rows (but always including the first), or None on error.
+    """
+    part_files = [tempfile.TemporaryFile() for s3_key in s3_keys]
+    try:
+        row_counts = [0] * len(s3_keys)
+        gzipped = [GzipFile(None, 'wb', fileobj=part_file) for part_file in part_files]
+        for index, row in enumerate(rows):
+            part = index % len(s3_keys)
+            gzipped[part].write(row + b'\n')
+            row_counts[part] += 1
+        uploads = []
+        for part, (s3_key, part_file) in enumerate(zip(s3_keys, part_files)):
+            gzipped[part].close()
+            if part == 0 or row_counts[part]:
+                part_file.seek(0)
+                uploads.append((s3_key, part_file))
+        if not upload_files(uploads):
+            return None
+        return [s3_key for s3_key, part_file in uploads]
+    finally:
+        for part_file in part_files:
+            part_file.close()
+
+
+def upload_tsv_rows_gz_manifest(rows, manifest_key, part_keys):
+    """Upload encoded TSV rows as gzipped parts, with a COPY manifest listing them, returning True on success."""
+    uploaded_keys = upload_tsv_rows_gz_parts(rows, part_keys)
+    return bool(uploaded_keys) and upload_copy_manifest(uploaded_keys, manifest_key)
+
+
+def _copy_with_retries(client, copy, source_size, encryption, attempts):
+    # Runs outside the app context, and so returns any error for logging rather than logging it.
+    (source_bucket, source_key, dest_bucket, dest_key) = copy
+    source = {
+        'Bucket': source_bucket,
+        'Key': source_key,
+    }
+    for attempt in range(attempts):
+        try:
+            if source_size is None:
+                source_size = client.head_object(Bucket=source_bucket, Key=source_key)['ContentLength']
+            if source_size <= MAX_SINGLE_COPY_SIZE:
+                client.copy_object(Bucket=dest_bucket, Key=dest_key, CopySource=source, ServerSideEncryption=encryption)
+            else:
+                client.copy(
+                    source,
+                    dest_bucket,
+                    dest_key,
+                    ExtraArgs={'ServerSideEncryption': encryption},
+                    Config=TransferConfig(multipart_threshold=MAX_SINGLE_COPY_SIZE),
+                )
+            return None
+        except (ClientError, ConnectionError, ValueError) as e:
+            if attempt + 1 < attempts and _is_transient(e):
+                time.sleep(2 ** attempt)
+                continue
+            return e
+
+
+def _list_object_sizes(client, bucket, prefix):
+    # Runs outside the app context, and so returns any error for logging rather than logging it.
+    sizes = {}
+    try:
+        for page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+            for o in page.get('Contents', []):
+                sizes[o['Key']] = o['Size']
+    except (ClientError, ConnectionError, ValueError) as e:
+        return None, e
+    return sizes, None
+
+
+def _put_object(client, bucket, s3_key, fileobj, encryption, attempts):
+    # Runs outside the app context, and so returns any error for logging rather than logging it.
+    for attempt in range(attempts):
+        try:
+            fileobj.seek(0)
+            client.put_object(Bucket=bucket, Key=s3_key, Body=fileobj, ServerSideEncryption=encryption)
+            return None
+        except (ClientError, ConnectionError, ValueError) as e:
+            if attempt + 1 < attempts and _is_transient(e):
+                time.sleep(2 ** attempt)
+                continue
+            return e
+
+
+def _ranged_source_size(url):
+    # A one-byte Range request shows whether the source honors ranges and, by its Content-Range, the full size. The body
+    # of a source that ignores the Range header is never read.
+    try:
+        with requests.get(url, headers={'Range': 'bytes=0-0'}, stream=True) as response:
+            if response.status_code != 206:
+                return None
+            content_range = response.headers.get('Content-Range', '')
+    except requests.RequestException:
+        return None
+    match = re.match(r'bytes 0-0/(\d+)$', content_range)
+    return int(match.group(1)) if match else None
+
+
+def _upload_range(client, url, bucket, s3_key, upload_id, part_number, byte_range, attempts):
+    # Runs outside the app context, and so returns any error for logging rather than logging it.
+    (start, end) = byte_range
+    for attempt in range(attempts):
+        try:
+            response = requests.get(url, headers={'Range': f'bytes={start}-{end}'})
+            if response.status_code != 206 or len(response.content) != end - start + 1:
+                raise ValueError(f'Range {start}-{end} returned status {response.status_code} with {len(response.content)} bytes')
+            upload = client.upload_part(Bucket=bucket, Key=s3_key, UploadId=upload_id, PartNumber=part_number, Body=response.content)
+            return {'ETag': upload['ETag'], 'PartNumber': part_number}, None
+        except (ClientError, ConnectionError, ValueError, requests.RequestException) as e:
+            if attempt + 1 < attempts and (_is_transient(e) or not isinstance(e, ClientError)):
+                time.sleep(2 ** attempt)
+                continue
+            return None, e
+
+
+def _is_transient(error):
+    if isinstance(error, ConnectionError):
+        return True
+    if isinstance(error, ClientError):
+        response = error.response
+        return response.get('Error', {}).get('Code') in TRANSIENT_ERROR_CODES or response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0) >= 500
+    return False
+
+
+def _json_default(obj):
+    # Column arrays, such as Canvas enrollments in site maps, are written as JSON lists.
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
@@ -32,6 +32,7 @@ from flask import current_app as app
 from nessie.externals import redshift
 from nessie.jobs.queue import get_job_queue
 from nessie.lib.metadata import create_background_job_status, update_background_job_status
+from nessie.lib.phase_timer import PhaseTimer
 from nessie.models.util import advisory_lock
 
 """Parent class for background jobs."""
@@ -60,6 +61,7 @@ class BackgroundJob(object):
     def __init__(self, **kwargs):
         self.job_args = kwargs
         self.job_id = self.generate_job_id()
+        self.phase_timer = PhaseTimer()
 
     @classmethod
     def generate_job_id(cls):
@@ -68,6 +70,13 @@ class BackgroundJob(object):
     def run(self, **kwargs):
         pass
 
+    def phase(self, name):
+        """Time a step of the job, e.g. 'with self.phase('copy') as phase: ...', optionally calling phase.add_rows(count).
+
+        Timings of all phases are saved with the job status.
+        """
+        return self.phase_timer.phase(name)
+
     def run_async(self, lock_id=None, **async_opts):
         if os.environ.get('NESSIE_ENV') in ['test', 'testext']:
             app.logger.info('Test run in progress; will not muddy the waters by actually kicking off a background thread.')
@@ -96,6 +105,7 @@ class BackgroundJob(object):
     def run_wrapped(self, **kwargs):
         lock_id = kwargs.pop('lock_id', None)
         with advisory_lock(lock_id):
+            self.phase_timer = PhaseTimer()
             if self.status_logging_enabled:
                 create_background_job_status(self.job_id)
             try:
@@ -109,6 +119,8 @@ class BackgroundJob(object):
                 app.logger.exception(e)
                 result = None
                 error = str(e)
+            if self.phase_timer.phases:
+                app.logger.info(f'{self.job_id} phases: {self.phase_timer.summary()}')
             if self.status_logging_enabled:
                 if result:
                     status = 'succeeded'
@@ -120,7 +132,7 @@ class BackgroundJob(object):
                 else:
                     status = 'failed'
                     details = error
-                update_background_job_status(self.job_id, status, details=details)
+                update_background_job_status(self.job_id, status, details=details, phases=self.phase_timer.to_api_json())
             return result
 
 
@@ -128,7 +140,9 @@ class ChainedBackgroundJob(BackgroundJob):
 
     def run(self, steps):
         for step in steps:
-            if not step.run_wrapped():
+            with self.phase(step.__class__.__name__):
+                step_result = step.run_wrapped()
+            if not step_result:
                 app.logger.error('Component job returned an error; aborting remainder of chain.')
                 return False
         return True
@@ -26,6 +26,7 @@ ENHANCEMENTS, OR MODIFICATIONS.
 from flask import current_app as app
 from nessie.externals import redshift
 from nessie.jobs.background_job import BackgroundJob, BackgroundJobError, verify_external_schema
+from nessie.lib.queries import bump_student_population_epoch
 from nessie.lib.util import resolve_sql_template
 
 """Logic for CalNet schema creation job."""
@@ -49,6 +50,7 @@ class CreateCalNetSchema(BackgroundJob):
 
         if redshift.execute_ddl_script(resolved_ddl):
             verify_external_schema(external_schema, resolved_ddl)
+            bump_student_population_epoch()
             return 'CalNet schema creation job completed.'
         else:
             raise BackgroundJobError(f'CalNet schema creation job failed.')
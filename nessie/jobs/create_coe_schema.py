@@ -30,6 +30,7 @@ import operator
 from flask import current_app as app
 from nessie.externals import rds, redshift, s3
 from nessie.jobs.background_job import BackgroundJob, BackgroundJobError, verify_external_schema
+from nessie.lib.queries import bump_student_population_epoch
 from nessie.lib.util import encoded_tsv_row, get_s3_coe_daily_path, resolve_sql_template, resolve_sql_template_string
 import psycopg2
 
@@ -114,6 +115,7 @@ class CreateCoeSchema(BackgroundJob):
                 transaction.rollback()
                 raise BackgroundJobError('Error refreshing RDS indexes.')
 
+        bump_student_population_epoch()
         return 'COE internal schema created.'
 
     def refresh_rds_indexes(self, coe_rows, transaction):
@@ -126,8 +128,9 @@ class CreateCoeSchema(BackgroundJob):
                 'sat1read', 'sat1math', 'sat2math', 'in_met', 'grad_term', 'grad_year',
                 'probation', 'status',
             ]
-            result = transaction.insert_bulk(
-                f'INSERT INTO {rds_schema}.students ({", ".join(columns)}) VALUES %s',
+            result = transaction.copy_rows(
+                f'{rds_schema}.students',
+                columns,
                 [tuple([r[c] for c in columns]) for r in coe_rows],
             )
             if not result:
@@ -123,8 +123,9 @@ class CreateSisSchema(BackgroundJob):
         if not result:
             return False
         columns = ['term_id', 'term_name', 'term_begins', 'term_ends']
-        result = transaction.insert_bulk(
-            f'INSERT INTO {rds_schema}.term_definitions ({", ".join(columns)}) VALUES %s',
+        result = transaction.copy_rows(
+            f'{rds_schema}.term_definitions',
+            columns,
             [tuple([r[c] for c in columns]) for r in rows],
         )
         if not result:
@@ -27,6 +27,7 @@ ENHANCEMENTS, OR MODIFICATIONS.
 from flask import current_app as app
 from nessie.externals import rds, redshift
 from nessie.jobs.background_job import BackgroundJob, BackgroundJobError, verify_external_schema
+from nessie.lib.queries import bump_student_population_epoch
 from nessie.lib.util import resolve_sql_template
 import psycopg2
 
@@ -61,6 +62,7 @@ class CreateUndergradsSchema(BackgroundJob):
                 transaction.rollback()
                 raise BackgroundJobError('Error refreshing RDS indexes.')
 
+        bump_student_population_epoch()
         return 'Undergrads internal schema created.'
 
     def refresh_rds_indexes(self, undergrads_rows, transaction):
@@ -73,8 +75,9 @@ class CreateUndergradsSchema(BackgroundJob):
                 'acadplan_code', 'acadplan_descr',
                 'acadplan_type_code', 'acadplan_ownedby_code',
             ]
-            result = transaction.insert_bulk(
-                f'INSERT INTO {rds_schema}.students ({", ".join(columns)}) VALUES %s',
+            result = transaction.copy_rows(
+                f'{rds_schema}.students',
+                columns,
                 [tuple([r[c] for c in columns]) for r in undergrads_rows],
             )
             if not result:
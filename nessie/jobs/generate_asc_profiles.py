@@ -81,9 +81,9 @@ class GenerateAscProfiles(BackgroundJob):
 
             profile_rows.append(encoded_tsv_row([sid, json.dumps(athletics_profile)]))
 
-        s3_key = f'{get_s3_asc_daily_path()}/athletics_profiles.tsv'
-        app.logger.info(f'Will stash {len(profile_rows)} feeds in S3: {s3_key}')
-        if not s3.upload_tsv_rows(profile_rows, s3_key):
+        manifest_key, part_keys = redshift.copy_manifest_keys(f'{get_s3_asc_daily_path()}/athletics_profiles')
+        app.logger.info(f'Will stash {len(profile_rows)} feeds in S3: {manifest_key}')
+        if not s3.upload_tsv_rows_gz_manifest(profile_rows, manifest_key, part_keys):
             raise BackgroundJobError('Error on S3 upload: aborting job.')
 
         app.logger.info('Will copy S3 feeds into Redshift...')
@@ -91,10 +91,13 @@ class GenerateAscProfiles(BackgroundJob):
             """
             TRUNCATE {redshift_schema_asc}.student_profiles;
             COPY {redshift_schema_asc}.student_profiles
-                FROM '{loch_s3_asc_data_path}/athletics_profiles.tsv'
+                FROM '{manifest_url}'
                 IAM_ROLE '{redshift_iam_role}'
-                DELIMITER '\\t';
+                DELIMITER '\\t'
+                GZIP
+                MANIFEST;
             """,
+            manifest_url=s3.build_s3_url(manifest_key),
         )
         if not redshift.execute(query):
             app.logger.error('Error on Redshift copy: aborting job.')
@@ -125,8 +128,9 @@ class GenerateAscProfiles(BackgroundJob):
             if not transaction.execute(f'TRUNCATE {rds_schema}.students'):
                 return False
             columns = ['sid', 'active', 'intensive', 'status_asc', 'group_code', 'group_name', 'team_code', 'team_name']
-            result = transaction.insert_bulk(
-                f'INSERT INTO {rds_schema}.students ({", ".join(columns)}) VALUES %s',
+            result = transaction.copy_rows(
+                f'{rds_schema}.students',
+                columns,
                 [tuple([r[c] for c in columns]) for r in asc_rows],
             )
             if not result:
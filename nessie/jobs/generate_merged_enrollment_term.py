@@ -32,9 +32,10 @@ from flask import current_app as app
 from nessie.externals import redshift, s3
 from nessie.jobs.background_job import BackgroundJob, BackgroundJobError
 from nessie.lib import queries
-from nessie.lib.analytics import merge_analytics_for_course, merge_assignment_submissions_for_user
+from nessie.lib.analytics import CourseDistributionCache, merge_analytics_for_course, merge_assignment_submissions_for_user
 from nessie.lib.berkeley import reverse_term_ids
 from nessie.lib.util import encoded_tsv_row
+from nessie.merged.student_terms import get_student_term_map_items
 from nessie.models import student_schema
 
 
@@ -43,7 +44,11 @@ class GenerateMergedEnrollmentTerm(BackgroundJob):
     def run(self, term_id):
         merged_enrollment_term = self.merge_analytics_data_for_term(term_id)
         self.refresh_student_enrollment_term(term_id, merged_enrollment_term)
-        return f'Generated merged feeds for term {term_id} ({self.course_count} courses, {self.user_count} users).'
+        return (
+            f'Generated merged feeds for term {term_id} ({self.course_count} courses, {self.user_count} users, '
+            f'{self.distribution_cache_hits} of {self.distribution_cache_hits + self.distribution_cache_misses} '
+            'course distributions reused).'
+        )
 
     def refresh_student_enrollment_term(self, term_id, enrollment_term_map):
         with tempfile.TemporaryFile() as enrollment_term_file:
@@ -66,33 +71,33 @@ class GenerateMergedEnrollmentTerm(BackgroundJob):
         if not advisees_by_canvas_id:
             raise BackgroundJobError(f'Failed to retrieve advisee map at {advisees_by_canvas_id_path}, aborting')
 
-        enrollment_term_map_path = feed_path + f'enrollment_term_map_{term_id}.json'
-        enrollment_term_map = s3.get_object_json(enrollment_term_map_path)
+        enrollment_term_map_items = get_student_term_map_items('enrollment_term_map', term_id)
+        enrollment_term_map = enrollment_term_map_items and dict(enrollment_term_map_items)
         if not enrollment_term_map:
-            raise BackgroundJobError(f'Failed to retrieve enrollment term map at {enrollment_term_map_path}, aborting')
+            raise BackgroundJobError(f'Failed to retrieve enrollment term map for term {term_id}, aborting')
 
-        canvas_site_map = self.merge_canvas_analytics_for_term(term_id, feed_path)
+        canvas_site_map_items = self.merge_canvas_analytics_for_term(term_id)
 
-        self.merge_course_analytics_for_term(term_id, canvas_site_map, enrollment_term_map, advisees_by_canvas_id)
+        self.merge_course_analytics_for_term(term_id, canvas_site_map_items, enrollment_term_map, advisees_by_canvas_id)
         self.merge_advisee_assignment_submissions_for_term(term_id, enrollment_term_map, advisees_by_canvas_id)
         return enrollment_term_map
 
-    def merge_canvas_analytics_for_term(self, term_id, feed_path):
+    def merge_canvas_analytics_for_term(self, term_id):
         if term_id not in reverse_term_ids():
-            return {}
-        canvas_site_map_path = feed_path + f'canvas_site_map_{term_id}.json'
-        canvas_site_map = s3.get_object_json(canvas_site_map_path)
-        if not canvas_site_map:
-            raise BackgroundJobError(f'Failed to retrieve Canvas site map at {canvas_site_map_path}, aborting')
-        return canvas_site_map
-
-    def merge_course_analytics_for_term(self, term_id, canvas_site_map, enrollment_term_map, advisees_by_canvas_id):
-        app.logger.info(f'Starting non-assignment-submissions analytics merge for {len(canvas_site_map)} Canvas courses')
+            return []
+        # Canvas site map entries are needed only one course at a time, and so are streamed rather than loaded in full.
+        canvas_site_map_items = get_student_term_map_items('canvas_site_map', term_id)
+        if not canvas_site_map_items:
+            raise BackgroundJobError(f'Failed to retrieve Canvas site map for term {term_id}, aborting')
+        return canvas_site_map_items
+
+    def merge_course_analytics_for_term(self, term_id, canvas_site_map_items, enrollment_term_map, advisees_by_canvas_id):
+        app.logger.info(f'Starting non-assignment-submissions analytics merge for term {term_id}')
         course_count = 0
-        for (canvas_course_id, canvas_map_entry) in canvas_site_map.items():
+        for (canvas_course_id, canvas_map_entry) in canvas_site_map_items:
             course_count += 1
             if course_count % 100 == 0:
-                app.logger.debug(f'Merging Canvas course {course_count} of {len(canvas_site_map)}')
+                app.logger.debug(f'Merging Canvas course {course_count}')
             merge_analytics_for_course(term_id, canvas_map_entry, enrollment_term_map, advisees_by_canvas_id)
         app.logger.info(f'Course analytics merge complete: {course_count} courses merged.')
         self.course_count = course_count
@@ -106,6 +111,9 @@ class GenerateMergedEnrollmentTerm(BackgroundJob):
         merged_analytics = {}
         ids_without_merged_analytics = set(advisee_ids)
 
+        # Advisees enrolled in the same course share its distribution, which need be calculated only once per term.
+        distribution_cache = CourseDistributionCache()
+
         submission_counts_for_term_query = queries.get_advisee_submissions_sorted(term_id)
         for canvas_user_id, sites_grp in groupby(submission_counts_for_term_query, key=operator.itemgetter('reference_user_id')):
             user_count += 1
@@ -132,6 +140,7 @@ class GenerateMergedEnrollmentTerm(BackgroundJob):
                 advisee_term_feed,
                 canvas_user_id,
                 relative_submission_counts,
+                distribution_cache,
             )
             merged_analytics[canvas_user_id] = 'merged'
             ids_without_merged_analytics.remove(str(canvas_user_id))
@@ -143,7 +152,11 @@ class GenerateMergedEnrollmentTerm(BackgroundJob):
             if not advisee_term_feed:
                 # Nothing to merge.
                 continue
-            merge_assignment_submissions_for_user(advisee_term_feed, canvas_user_id, {})
+            merge_assignment_submissions_for_user(advisee_term_feed, canvas_user_id, {}, distribution_cache)
 
-        app.logger.info(f'Assignment submissions merge for term {term_id} complete: {user_count} users merged.')
+        app.logger.info(
+            f'Assignment submissions merge for term {term_id} complete: {user_count} users merged '
+            f'(course distribution cache: {distribution_cache.hits} hits, {distribution_cache.misses} misses).')
         self.user_count = user_count
+        self.distribution_cache_hits = distribution_cache.hits
+        self.distribution_cache_misses = distribution_cache.misses
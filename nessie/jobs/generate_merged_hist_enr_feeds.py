@@ -48,14 +48,10 @@ class GenerateMergedHistEnrFeeds(BackgroundJob):
     def run(self):
         app.logger.info(f'Starting merged non-advisee profile generation job.')
 
-        app.logger.info('Cleaning up old data...')
-        redshift.execute('VACUUM; ANALYZE;')
-
         status = self.generate_feeds()
 
-        # Clean up the workbench.
-        redshift.execute('VACUUM; ANALYZE;')
-        app.logger.info(f'Vacuumed and analyzed.')
+        # Clean up the workbench. Only tables written by this job need vacuuming.
+        student_schema.vacuum_and_analyze(['student_profiles_hist_enr', 'student_enrollment_terms_hist_enr'])
 
         return status
 
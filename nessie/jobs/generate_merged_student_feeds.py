@@ -23,25 +23,74 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+from itertools import islice
 import json
-from time import sleep
+import multiprocessing
+from timeit import default_timer as timer
 
 from flask import current_app as app
-from nessie.externals import rds, redshift, s3
+from nessie.externals import rds, s3
 from nessie.jobs.background_job import BackgroundJob, BackgroundJobError
 from nessie.jobs.generate_merged_enrollment_term import GenerateMergedEnrollmentTerm
 from nessie.lib.berkeley import current_term_id, future_term_id, future_term_ids, legacy_term_ids, reverse_term_ids
-from nessie.lib.metadata import get_merged_enrollment_term_job_status, queue_merged_enrollment_term_jobs
-from nessie.lib.queries import get_advisee_student_profile_elements
-from nessie.lib.util import encoded_tsv_row
-from nessie.merged.sis_profile import parse_merged_sis_profile
-from nessie.merged.sis_profile_v1 import parse_merged_sis_profile_v1
-from nessie.merged.student_demographics import add_demographics_rows, refresh_rds_demographics
-from nessie.merged.student_terms import upload_student_term_maps
+from nessie.lib.metadata import get_merged_enrollment_term_job_status, merged_enrollment_term_status_channel
+from nessie.lib.metadata import queue_merged_enrollment_term_jobs, update_merged_feed_fingerprints
+from nessie.lib.queries import get_advisee_student_profile_elements, get_merged_feed_fingerprints
+from nessie.lib.rds_delta import changed_sids_union, delta_sync_rds_table
+from nessie.lib.util import dblink_sid_filter
+from nessie.merged.student_demographics import refresh_rds_demographics
+from nessie.merged.student_profile import generate_profile_rows_in_worker, generate_student_profile_feed
+from nessie.merged.student_profile import initialize_worker_process, worker_config
+from nessie.merged.student_terms import get_student_term_map_items, upload_student_term_maps
 from nessie.models import student_schema
 
 """Logic for merged student profile and term generation."""
 
+PROFILE_TABLES = [
+    'student_profiles', 'student_academic_status', 'student_majors', 'student_holds',
+    'demographics', 'ethnicities', 'visas',
+]
+
+# Columns of RDS index tables copied from Redshift, with whether rows are deduplicated, for delta sync.
+RDS_INDEX_TABLES = {
+    'student_academic_status': {
+        'columns': [
+            ('sid', 'VARCHAR'),
+            ('uid', 'VARCHAR'),
+            ('first_name', 'VARCHAR'),
+            ('last_name', 'VARCHAR'),
+            ('level', 'VARCHAR'),
+            ('gpa', 'NUMERIC'),
+            ('units', 'NUMERIC'),
+            ('transfer', 'BOOLEAN'),
+            ('expected_grad_term', 'VARCHAR'),
+        ],
+        'distinct': True,
+    },
+    'student_holds': {
+        'columns': [('sid', 'VARCHAR'), ('feed', 'TEXT')],
+        'distinct': False,
+    },
+    'student_majors': {
+        'columns': [('sid', 'VARCHAR'), ('major', 'VARCHAR')],
+        'distinct': True,
+    },
+    'student_profiles': {
+        'columns': [('sid', 'VARCHAR'), ('profile', 'TEXT')],
+        'distinct': False,
+    },
+}
+
+# Number of students per task when profile generation is spread across worker processes.
+PROFILE_BATCH_SIZE = 500
+
+
+def feed_elements_fingerprint(feed_elements):
+    return hashlib.md5(json.dumps(feed_elements, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
 
 class GenerateMergedStudentFeeds(BackgroundJob):
 
@@ -49,45 +98,49 @@ class GenerateMergedStudentFeeds(BackgroundJob):
     rds_dblink_to_redshift = app.config['REDSHIFT_DATABASE'] + '_redshift'
     redshift_schema = app.config['REDSHIFT_SCHEMA_STUDENT']
 
-    def run(self, term_id=None):
-        app.logger.info(f'Starting merged profile generation job.')
+    def run(self, term_id=None, load_mode='changed'):
+        """Generate merged profiles and enrollment terms.
+
+        By default, only students whose input feed elements have changed since the last run have their profiles
+        regenerated. Pass load_mode='all' to regenerate every profile, as is needed after changes to parsing logic.
+        """
+        app.logger.info(f'Starting merged profile generation job (load_mode={load_mode}).')
 
         # This version of the code will always generate feeds for all-terms and all-advisees, but we
         # expect support for term-specific or backfill-specific feed generation will return soon.
         if term_id != 'all':
             app.logger.warn(f'Term-specific generation was requested for {term_id}, but all terms will be generated.')
 
-        app.logger.info('Cleaning up old data...')
-        redshift.execute('VACUUM; ANALYZE;')
-
-        status = self.generate_feeds()
+        status = self.generate_feeds(load_mode)
 
-        # Clean up the workbench.
-        redshift.execute('VACUUM; ANALYZE;')
-        app.logger.info(f'Vacuumed and analyzed.')
+        # Clean up the workbench. Only tables written by this job need vacuuming.
+        with self.phase('vacuum'):
+            student_schema.vacuum_and_analyze(PROFILE_TABLES + ['student_enrollment_terms'])
 
         return status
 
-    def generate_feeds(self):
+    def generate_feeds(self, load_mode='changed'):
         # Translation between canvas_user_id and UID/SID is needed to merge Canvas analytics data and SIS enrollment-based data.
         advisees_by_canvas_id = {}
         advisees_by_sid = {}
         self.successes = []
         self.failures = []
-        profile_tables = self.generate_student_profile_tables(advisees_by_canvas_id, advisees_by_sid)
+        profile_tables = self.generate_student_profile_tables(advisees_by_canvas_id, advisees_by_sid, load_mode)
         if not profile_tables:
             raise BackgroundJobError('Failed to generate student profile tables.')
 
-        feed_path = app.config['LOCH_S3_BOAC_ANALYTICS_DATA_PATH'] + '/feeds/'
-        s3.upload_json(advisees_by_canvas_id, feed_path + 'advisees_by_canvas_id.json')
-
-        upload_student_term_maps(advisees_by_sid)
+        with self.phase('s3_upload'):
+            feed_path = app.config['LOCH_S3_BOAC_ANALYTICS_DATA_PATH'] + '/feeds/'
+            s3.upload_json(advisees_by_canvas_id, feed_path + 'advisees_by_canvas_id.json')
+            upload_student_term_maps(advisees_by_sid)
 
         # Avoid processing Canvas analytics data for future terms and pre-CS terms.
-        for term_id in (future_term_ids() + legacy_term_ids()):
-            enrollment_term_map = s3.get_object_json(feed_path + f'enrollment_term_map_{term_id}.json')
-            if enrollment_term_map:
-                GenerateMergedEnrollmentTerm().refresh_student_enrollment_term(term_id, enrollment_term_map)
+        with self.phase('future_and_legacy_terms'):
+            for term_id in (future_term_ids() + legacy_term_ids()):
+                enrollment_term_map_items = get_student_term_map_items('enrollment_term_map', term_id)
+                enrollment_term_map = enrollment_term_map_items and dict(enrollment_term_map_items)
+                if enrollment_term_map:
+                    GenerateMergedEnrollmentTerm().refresh_student_enrollment_term(term_id, enrollment_term_map)
 
         canvas_integrated_term_ids = reverse_term_ids()
         app.logger.info(f'Will queue analytics generation for {len(canvas_integrated_term_ids)} terms on worker nodes.')
@@ -95,31 +148,27 @@ class GenerateMergedStudentFeeds(BackgroundJob):
         if not result:
             raise BackgroundJobError('Failed to queue enrollment term jobs.')
 
-        student_schema.refresh_all_from_staging(profile_tables)
-        with rds.transaction() as transaction:
-            if self.refresh_rds_indexes(None, transaction):
-                transaction.commit()
-                app.logger.info('Refreshed RDS indexes.')
-            else:
-                transaction.rollback()
-                raise BackgroundJobError('Failed to refresh RDS indexes.')
+        self.refresh_profile_tables(profile_tables)
 
         app.logger.info('Profile generation complete; waiting for enrollment term generation to finish.')
 
-        while True:
-            sleep(1)
-            enrollment_results = get_merged_enrollment_term_job_status(self.job_id)
-            if not enrollment_results:
-                raise BackgroundJobError('Failed to refresh RDS indexes.')
-            any_pending_job = next((row for row in enrollment_results if row['status'] == 'created' or row['status'] == 'started'), None)
-            if not any_pending_job:
-                break
+        # Workers notify on each status update; without notifications, job status is polled every second.
+        with self.phase('enrollment_term_wait'), rds.notification_listener(merged_enrollment_term_status_channel(), fallback_interval=1) as listener:
+            while True:
+                enrollment_results = get_merged_enrollment_term_job_status(self.job_id)
+                if not enrollment_results:
+                    raise BackgroundJobError('Failed to refresh RDS indexes.')
+                any_pending_job = next((row for row in enrollment_results if row['status'] == 'created' or row['status'] == 'started'), None)
+                if not any_pending_job:
+                    break
+                listener.wait(app.config['MERGED_ENROLLMENT_TERM_NOTIFY_TIMEOUT'])
 
         app.logger.info('Exporting analytics data for archival purposes.')
-        student_schema.unload_enrollment_terms([current_term_id(), future_term_id()])
+        with self.phase('s3_unload'):
+            student_schema.unload_enrollment_terms([current_term_id(), future_term_id()])
 
         app.logger.info('Refreshing enrollment terms in RDS.')
-        with rds.transaction() as transaction:
+        with self.phase('rds_enrollment_terms'), rds.transaction() as transaction:
             if self.refresh_rds_enrollment_terms(None, transaction):
                 transaction.commit()
                 app.logger.info('Refreshed RDS enrollment terms.')
@@ -127,7 +176,10 @@ class GenerateMergedStudentFeeds(BackgroundJob):
                 transaction.rollback()
                 raise BackgroundJobError('Failed to refresh RDS enrollment terms.')
 
-        status_string = f'Generated merged profiles ({len(self.successes)} successes, {len(self.failures)} failures).'
+        status_string = f'Generated merged profiles ({len(self.successes)} successes, {len(self.failures)} failures'
+        if self.changed_sids is not None:
+            status_string += f', {len(self.changed_sids)} changed'
+        status_string += ').'
         errored = False
         for row in enrollment_results:
             status_string += f" {row['details']}"
@@ -140,113 +192,197 @@ class GenerateMergedStudentFeeds(BackgroundJob):
         else:
             return status_string
 
-    def generate_student_profile_tables(self, advisees_by_canvas_id, advisees_by_sid):
-        # In-memory storage for generated feeds prior to TSV output.
-        # TODO: store in Redis or filesystem to free up memory
-        rows = {
-            'student_profiles': [],
-            'student_academic_status': [],
-            'student_majors': [],
-            'student_holds': [],
-            'demographics': [],
-            'ethnicities': [],
-            'visas': [],
-        }
-        tables = [
-            'student_profiles', 'student_academic_status', 'student_majors', 'student_holds',
-            'demographics', 'ethnicities', 'visas',
-        ]
+    def generate_student_profile_tables(self, advisees_by_canvas_id, advisees_by_sid, load_mode='changed'):
+        tables = PROFILE_TABLES
         for table in tables:
             student_schema.truncate_staging_table(table)
 
+        # Fingerprints of each student's input feed elements as of the last run. If there are none to compare against,
+        # all profiles are regenerated and all destination tables rebuilt.
+        previous_fingerprints = {}
+        if load_mode != 'all':
+            previous_fingerprints = {row['sid']: row['fingerprint'] for row in (get_merged_feed_fingerprints() or [])}
+        self.fingerprints = {}
+        self.changed_sids = [] if previous_fingerprints else None
+
+        # Feed elements are streamed from Redshift, and generated feeds streamed to row sinks, rather than held in memory.
         all_student_feed_elements = get_advisee_student_profile_elements()
-        if not all_student_feed_elements:
-            app.logger.error(f'No profile feeds returned, aborting job.')
+        if all_student_feed_elements is None:
+            app.logger.error('Failed to retrieve profile feeds, aborting job.')
             return False
-        count = len(all_student_feed_elements)
-        app.logger.info(f'Will generate feeds for {count} students.')
-        for index, feed_elements in enumerate(all_student_feed_elements):
-            sid = feed_elements['sid']
-            merged_profile = self.generate_student_profile_feed(feed_elements, rows)
-            if merged_profile:
-                canvas_user_id = feed_elements['canvas_user_id']
-                if canvas_user_id:
-                    advisees_by_canvas_id[canvas_user_id] = {'sid': sid, 'uid': feed_elements['ldap_uid']}
-                    advisees_by_sid[sid] = {'canvas_user_id': canvas_user_id}
-                self.successes.append(sid)
-            else:
-                self.failures.append(sid)
-        for table in tables:
-            if rows[table]:
-                student_schema.write_to_staging(table, rows[table])
+        if previous_fingerprints:
+            app.logger.info(f'Will generate feeds for advisees with changed feed elements ({len(previous_fingerprints)} previous fingerprints).')
+            all_student_feed_elements = self.changed_feed_elements(
+                all_student_feed_elements,
+                previous_fingerprints,
+                advisees_by_canvas_id,
+                advisees_by_sid,
+            )
+        else:
+            app.logger.info('Will generate feeds for all advisees.')
+            all_student_feed_elements = self.fingerprinted_feed_elements(all_student_feed_elements)
+
+        rows = {table: student_schema.get_row_sink(table) for table in tables}
+        try:
+            # Feed elements are fetched as profiles are generated, so this phase covers both.
+            with self.phase('fetch_and_generate_profiles') as phase:
+                self.generate_profile_rows(all_student_feed_elements, rows, advisees_by_canvas_id, advisees_by_sid)
+                phase.add_rows(len(self.successes) + len(self.failures))
+            count = len(self.successes) + len(self.failures)
+            if not count:
+                app.logger.error(f'No profile feeds returned, aborting job.')
+                return False
+            if self.changed_sids is not None:
+                # Students no longer among advisees have their rows deleted along with those of changed students.
+                self.changed_sids += [sid for sid in previous_fingerprints.keys() if sid not in self.fingerprints]
+                app.logger.info(f'Found {len(self.changed_sids)} of {count} students with changed or removed feed elements.')
+            with self.phase('copy_to_staging'):
+                for table in tables:
+                    if rows[table]:
+                        student_schema.write_to_staging(table, rows[table])
+        finally:
+            for row_sink in rows.values():
+                row_sink.close()
         return tables
 
-    def generate_student_profile_feed(self, feed_elements, rows):
+    def fingerprinted_feed_elements(self, all_student_feed_elements):
+        for feed_elements in all_student_feed_elements:
+            self.fingerprints[feed_elements['sid']] = feed_elements_fingerprint(feed_elements)
+            yield feed_elements
+
+    def changed_feed_elements(self, all_student_feed_elements, previous_fingerprints, advisees_by_canvas_id, advisees_by_sid):
+        for feed_elements in all_student_feed_elements:
+            sid = feed_elements['sid']
+            fingerprint = feed_elements_fingerprint(feed_elements)
+            self.fingerprints[sid] = fingerprint
+            if previous_fingerprints.get(sid) == fingerprint:
+                # Unchanged profiles stay as they are in Redshift and RDS, but are still needed for advisee lookups.
+                self.record_profile_result(feed_elements, bool(feed_elements['ldap_uid']), advisees_by_canvas_id, advisees_by_sid)
+            else:
+                self.changed_sids.append(sid)
+                yield feed_elements
+
+    def generate_profile_rows(self, all_student_feed_elements, rows, advisees_by_canvas_id, advisees_by_sid):
+        process_count = app.config['MERGED_PROFILE_PROCESSES']
+        start_loop = timer()
+        if process_count > 1:
+            self.generate_profile_rows_in_processes(process_count, all_student_feed_elements, rows, advisees_by_canvas_id, advisees_by_sid)
+        else:
+            for feed_elements in all_student_feed_elements:
+                merged_profile = generate_student_profile_feed(feed_elements, rows)
+                self.record_profile_result(feed_elements, bool(merged_profile), advisees_by_canvas_id, advisees_by_sid)
+        count = len(self.successes) + len(self.failures)
+        app.logger.info(f'Generated feeds for {count} students in {timer() - start_loop} secs ({process_count} process(es)).')
+
+    def generate_profile_rows_in_processes(self, process_count, all_student_feed_elements, rows, advisees_by_canvas_id, advisees_by_sid):
+        # JSON parsing and profile merging are CPU-bound, so batches of students are farmed out to worker processes.
+        # Results are merged in submission order, and so table rows come out exactly as they would from a single process.
+        with ProcessPoolExecutor(
+            max_workers=process_count,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=initialize_worker_process,
+            initargs=(worker_config(),),
+        ) as executor:
+            pending = deque()
+            feed_elements_iterator = iter(all_student_feed_elements)
+            while True:
+                feed_elements_batch = list(islice(feed_elements_iterator, PROFILE_BATCH_SIZE))
+                if feed_elements_batch:
+                    pending.append((feed_elements_batch, executor.submit(generate_profile_rows_in_worker, feed_elements_batch, list(rows))))
+                # Limit the batches in flight so that streamed feed elements are not all pulled into memory at once.
+                while pending and (len(pending) >= 2 * process_count or not feed_elements_batch):
+                    (completed_batch, future) = pending.popleft()
+                    (batch_rows, profiles_generated) = future.result()
+                    for table, table_rows in batch_rows.items():
+                        for row in table_rows:
+                            rows[table].append(row)
+                    for feed_elements, profile_generated in zip(completed_batch, profiles_generated):
+                        self.record_profile_result(feed_elements, profile_generated, advisees_by_canvas_id, advisees_by_sid)
+                if not feed_elements_batch:
+                    break
+
+    def record_profile_result(self, feed_elements, profile_generated, advisees_by_canvas_id, advisees_by_sid):
         sid = feed_elements['sid']
-        uid = feed_elements['ldap_uid']
-        if not uid:
-            return
-        if app.config['STUDENT_V1_API_PREFERRED']:
-            sis_profile = parse_merged_sis_profile_v1(feed_elements)
+        if profile_generated:
+            canvas_user_id = feed_elements['canvas_user_id']
+            if canvas_user_id:
+                advisees_by_canvas_id[canvas_user_id] = {'sid': sid, 'uid': feed_elements['ldap_uid']}
+                advisees_by_sid[sid] = {'canvas_user_id': canvas_user_id}
+            self.successes.append(sid)
         else:
-            sis_profile = parse_merged_sis_profile(feed_elements)
-        demographics = feed_elements.get('demographics_feed') and json.loads(feed_elements.get('demographics_feed'))
-        if demographics:
-            demographics = add_demographics_rows(sid, demographics, rows)
-
-        merged_profile = {
-            'sid': sid,
-            'uid': uid,
-            'firstName': feed_elements.get('first_name'),
-            'lastName': feed_elements.get('last_name'),
-            'name': ' '.join([feed_elements.get('first_name'), feed_elements.get('last_name')]),
-            'canvasUserId': feed_elements.get('canvas_user_id'),
-            'canvasUserName': feed_elements.get('canvas_user_name'),
-            'sisProfile': sis_profile,
-            'demographics': demographics,
-        }
-        rows['student_profiles'].append(encoded_tsv_row([sid, json.dumps(merged_profile)]))
-
-        if sis_profile:
-            first_name = merged_profile['firstName'] or ''
-            last_name = merged_profile['lastName'] or ''
-            level = str(sis_profile.get('level', {}).get('code') or '')
-            gpa = str(sis_profile.get('cumulativeGPA') or '')
-            units = str(sis_profile.get('cumulativeUnits') or '')
-            transfer = str(sis_profile.get('transfer') or False)
-            expected_grad_term = str(sis_profile.get('expectedGraduationTerm', {}).get('id') or '')
-
-            rows['student_academic_status'].append(
-                encoded_tsv_row([sid, uid, first_name, last_name, level, gpa, units, transfer, expected_grad_term]),
-            )
-
-            for plan in sis_profile.get('plans', []):
-                if plan.get('status') == 'Active':
-                    rows['student_majors'].append(encoded_tsv_row([sid, plan['description']]))
-            for hold in sis_profile.get('holds', []):
-                rows['student_holds'].append(encoded_tsv_row([sid, json.dumps(hold)]))
+            self.failures.append(sid)
 
-        return merged_profile
+    def refresh_profile_tables(self, profile_tables):
+        sids = self.changed_sids
+        if sids is not None and not sids:
+            app.logger.info('No changed feed elements; profile tables in Redshift and RDS are left as they are.')
+            return
+        with self.phase('redshift_refresh'):
+            student_schema.refresh_all_from_staging(profile_tables, sids)
+        with self.phase('rds_refresh') as phase, rds.transaction() as transaction:
+            if sids is not None:
+                phase.add_rows(len(sids))
+            if self.refresh_rds_indexes(sids, transaction):
+                transaction.commit()
+                app.logger.info('Refreshed RDS indexes.')
+            else:
+                transaction.rollback()
+                raise BackgroundJobError('Failed to refresh RDS indexes.')
+        # Fingerprints are saved only once the profiles generated from them are in place.
+        if sids is None:
+            update_merged_feed_fingerprints(self.fingerprints, [], replace_all=True)
+        else:
+            changed_fingerprints = {sid: self.fingerprints[sid] for sid in sids if sid in self.fingerprints}
+            deleted_sids = [sid for sid in sids if sid not in self.fingerprints]
+            update_merged_feed_fingerprints(changed_fingerprints, deleted_sids)
 
     def refresh_rds_indexes(self, sids, transaction):
+        if sids is None and app.config['MERGED_RDS_INDEX_DELTA_SYNC']:
+            return self.delta_sync_rds_indexes(transaction)
         if not (
             self._delete_rds_rows('student_academic_status', sids, transaction)
-            and self._refresh_rds_academic_status(transaction)
+            and self._refresh_rds_academic_status(sids, transaction)
             and self._delete_rds_rows('student_holds', sids, transaction)
-            and self._refresh_rds_holds(transaction)
+            and self._refresh_rds_holds(sids, transaction)
             and self._delete_rds_rows('student_names', sids, transaction)
-            and self._refresh_rds_names(transaction)
+            and self._refresh_rds_names(sids, transaction)
             and self._delete_rds_rows('student_majors', sids, transaction)
-            and self._refresh_rds_majors(transaction)
+            and self._refresh_rds_majors(sids, transaction)
             and self._delete_rds_rows('student_profiles', sids, transaction)
-            and self._refresh_rds_profiles(transaction)
-            and self._index_rds_email_address(transaction)
-            and self._index_rds_entering_term(transaction)
-            and refresh_rds_demographics(self.rds_schema, self.rds_dblink_to_redshift, self.redshift_schema, transaction)
+            and self._refresh_rds_profiles(sids, transaction)
+            and self._index_rds_email_address(sids, transaction)
+            and self._index_rds_entering_term(sids, transaction)
+            and refresh_rds_demographics(self.rds_schema, self.rds_dblink_to_redshift, self.redshift_schema, transaction, sids)
         ):
             return False
         return True
 
+    def delta_sync_rds_indexes(self, transaction):
+        # Rows are sent over dblink, and derived indexes rebuilt, only for SIDs whose Redshift rows have changed.
+        changed_sids = {}
+        for table, definition in RDS_INDEX_TABLES.items():
+            changed_sids[table] = delta_sync_rds_table(
+                transaction,
+                self.rds_schema,
+                self.rds_dblink_to_redshift,
+                self.redshift_schema,
+                table,
+                definition['columns'],
+                definition['distinct'],
+            )
+            if changed_sids[table] is None:
+                return False
+        # Each of these is None if all rows were reloaded, and an empty list if none changed.
+        name_sids = changed_sids_union(changed_sids['student_academic_status'])
+        if name_sids is None or name_sids:
+            if not (self._delete_rds_rows('student_names', name_sids, transaction) and self._refresh_rds_names(name_sids, transaction)):
+                return False
+        index_sids = changed_sids_union(changed_sids['student_academic_status'], changed_sids['student_profiles'])
+        if index_sids is None or index_sids:
+            if not (self._index_rds_email_address(index_sids, transaction) and self._index_rds_entering_term(index_sids, transaction)):
+                return False
+        return refresh_rds_demographics(self.rds_schema, self.rds_dblink_to_redshift, self.redshift_schema, transaction, delta=True)
+
     def refresh_rds_enrollment_terms(self, sids, transaction):
         if not (
             self._delete_rds_rows('student_enrollment_terms', sids, transaction)
@@ -259,20 +395,18 @@ class GenerateMergedStudentFeeds(BackgroundJob):
 
     def _delete_rds_rows(self, table, sids, transaction):
         if sids:
-            sql = f'DELETE FROM {self.rds_schema}.{table} WHERE sid = ANY(%s)'
-            params = (sids,)
+            return transaction.execute(f'DELETE FROM {self.rds_schema}.{table} WHERE sid = ANY({{sids}})', sids=sids)
         else:
-            sql = f'TRUNCATE {self.rds_schema}.{table}'
-            params = None
-        return transaction.execute(sql, params)
+            return transaction.execute(f'TRUNCATE {self.rds_schema}.{table}')
 
-    def _refresh_rds_academic_status(self, transaction):
+    def _refresh_rds_academic_status(self, sids, transaction):
         return transaction.execute(
             f"""INSERT INTO {self.rds_schema}.student_academic_status (
             SELECT *
             FROM dblink('{self.rds_dblink_to_redshift}',$REDSHIFT$
                 SELECT DISTINCT sid, uid, first_name, last_name, level, gpa, units, transfer, expected_grad_term
                 FROM {self.redshift_schema}.student_academic_status
+                {dblink_sid_filter(sids)}
               $REDSHIFT$)
             AS redshift_academic_status (
                 sid VARCHAR,
@@ -287,16 +421,15 @@ class GenerateMergedStudentFeeds(BackgroundJob):
             ));""",
         )
 
-    def _index_rds_email_address(self, transaction):
-        return transaction.execute(
-            f"""UPDATE {self.rds_schema}.student_academic_status sas
+    def _index_rds_email_address(self, sids, transaction):
+        sql = f"""UPDATE {self.rds_schema}.student_academic_status sas
             SET email_address = lower(p.profile::json->'sisProfile'->>'emailAddress')
             FROM {self.rds_schema}.student_profiles p
-            WHERE sas.sid = p.sid;""",
-        )
+            WHERE sas.sid = p.sid"""
+        return self._execute_for_sids(sql, 'sas', sids, transaction)
 
-    def _index_rds_entering_term(self, transaction):
-        return transaction.execute(
+    def _index_rds_entering_term(self, sids, transaction):
+        return self._execute_for_sids(
             # Equivalent to lib.berkeley.sis_term_id_for_name.
             f"""UPDATE {self.rds_schema}.student_academic_status sas
             SET entering_term =
@@ -308,16 +441,20 @@ class GenerateMergedStudentFeeds(BackgroundJob):
             WHEN 'Winter' THEN 0 WHEN 'Spring' THEN 2 WHEN 'Summer' THEN 5 WHEN 'Fall' THEN 8 END
             FROM {self.rds_schema}.student_profiles p
             WHERE p.sid = sas.sid
-            AND p.profile::json->'sisProfile'->>'matriculation' IS NOT NULL;""",
+            AND p.profile::json->'sisProfile'->>'matriculation' IS NOT NULL""",
+            'sas',
+            sids,
+            transaction,
         )
 
-    def _refresh_rds_holds(self, transaction):
+    def _refresh_rds_holds(self, sids, transaction):
         return transaction.execute(
             f"""INSERT INTO {self.rds_schema}.student_holds (
             SELECT *
                 FROM dblink('{self.rds_dblink_to_redshift}',$REDSHIFT$
                     SELECT sid, feed
                     FROM {self.redshift_schema}.student_holds
+                    {dblink_sid_filter(sids)}
               $REDSHIFT$)
             AS redshift_holds (
                 sid VARCHAR,
@@ -325,28 +462,31 @@ class GenerateMergedStudentFeeds(BackgroundJob):
             ));""",
         )
 
-    def _refresh_rds_names(self, transaction):
+    def _refresh_rds_names(self, sids, transaction):
+        sid_filter = 'WHERE sid = ANY(%(sids)s)' if sids else ''
         return transaction.execute(
             f"""INSERT INTO {self.rds_schema}.student_names (
             SELECT DISTINCT sid, unnest(string_to_array(
                 regexp_replace(upper(first_name), '[^\w ]', '', 'g'),
                 ' '
-            )) AS name FROM {self.rds_schema}.student_academic_status
+            )) AS name FROM {self.rds_schema}.student_academic_status {sid_filter}
             UNION
             SELECT DISTINCT sid, unnest(string_to_array(
                 regexp_replace(upper(last_name), '[^\w ]', '', 'g'),
                 ' '
-            )) AS name FROM {self.rds_schema}.student_academic_status
+            )) AS name FROM {self.rds_schema}.student_academic_status {sid_filter}
             );""",
+            {'sids': sids} if sids else None,
         )
 
-    def _refresh_rds_majors(self, transaction):
+    def _refresh_rds_majors(self, sids, transaction):
         return transaction.execute(
             f"""INSERT INTO {self.rds_schema}.student_majors (
             SELECT *
             FROM dblink('{self.rds_dblink_to_redshift}',$REDSHIFT$
                 SELECT DISTINCT sid, major
                 FROM {self.redshift_schema}.student_majors
+                {dblink_sid_filter(sids)}
               $REDSHIFT$)
             AS redshift_majors (
                 sid VARCHAR,
@@ -354,13 +494,14 @@ class GenerateMergedStudentFeeds(BackgroundJob):
             ));""",
         )
 
-    def _refresh_rds_profiles(self, transaction):
+    def _refresh_rds_profiles(self, sids, transaction):
         return transaction.execute(
             f"""INSERT INTO {self.rds_schema}.student_profiles (
             SELECT *
                 FROM dblink('{self.rds_dblink_to_redshift}',$REDSHIFT$
                     SELECT sid, profile
                     FROM {self.redshift_schema}.student_profiles
+                    {dblink_sid_filter(sids)}
               $REDSHIFT$)
             AS redshift_profiles (
                 sid VARCHAR,
@@ -368,6 +509,12 @@ class GenerateMergedStudentFeeds(BackgroundJob):
             ));""",
         )
 
+    def _execute_for_sids(self, sql, alias, sids, transaction):
+        if sids:
+            return transaction.execute(f'{sql} AND {alias}.sid = ANY(%s);', (sids,))
+        else:
+            return transaction.execute(f'{sql};')
+
     def _refresh_rds_enrollment_terms(self, transaction):
         return transaction.execute(
             f"""INSERT INTO {self.rds_schema}.student_enrollment_terms (
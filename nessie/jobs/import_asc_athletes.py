@@ -27,6 +27,7 @@ from flask import current_app as app
 from nessie.externals import redshift, s3
 from nessie.externals.asc_athletes_api import get_asc_feed
 from nessie.jobs.background_job import BackgroundJob, BackgroundJobError
+from nessie.lib.queries import bump_student_population_epoch
 from nessie.lib.util import encoded_tsv_row, get_s3_asc_daily_path, resolve_sql_template_string
 
 SPORT_TRANSLATIONS = {
@@ -124,6 +125,7 @@ class ImportAscAthletes(BackgroundJob):
         )
         if not redshift.execute(query):
             raise BackgroundJobError('Error on Redshift copy: aborting job.')
+        bump_student_population_epoch()
 
         status = {
             'this_sync_date': sync_date,
@@ -62,9 +62,9 @@ class ImportCanvasEnrollmentsApi(BackgroundJob):
                 app.logger.error(f'Canvas enrollments API import failed for course id {course_id}.')
             index += 1
 
-        s3_key = f'{get_s3_sis_api_daily_path()}/canvas_api_enrollments_{term_id}.tsv'
+        s3_key = f'{get_s3_sis_api_daily_path()}/canvas_api_enrollments_{term_id}.tsv.gz'
         app.logger.info(f'Will stash {success_count} feeds in S3: {s3_key}')
-        if not s3.upload_tsv_rows(rows, s3_key):
+        if not s3.upload_tsv_rows_gz(rows, s3_key):
             raise BackgroundJobError('Error on S3 upload: aborting job.')
 
         app.logger.info('Will copy S3 feeds into Redshift...')
@@ -72,10 +72,11 @@ class ImportCanvasEnrollmentsApi(BackgroundJob):
             """
             DELETE FROM {redshift_schema_student}_staging.canvas_api_enrollments WHERE term_id = '{term_id}';
             COPY {redshift_schema_student}_staging.canvas_api_enrollments
-                FROM '{loch_s3_sis_api_data_path}/canvas_api_enrollments_{term_id}.tsv'
+                FROM '{loch_s3_sis_api_data_path}/canvas_api_enrollments_{term_id}.tsv.gz'
                 IAM_ROLE '{redshift_iam_role}'
                 DELIMITER '\\t'
-                TIMEFORMAT 'YYYY-MM-DDTHH:MI:SSZ';
+                TIMEFORMAT 'YYYY-MM-DDTHH:MI:SSZ'
+                GZIP;
             DELETE FROM {redshift_schema_student}.canvas_api_enrollments
                 WHERE term_id = '{term_id}'
                 AND course_id IN
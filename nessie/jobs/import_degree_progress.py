@@ -68,15 +68,15 @@ class ImportDegreeProgress(BackgroundJob):
                 app.logger.error(f'SIS get_degree_progress failed for SID {csid}.')
             index += 1
 
-        s3_key = f'{get_s3_sis_api_daily_path()}/degree_progress.tsv'
-        app.logger.info(f'Will stash {success_count} feeds in S3: {s3_key}')
-        if not s3.upload_tsv_rows(rows, s3_key):
+        manifest_key, part_keys = redshift.copy_manifest_keys(f'{get_s3_sis_api_daily_path()}/degree_progress')
+        app.logger.info(f'Will stash {success_count} feeds in S3: {manifest_key}')
+        if not s3.upload_tsv_rows_gz_manifest(rows, manifest_key, part_keys):
             raise BackgroundJobError('Error on S3 upload: aborting job.')
 
         app.logger.info('Will copy S3 feeds into Redshift...')
         if not redshift.execute(f'TRUNCATE {self.redshift_schema}_staging.sis_api_degree_progress'):
             raise BackgroundJobError('Error truncating old staging rows: aborting job.')
-        if not redshift.copy_tsv_from_s3(f'{self.redshift_schema}_staging.sis_api_degree_progress', s3_key):
+        if not redshift.copy_tsv_from_s3(f'{self.redshift_schema}_staging.sis_api_degree_progress', manifest_key, gzip=True, manifest=True):
             raise BackgroundJobError('Error on Redshift copy: aborting job.')
         staging_to_destination_query = resolve_sql_template_string(
             """
@@ -73,12 +73,11 @@ class ImportLrsIncrementals(BackgroundJob):
 
         timestamp_path = localize_datetime(datetime.now()).strftime('%Y/%m/%d/%H%M%S')
         destination_path = app.config['LRS_CANVAS_INCREMENTAL_DESTINATION_PATH'] + '/' + timestamp_path
-        for destination_bucket in app.config['LRS_CANVAS_INCREMENTAL_DESTINATION_BUCKETS']:
-            self.migrate_transient_to_destination(
-                transient_keys,
-                destination_bucket,
-                destination_path,
-            )
+        self.migrate_transient_to_destinations(
+            transient_keys,
+            app.config['LRS_CANVAS_INCREMENTAL_DESTINATION_BUCKETS'],
+            destination_path,
+        )
 
         if truncate_lrs:
             if lrs.execute('TRUNCATE statements'):
@@ -113,16 +112,24 @@ class ImportLrsIncrementals(BackgroundJob):
             else:
                 app.logger.info(f'Deleted {len(old_unloads)} old unloads from {self.transient_bucket}.')
 
-    def migrate_transient_to_destination(self, keys, destination_bucket, destination_path):
-        destination_url = 's3://' + destination_bucket + '/' + destination_path
-        redshift_schema = app.config['REDSHIFT_SCHEMA_LRS']
-
-        for transient_key in keys:
-            destination_key = transient_key.replace(self.transient_path, destination_path)
-            if not s3.copy(self.transient_bucket, transient_key, destination_bucket, destination_key):
+    def migrate_transient_to_destinations(self, keys, destination_buckets, destination_path):
+        # Copies to all destination buckets run together; verification, which reuses a single external schema, runs
+        # for one bucket at a time.
+        copies = []
+        for destination_bucket in destination_buckets:
+            for transient_key in keys:
+                destination_key = transient_key.replace(self.transient_path, destination_path)
+                copies.append((self.transient_bucket, transient_key, destination_bucket, destination_key))
+        results = s3.copy_many(copies)
+        for destination_bucket in destination_buckets:
+            if not all(copied for (bucket, key), copied in results.items() if bucket == destination_bucket):
                 raise BackgroundJobError(f'Copy from transient bucket to destination bucket {destination_bucket} failed.')
-        self.verify_migration(destination_url, redshift_schema)
-        redshift.drop_external_schema(redshift_schema)
+
+        redshift_schema = app.config['REDSHIFT_SCHEMA_LRS']
+        for destination_bucket in destination_buckets:
+            destination_url = 's3://' + destination_bucket + '/' + destination_path
+            self.verify_migration(destination_url, redshift_schema)
+            redshift.drop_external_schema(redshift_schema)
 
     def unload_to_etl(self, schema, bucket, timestamped=True):
         s3_url = 's3://' + bucket + '/' + app.config['LRS_CANVAS_INCREMENTAL_ETL_PATH_REDSHIFT']
@@ -27,6 +27,7 @@ from flask import current_app as app
 from nessie.externals import redshift, s3
 from nessie.externals.boac import get_manually_added_advisees
 from nessie.jobs.background_job import BackgroundJob, BackgroundJobError
+from nessie.lib.queries import bump_student_population_epoch
 from nessie.lib.util import get_s3_boa_api_daily_path, resolve_sql_template_string
 
 
@@ -59,6 +60,7 @@ class ImportNonCurrentStudents(BackgroundJob):
         if not redshift.execute(query):
             raise BackgroundJobError('Error on Redshift copy: aborting job.')
 
+        bump_student_population_epoch()
         status = f'Imported {len(rows)} non-current students.'
         app.logger.info(f'BOA manually added advisees import job completed: {status}')
         return status
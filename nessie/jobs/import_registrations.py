@@ -83,14 +83,14 @@ class ImportRegistrations(BackgroundJob):
             raise BackgroundJobError('Failed to import registration histories: aborting job.')
 
         for key in rows.keys():
-            s3_key = f'{get_s3_sis_api_daily_path()}/{key}.tsv'
-            app.logger.info(f'Will stash {len(successes)} feeds in S3: {s3_key}')
-            if not s3.upload_tsv_rows(rows[key], s3_key):
+            manifest_key, part_keys = redshift.copy_manifest_keys(f'{get_s3_sis_api_daily_path()}/{key}')
+            app.logger.info(f'Will stash {len(successes)} feeds in S3: {manifest_key}')
+            if not s3.upload_tsv_rows_gz_manifest(rows[key], manifest_key, part_keys):
                 raise BackgroundJobError('Error on S3 upload: aborting job.')
             app.logger.info('Will copy S3 feeds into Redshift...')
             if not redshift.execute(f'TRUNCATE {self.redshift_schema}_staging.student_{key}'):
                 raise BackgroundJobError('Error truncating old staging rows: aborting job.')
-            if not redshift.copy_tsv_from_s3(f'{self.redshift_schema}_staging.student_{key}', s3_key):
+            if not redshift.copy_tsv_from_s3(f'{self.redshift_schema}_staging.student_{key}', manifest_key, gzip=True, manifest=True):
                 raise BackgroundJobError('Error on Redshift copy: aborting job.')
             staging_to_destination_query = resolve_sql_template_string(
                 """
@@ -158,13 +158,12 @@ class ImportRegistrations(BackgroundJob):
         return successes, failures
 
     def refresh_rds_indexes(self, sids, rows, transaction):
-        sql = f'DELETE FROM {self.rds_schema}.student_term_gpas WHERE sid = ANY(%s)'
-        params = (sids,)
-        if not transaction.execute(sql, params):
+        sql = f'DELETE FROM {self.rds_schema}.student_term_gpas WHERE sid = ANY({{sids}})'
+        if not transaction.execute(sql, sids=sids):
             return False
-        if not transaction.insert_bulk(
-            f"""INSERT INTO {self.rds_schema}.student_term_gpas
-                (sid, term_id, gpa, units_taken_for_gpa) VALUES %s""",
+        if not transaction.copy_rows(
+            f'{self.rds_schema}.student_term_gpas',
+            ['sid', 'term_id', 'gpa', 'units_taken_for_gpa'],
             [split_tsv_row(r) for r in rows],
         ):
             return False
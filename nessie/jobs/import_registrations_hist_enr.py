@@ -77,14 +77,14 @@ class ImportRegistrationsHistEnr(BackgroundJob):
         successes, failures = self.load_concurrently(rows, sids)
         if len(successes) > 0:
             for key in rows.keys():
-                s3_key = f'{get_s3_sis_api_daily_path()}/{key}.tsv'
-                app.logger.info(f'Will stash {len(successes)} feeds in S3: {s3_key}')
-                if not s3.upload_tsv_rows(rows[key], s3_key):
+                manifest_key, part_keys = redshift.copy_manifest_keys(f'{get_s3_sis_api_daily_path()}/{key}')
+                app.logger.info(f'Will stash {len(successes)} feeds in S3: {manifest_key}')
+                if not s3.upload_tsv_rows_gz_manifest(rows[key], manifest_key, part_keys):
                     raise BackgroundJobError('Error on S3 upload: aborting job.')
                 app.logger.info('Will copy S3 feeds into Redshift...')
                 if not redshift.execute(f'TRUNCATE {self.redshift_schema}_staging.hist_enr_{key}'):
                     raise BackgroundJobError('Error truncating old staging rows: aborting job.')
-                if not redshift.copy_tsv_from_s3(f'{self.redshift_schema}_staging.hist_enr_{key}', s3_key):
+                if not redshift.copy_tsv_from_s3(f'{self.redshift_schema}_staging.hist_enr_{key}', manifest_key, gzip=True, manifest=True):
                     raise BackgroundJobError('Error on Redshift copy: aborting job.')
                 staging_to_destination_query = resolve_sql_template_string(
                     """
@@ -75,15 +75,15 @@ class ImportSisStudentApi(BackgroundJob):
         if (len(rows) == 0) and (failure_count > 0):
             raise BackgroundJobError('Failed to import SIS student API feeds: aborting job.')
 
-        s3_key = f'{get_s3_sis_api_daily_path()}/profiles.tsv'
-        app.logger.info(f'Will stash {len(rows)} feeds in S3: {s3_key}')
-        if not s3.upload_tsv_rows(rows, s3_key):
+        manifest_key, part_keys = redshift.copy_manifest_keys(f'{get_s3_sis_api_daily_path()}/profiles')
+        app.logger.info(f'Will stash {len(rows)} feeds in S3: {manifest_key}')
+        if not s3.upload_tsv_rows_gz_manifest(rows, manifest_key, part_keys):
             raise BackgroundJobError('Error on S3 upload: aborting job.')
 
         app.logger.info('Will copy S3 feeds into Redshift...')
         if not redshift.execute(f'TRUNCATE {self.redshift_schema}_staging.sis_api_profiles'):
             raise BackgroundJobError('Error truncating old staging rows: aborting job.')
-        if not redshift.copy_tsv_from_s3(f'{self.redshift_schema}_staging.sis_api_profiles', s3_key):
+        if not redshift.copy_tsv_from_s3(f'{self.redshift_schema}_staging.sis_api_profiles', manifest_key, gzip=True, manifest=True):
             raise BackgroundJobError('Error on Redshift copy: aborting job.')
         staging_to_destination_query = resolve_sql_template_string(
             """
@@ -131,15 +131,15 @@ class ImportSisStudentApi(BackgroundJob):
 
         rows, failure_count = self.load_concurrently_v1(csids)
 
-        s3_key = f'{get_s3_sis_api_daily_path()}/profiles.tsv'
-        app.logger.info(f'Will stash {len(rows)} feeds in S3: {s3_key}')
-        if not s3.upload_tsv_rows(rows, s3_key):
+        manifest_key, part_keys = redshift.copy_manifest_keys(f'{get_s3_sis_api_daily_path()}/profiles')
+        app.logger.info(f'Will stash {len(rows)} feeds in S3: {manifest_key}')
+        if not s3.upload_tsv_rows_gz_manifest(rows, manifest_key, part_keys):
             raise BackgroundJobError('Error on S3 upload: aborting job.')
 
         app.logger.info('Will copy S3 feeds into Redshift...')
         if not redshift.execute(f'TRUNCATE {self.redshift_schema}_staging.sis_api_profiles_v1'):
             raise BackgroundJobError('Error truncating old staging rows: aborting job.')
-        if not redshift.copy_tsv_from_s3(f'{self.redshift_schema}_staging.sis_api_profiles_v1', s3_key):
+        if not redshift.copy_tsv_from_s3(f'{self.redshift_schema}_staging.sis_api_profiles_v1', manifest_key, gzip=True, manifest=True):
             raise BackgroundJobError('Error on Redshift copy: aborting job.')
         staging_to_destination_query = resolve_sql_template_string(
             """
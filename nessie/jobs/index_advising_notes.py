@@ -84,8 +84,9 @@ class IndexAdvisingNotes(BackgroundJob):
                 first_name, last_name = calnet.split_sortable_name(entry)
                 insertable_rows.append(tuple((entry.get('uid'), entry.get('csid'), first_name, last_name)))
 
-            result = transaction.insert_bulk(
-                f'INSERT INTO {notes_schema}.advising_note_authors (uid, sid, first_name, last_name) VALUES %s',
+            result = transaction.copy_rows(
+                f'{notes_schema}.advising_note_authors',
+                ['uid', 'sid', 'first_name', 'last_name'],
                 insertable_rows,
             )
             if result:
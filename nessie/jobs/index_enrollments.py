@@ -85,11 +85,12 @@ class IndexEnrollments(BackgroundJob):
                 row['sis_section_num'],
                 row['instructors'],
             ])
-        insert_result = transaction.insert_bulk(
-            f"""INSERT INTO {self.rds_schema}.enrolled_primary_sections
-                (term_id, sis_section_id, sis_course_name, sis_course_name_compressed, sis_subject_area_compressed, sis_catalog_id,
-                 sis_course_title, sis_instruction_format, sis_section_num, instructors)
-                VALUES %s""",
+        insert_result = transaction.copy_rows(
+            f'{self.rds_schema}.enrolled_primary_sections',
+            [
+                'term_id', 'sis_section_id', 'sis_course_name', 'sis_course_name_compressed', 'sis_subject_area_compressed', 'sis_catalog_id',
+                'sis_course_title', 'sis_instruction_format', 'sis_section_num', 'instructors',
+            ],
             [insertable_tuple(r) for r in section_results],
         )
         if not insert_result:
@@ -55,24 +55,28 @@ class MigrateLrsIncrementals(BackgroundJob):
             raise BackgroundJobError('Could not retrieve S3 keys from transient bucket.')
 
         timestamped_destination_path = self.source_output_path + '/' + localize_datetime(datetime.now()).strftime('%Y/%m/%d/%H%M%S')
-        for destination_bucket in app.config['LRS_CANVAS_INCREMENTAL_DESTINATION_BUCKETS']:
-            self.migrate_transient_to_destination(
-                etl_output_keys,
-                destination_bucket,
-                timestamped_destination_path,
-            )
+        self.migrate_transient_to_destinations(
+            etl_output_keys,
+            app.config['LRS_CANVAS_INCREMENTAL_DESTINATION_BUCKETS'],
+            timestamped_destination_path,
+        )
         return (
             f'Migrated {self.pre_transform_statement_count} statements to S3'
             f"(buckets={app.config['LRS_CANVAS_INCREMENTAL_DESTINATION_BUCKETS']}, path={timestamped_destination_path})"
         )
 
-    def migrate_transient_to_destination(self, keys, destination_bucket, destination_path):
-        destination_url = 's3://' + destination_bucket + '/' + destination_path
-        for source_key in keys:
-            destination_key = source_key.replace(self.source_output_path, destination_path)
-            if not s3.copy(self.transient_bucket, source_key, destination_bucket, destination_key):
+    def migrate_transient_to_destinations(self, keys, destination_buckets, destination_path):
+        copies = []
+        for destination_bucket in destination_buckets:
+            for source_key in keys:
+                destination_key = source_key.replace(self.source_output_path, destination_path)
+                copies.append((self.transient_bucket, source_key, destination_bucket, destination_key))
+        results = s3.copy_many(copies)
+        for destination_bucket in destination_buckets:
+            if not all(copied for (bucket, key), copied in results.items() if bucket == destination_bucket):
                 raise BackgroundJobError(f'Copy from transient bucket to destination bucket {destination_bucket} failed.')
-        self.verify_post_transform_statement_count(destination_url)
+        for destination_bucket in destination_buckets:
+            self.verify_post_transform_statement_count('s3://' + destination_bucket + '/' + destination_path)
 
     def get_pre_transform_statement_count(self):
         schema = app.config['REDSHIFT_SCHEMA_LRS']
@@ -25,7 +25,6 @@ ENHANCEMENTS, OR MODIFICATIONS.
 
 import os
 from threading import Thread
-from time import sleep
 
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -236,36 +235,47 @@ def start_worker_listener():
 
 
 def listen_for_merged_enrollment_term_jobs(_app):
+    from nessie.externals import rds
+    from nessie.lib.metadata import merged_enrollment_term_job_channel
+    with _app.app_context():
+        _app.logger.info(f'Listening for merged enrollment term jobs.')
+        # Workers wake as soon as jobs are queued. Polling the queue on timeout (or every 5 seconds, if notifications
+        # are unavailable) picks up any jobs left behind.
+        with rds.notification_listener(merged_enrollment_term_job_channel(), fallback_interval=5) as listener:
+            while True:
+                if not run_queued_merged_enrollment_term_job(_app):
+                    listener.wait(_app.config['MERGED_ENROLLMENT_TERM_NOTIFY_TIMEOUT'])
+
+
+def run_queued_merged_enrollment_term_job(_app):
     from nessie.jobs.background_job import BackgroundJobError
     from nessie.jobs.generate_merged_enrollment_term import GenerateMergedEnrollmentTerm
     from nessie.lib.metadata import poll_merged_enrollment_term_job_queue, update_merged_enrollment_term_job_status
-    with _app.app_context():
-        _app.logger.info(f'Listening for merged enrollment term jobs.')
-        while True:
-            sleep(5)
-            args = poll_merged_enrollment_term_job_queue()
-            if args:
-                _app.logger.info(f"Starting queued merged enrollment term job (master_job_id={args['master_job_id']}, term_id={args['term_id']}.")
-                try:
-                    job = GenerateMergedEnrollmentTerm()
-                    error = None
-                    result = job.run(term_id=args['term_id'])
-                except BackgroundJobError as e:
-                    _app.logger.error(e)
-                    result = None
-                    error = str(e)
-                except Exception as e:
-                    _app.logger.exception(e)
-                    result = None
-                    error = str(e)
-                if result:
-                    status = 'success'
-                    if isinstance(result, str):
-                        _app.logger.info(result)
-                        details = result
-                    else:
-                        details = None
-                else:
-                    status = 'error'
-                    details = error
-                update_merged_enrollment_term_job_status(args['id'], status, details)
+    args = poll_merged_enrollment_term_job_queue()
+    if not args:
+        return False
+    _app.logger.info(f"Starting queued merged enrollment term job (master_job_id={args['master_job_id']}, term_id={args['term_id']}.")
+    try:
+        job = GenerateMergedEnrollmentTerm()
+        error = None
+        result = job.run(term_id=args['term_id'])
+    except BackgroundJobError as e:
+        _app.logger.error(e)
+        result = None
+        error = str(e)
+    except Exception as e:
+        _app.logger.exception(e)
+        result = None
+        error = str(e)
+    if result:
+        status = 'success'
+        if isinstance(result, str):
+            _app.logger.info(result)
+            details = result
+        else:
+            details = None
+    else:
+        status = 'error'
+        details = error
+    update_merged_enrollment_term_job_status(args['id'], status, details)
+    return True
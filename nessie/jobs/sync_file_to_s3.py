@@ -52,7 +52,7 @@ class SyncFileToS3(BackgroundJob):
                 def update_streaming_status(headers):
                     update_canvas_sync_status(canvas_sync_job_id, key, 'streaming', source_size=headers.get('Content-Length'))
 
-                response = s3.upload_from_url(url, key, on_stream_opened=update_streaming_status)
+                response = s3.upload_from_url_ranged(url, key, on_stream_opened=update_streaming_status)
                 if response and canvas_sync_job_id:
                     destination_size = response.get('ContentLength')
                     update_canvas_sync_status(canvas_sync_job_id, key, 'complete', destination_size=destination_size)
@@ -40,13 +40,26 @@ class VerifySisAdvisingNoteAttachments(BackgroundJob):
         missing_s3_attachments = []
         app.logger.info(f'Starting SIS Advising Note attachments validation job...')
 
+        bucket = app.config['LOCH_S3_PROTECTED_BUCKET']
         dest_prefix = app.config['LOCH_S3_ADVISING_NOTE_ATTACHMENT_DEST_PATH']
+        # The destination is listed once, in parallel by leading digit of SID, and shared by all checks. Anything else
+        # under the destination would be missed by that listing, and so is first looked for one level down.
+        sub_prefixes = [f'/{digit}' for digit in range(10)]
+        dest_children = s3.get_child_keys_and_prefixes(f'{dest_prefix}/', bucket=bucket)
+        if dest_children is None:
+            raise BackgroundJobError(f'Failed to list attachments in {dest_prefix}.')
+        unexpected_children = [c for c in dest_children if not any(c.startswith(dest_prefix + p) for p in sub_prefixes)]
+        if unexpected_children:
+            raise BackgroundJobError(f'Found attachments outside SID folders in {dest_prefix}: {sorted(unexpected_children)}.')
+        dest_attachments = s3.get_object_sizes_with_prefix(dest_prefix, bucket=bucket, sub_prefixes=sub_prefixes)
+        if dest_attachments is None:
+            raise BackgroundJobError(f'Failed to list attachments in {dest_prefix}.')
 
         for source_prefix in self.source_paths(datestamp):
             app.logger.info(f'Will validate files from {source_prefix}.')
-            s3_attachment_sync_failures.extend(self.verify_attachment_migration(source_prefix, dest_prefix))
+            s3_attachment_sync_failures.extend(self.verify_attachment_migration(source_prefix, dest_prefix, dest_attachments))
 
-        missing_s3_attachments = self.find_missing_notes_view_attachments(dest_prefix)
+        missing_s3_attachments = self.find_missing_notes_view_attachments(dest_attachments)
 
         if s3_attachment_sync_failures or missing_s3_attachments:
             verification_results = {
@@ -64,20 +77,19 @@ class VerifySisAdvisingNoteAttachments(BackgroundJob):
             return get_s3_sis_attachment_path(datestamp)
         return [app.config['LOCH_S3_ADVISING_NOTE_ATTACHMENT_SOURCE_PATH']]
 
-    def verify_attachment_migration(self, source_prefix, dest_prefix):
-        s3_attachment_sync_failures = []
+    def verify_attachment_migration(self, source_prefix, dest_prefix, dest_attachments):
         bucket = app.config['LOCH_S3_PROTECTED_BUCKET']
+        source_attachments = s3.get_object_sizes_with_prefix(source_prefix, bucket=bucket)
+        if source_attachments is None:
+            raise BackgroundJobError(f'Failed to list attachments in {source_prefix}.')
 
-        source_attachments = sorted(s3.get_keys_with_prefix(source_prefix, False, bucket))
-        dest_attachments = sorted(s3.get_keys_with_prefix(dest_prefix, False, bucket))
-
-        for source_key in source_attachments:
+        def _dest_key(source_key):
             file_name = source_key.split('/')[-1]
             sid = file_name.split('_')[0]
-            dest_key = f'{dest_prefix}/{sid}/{file_name}'
+            return f'{dest_prefix}/{sid}/{file_name}'
 
-            if dest_key not in dest_attachments:
-                s3_attachment_sync_failures.append(source_key)
+        reconciliation = s3.reconcile_keys(source_attachments, dest_attachments, _dest_key)
+        s3_attachment_sync_failures = sorted(reconciliation['missing'] + reconciliation['size_mismatched'])
 
         if s3_attachment_sync_failures:
             app.logger.error(f'Total number of failed attachment syncs from {source_prefix} is {len(s3_attachment_sync_failures)} \
@@ -94,21 +106,10 @@ class VerifySisAdvisingNoteAttachments(BackgroundJob):
         )
         return sis_notes_attachments
 
-    def find_missing_notes_view_attachments(self, dest_prefix):
+    def find_missing_notes_view_attachments(self, dest_attachments):
         # Checks for attachments in SIS view that are not on S3.
-        missing_s3_attachments = []
-        sis_attachments_files_names = []
-        bucket = app.config['LOCH_S3_PROTECTED_BUCKET']
-        sis_notes_view_attachments = sorted(self.get_all_notes_attachments())
-        sis_s3_attachments = sorted(s3.get_keys_with_prefix(dest_prefix, False, bucket))
-
-        for dest_key in sis_s3_attachments:
-            file_name = dest_key.split('/')[-1]
-            sis_attachments_files_names.append(file_name)
-
-        for file_name in sis_notes_view_attachments:
-            if file_name not in sis_attachments_files_names:
-                missing_s3_attachments.append(file_name)
+        sis_attachments_files_names = {dest_key.split('/')[-1] for dest_key in dest_attachments}
+        missing_s3_attachments = sorted(self.get_all_notes_attachments() - sis_attachments_files_names)
 
         if missing_s3_attachments:
             app.logger.error(f'Attachments missing on S3 when compared against SIS notes views: {len(missing_s3_attachments)} \
@@ -26,6 +26,7 @@ ENHANCEMENTS, OR MODIFICATIONS.
 import math
 
 from flask import current_app as app
+import numpy
 from numpy import nan
 import pandas
 from scipy.stats import percentileofscore
@@ -41,29 +42,33 @@ def merge_analytics_for_course(term_id, canvas_map_entry, enrollment_term_map, a
         return None
 
     canvas_course_id = canvas_map_entry.get('canvasCourseId')
+    # Enrollments may be a list of row dicts or, as generated by merge_memberships_into_site_map, a dict of columns.
     df = pandas.DataFrame(enrollments, columns=['canvas_user_id', 'current_score', 'last_activity_at'])
-    student_rows = {}
+    enrollment_count = len(df)
 
+    # Locate all advisee rows in a single pass over the course, rather than filtering the DataFrame once per advisee.
+    row_positions = row_positions_by_canvas_user_id(df)
+    student_row_positions = {}
+    missing_rows = []
     for advisee_canvas_user_id in advisee_enrollments:
-        student_row = df.loc[df['canvas_user_id'].values == int(advisee_canvas_user_id)]
-        if enrollments and student_row.empty:
+        row_position = row_positions.get(int(advisee_canvas_user_id))
+        if enrollment_count and row_position is None:
             app.logger.warning(f'Canvas user {advisee_canvas_user_id} not found in Data Loch for course site {canvas_course_id}')
-            df, student_row = append_missing_row(
-                df,
-                advisee_canvas_user_id,
-                pandas.DataFrame({
-                    'canvas_user_id': [int(advisee_canvas_user_id)],
-                    'current_score': [None],
-                    'last_activity_at': [None],
-                }),
-            )
-        student_rows[advisee_canvas_user_id] = student_row
+            row_position = row_positions[int(advisee_canvas_user_id)] = len(df) + len(missing_rows)
+            missing_rows.append({
+                'canvas_user_id': int(advisee_canvas_user_id),
+                'current_score': None,
+                'last_activity_at': None,
+            })
+        student_row_positions[advisee_canvas_user_id] = row_position
+    if missing_rows:
+        df = append_missing_rows(df, missing_rows)
 
     metrics = ['current_score', 'last_activity_at']
     course_distributions = get_distributions_for_metric(df, metrics)
     course_analytics = {metric: analytics_for_course(course_distributions, metric) for metric in metrics}
 
-    for (advisee_canvas_user_id, student_row) in student_rows.items():
+    for (advisee_canvas_user_id, row_position) in student_row_positions.items():
         advisee_sid = advisees_by_canvas_id.get(str(advisee_canvas_user_id), {}).get('sid')
         if not advisee_sid:
             app.logger.info(f'No match in advisees map for Canvas user {advisee_canvas_user_id} (course={canvas_course_id})')
@@ -75,48 +80,46 @@ def merge_analytics_for_course(term_id, canvas_map_entry, enrollment_term_map, a
             entry['analytics'] = entry.get('analytics') or {}
             entry['analytics'].update({
                 'currentScore': analytics_for_student(
-                    student_row,
+                    row_position,
                     'current_score',
                     course_analytics,
                     course_distributions,
                 ),
                 'lastActivity': analytics_for_student(
-                    student_row,
+                    row_position,
                     'last_activity_at',
                     course_analytics,
                     course_distributions,
                 ),
-                'courseEnrollmentCount': len(enrollments),
+                'courseEnrollmentCount': enrollment_count,
             })
 
 
-def merge_assignment_submissions_for_user(advisee_term_feed, canvas_user_id, relative_submission_counts):
+def merge_assignment_submissions_for_user(advisee_term_feed, canvas_user_id, relative_submission_counts, distribution_cache=None):
     user_courses = canvas_courses_from_enrollment_term(advisee_term_feed)
     if not user_courses:
         return
     for course in user_courses:
         canvas_course_id = course['canvasCourseId']
         course_rows = relative_submission_counts.get(canvas_course_id, [])
-        df = pandas.DataFrame(course_rows, columns=['canvas_user_id', 'submissions_turned_in'])
-        student_row = df.loc[df['canvas_user_id'].values == int(canvas_user_id)]
-        if course_rows and student_row.empty:
+        if distribution_cache is None:
+            (row_positions, course_distributions, course_analytics) = submission_distributions_for_course(course_rows)
+        else:
+            (row_positions, course_distributions, course_analytics) = distribution_cache.get(canvas_course_id, course_rows)
+        row_position = row_positions.get(int(canvas_user_id))
+        if course_rows and row_position is None:
             app.logger.warn(f'Canvas user id {canvas_user_id}, course id {canvas_course_id} not found in Data Loch assignments; will assume 0 score')
-            df, student_row = append_missing_row(
-                df,
-                canvas_user_id,
-                pandas.DataFrame({
-                    'canvas_user_id': [int(canvas_user_id)],
-                    'submissions_turned_in': [0],
-                }),
+            # A distribution including the missing user's zero score is particular to that user, and so is not cached.
+            (row_positions, course_distributions, course_analytics) = submission_distributions_for_course(
+                course_rows,
+                missing_rows=[{'canvas_user_id': int(canvas_user_id), 'submissions_turned_in': 0}],
             )
-
-        course_distributions = get_distributions_for_metric(df, ['submissions_turned_in'])
-        course_analytics = {'submissions_turned_in': analytics_for_course(course_distributions, 'submissions_turned_in')}
+            row_position = row_positions.get(int(canvas_user_id))
 
         course['analytics'] = course.get('analytics') or {}
         course['analytics'].update({
             'assignmentsSubmitted': analytics_for_student(
-                student_row,
+                row_position,
                 'submissions_turned_in',
                 course_analytics,
                 course_distributions,
@@ -124,6 +127,38 @@ def merge_assignment_submissions_for_user(advisee_term_feed, canvas_user_id, rel
         })
 
 
+def submission_distributions_for_course(course_rows, missing_rows=None):
+    df = pandas.DataFrame(course_rows, columns=['canvas_user_id', 'submissions_turned_in'])
+    if missing_rows:
+        df = append_missing_rows(df, missing_rows)
+    course_distributions = get_distributions_for_metric(df, ['submissions_turned_in'])
+    course_analytics = {'submissions_turned_in': analytics_for_course(course_distributions, 'submissions_turned_in')}
+    return row_positions_by_canvas_user_id(df), course_distributions, course_analytics
+
+
+class CourseDistributionCache:
+    """Term-scoped store of assignment-submission distributions and course analytics, keyed by Canvas course id.
+
+    Relative submission counts are calculated against each advisee's own set of course assignments, so an entry is
+    reused only for advisees whose view of the course is identical. In practice most advisees in a course share one.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, canvas_course_id, course_rows):
+        rows_key = tuple((row['canvas_user_id'], row['submissions_turned_in']) for row in course_rows)
+        course_entries = self.entries.setdefault(canvas_course_id, {})
+        if rows_key in course_entries:
+            self.hits += 1
+        else:
+            self.misses += 1
+            course_entries[rows_key] = submission_distributions_for_course(course_rows)
+        return course_entries[rows_key]
+
+
 def canvas_courses_from_enrollment_term(advisee_term_feed):
     canvas_courses = []
     for enrollment in advisee_term_feed.get('enrollments', []):
@@ -132,11 +167,17 @@ def canvas_courses_from_enrollment_term(advisee_term_feed):
     return canvas_courses
 
 
-def append_missing_row(df, canvas_user_id, student_row):
-    df = df.append(student_row, ignore_index=True)
-    # Fetch newly appended row, mostly for the sake of its properly set-up index.
-    student_row = df.loc[df['canvas_user_id'].values == int(canvas_user_id)]
-    return df, student_row
+def append_missing_rows(df, missing_rows):
+    # Rows are appended in a single operation, and in order, so that callers can predict their positions.
+    return df.append(pandas.DataFrame(missing_rows, columns=df.columns), ignore_index=True)
+
+
+def row_positions_by_canvas_user_id(df):
+    """Map each Canvas user id to the position of its first row in the course DataFrame."""
+    row_positions = {}
+    for position, canvas_user_id in enumerate(df['canvas_user_id'].values):
+        row_positions.setdefault(int(canvas_user_id), position)
+    return row_positions
 
 
 def get_distributions_for_metric(df, metrics):
@@ -211,28 +252,27 @@ def analytics_for_course(distributions, metric):
     }
 
 
-def analytics_for_student(student_row, metric, course_analytics, distributions):
+def analytics_for_student(row_position, metric, course_analytics, distributions):
     # If the course had no salient data, we've already filled in a placeholder student element and are done.
     if course_analytics[metric].get('student'):
         return course_analytics[metric]
 
-    dfcol = distributions[metric]['dfcol']
-    dfcol_normalized = distributions[metric]['dfcol_normalized']
-    unique_scores = distributions[metric]['unique_scores']
+    # Per-student figures are calculated for the whole course on first request; later students are simple lookups.
+    rankings = distributions[metric].get('rankings')
+    if rankings is None:
+        rankings = distributions[metric]['rankings'] = rankings_for_course(distributions, metric)
 
-    student_row = student_row.fillna(0)
-    intuitive_percentile = rounded_up_percentile(dfcol, student_row)
+    intuitive_percentile = int(rankings['rounded_up_percentiles'][row_position])
     # The intuitive percentile is our best option for display, whether or not the distribution is boxplottable.
     # Note, however, that if all students have the same score, then all students are in the "100th percentile."
     display_percentile = ordinal(intuitive_percentile)
 
-    column_value = student_row[metric].values[0]
-    raw_value = round(column_value.item())
+    raw_value = round(rankings['values'][row_position].item())
 
-    column_zscore = zscore(dfcol_normalized, column_value)
+    column_zscore = None if rankings['zscores'] is None else rankings['zscores'][row_position]
     comparative_percentile = zptile(column_zscore)
     # For purposes of matrix plotting, improve visual spread by calculating percentile against a range of unique scores.
-    matrixy_comparative_percentile = percentileofscore(unique_scores, column_value, kind='strict')
+    matrixy_comparative_percentile = rankings['matrixy_percentiles'][row_position]
 
     student_analytics = {
         'student': {
@@ -248,6 +288,33 @@ def analytics_for_student(student_row, metric, course_analytics, distributions):
     return student_analytics
 
 
+def rankings_for_course(distributions, metric):
+    """Calculate ranks, z-scores and percentiles of score for every row of a course distribution in one vectorized pass.
+
+    Results are arrays indexed by DataFrame row position.
+    """
+    dfcol = distributions[metric]['dfcol']
+    dfcol_normalized = distributions[metric]['dfcol_normalized']
+    unique_scores = distributions[metric]['unique_scores']
+
+    values = dfcol.values.astype(float)
+
+    std = dfcol_normalized.std(ddof=0)
+    zscores = None if std == 0 else (values - dfcol_normalized.mean()) / std
+
+    # Equivalent to scipy's percentileofscore(unique_scores, value, kind='strict') for each value: the share of unique
+    # scores falling strictly below.
+    sorted_unique_scores = numpy.sort(numpy.asarray(unique_scores, dtype=float))
+    matrixy_percentiles = numpy.searchsorted(sorted_unique_scores, values, side='left') / float(len(unique_scores)) * 100
+
+    return {
+        'matrixy_percentiles': matrixy_percentiles,
+        'rounded_up_percentiles': rounded_up_percentiles(dfcol),
+        'values': values,
+        'zscores': zscores,
+    }
+
+
 def ordinal(nbr):
     rounded = round(nbr)
     mod_ten = rounded % 10
@@ -267,8 +334,8 @@ def quantiles(series, count):
     return [round(series.quantile(n / count)) for n in range(0, count + 1)]
 
 
-def rounded_up_percentile(dataframe, student_row):
-    """Given a dataframe and an individual student row, return a more easily understood meaning of percentile.
+def rounded_up_percentiles(series):
+    """Given a series, return a more easily understood meaning of percentile for each of its values.
 
     Z-score percentile is useful in a scatterplot to spot outliers in the overall population across contexts.
     (If 90% of the course's students received a score of '5', then one student with a '5' is not called out.)
@@ -276,9 +343,7 @@ def rounded_up_percentile(dataframe, student_row):
     particular course context. (If only 10% of the course's students did better than '5', then this student
     with a '5' is in the 90th percentile.)
     """
-    percentile = dataframe.rank(pct=True, method='max')[student_row.index].values[0]
-    percentile = int(percentile * 100)
-    return percentile
+    return series.rank(pct=True, method='max').values * 100
 
 
 def zptile(z_score):
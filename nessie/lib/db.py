@@ -24,31 +24,227 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 
 from contextlib import contextmanager
+import io
+import os
+import re
+from threading import Lock
+import time
+import uuid
 
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
 import psycopg2.sql
 
 
+class ConnectionPool():
+    """Thread-safe pool of open psycopg2 connections to a single database target.
+
+    Up to max_size idle connections are kept for reuse. Connections wanted beyond that are opened as usual and closed
+    on release, so that callers never block on the pool. Idle connections are evicted after max_idle_seconds, and are
+    checked for liveness before reuse.
+    """
+
+    def __init__(self, connect_kwargs, max_size, max_idle_seconds):
+        self.connect_kwargs = connect_kwargs
+        self.max_size = max_size
+        self.max_idle_seconds = max_idle_seconds
+        self.pid = os.getpid()
+        self._idle = []
+        self._lock = Lock()
+        self.stats = {
+            'created': 0,
+            'reused': 0,
+            'dead': 0,
+            'evicted': 0,
+            'overflow': 0,
+            'in_use': 0,
+        }
+
+    def acquire(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [c for (c, released_at) in self._idle if now - released_at > self.max_idle_seconds]
+            self._idle = [(c, released_at) for (c, released_at) in self._idle if now - released_at <= self.max_idle_seconds]
+            self.stats['evicted'] += len(expired)
+            self.stats['in_use'] += 1
+        for connection in expired:
+            connection.close()
+        while True:
+            with self._lock:
+                connection = self._idle.pop()[0] if self._idle else None
+            if connection is None:
+                break
+            if _is_alive(connection):
+                with self._lock:
+                    self.stats['reused'] += 1
+                return connection
+            with self._lock:
+                self.stats['dead'] += 1
+            connection.close()
+        try:
+            connection = _connect(self.connect_kwargs)
+        except psycopg2.Error:
+            with self._lock:
+                self.stats['in_use'] -= 1
+            raise
+        with self._lock:
+            self.stats['created'] += 1
+        return connection
+
+    def release(self, connection):
+        if not connection.closed and connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                connection.close()
+        with self._lock:
+            self.stats['in_use'] -= 1
+            if not connection.closed and len(self._idle) < self.max_size:
+                self._idle.append((connection, time.monotonic()))
+                return
+            if not connection.closed:
+                self.stats['overflow'] += 1
+        connection.close()
+
+    def close_all(self):
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+        for (connection, released_at) in idle:
+            connection.close()
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, idle=len(self._idle), max_size=self.max_size)
+
+
+_pools = {}
+_pools_lock = Lock()
+
+
+def get_connection_pool(max_size, max_idle_seconds, **kwargs):
+    key = _pool_key(kwargs)
+    with _pools_lock:
+        pool = _pools.get(key)
+        # Connections must not be shared with a parent process, so a forked process starts with fresh pools.
+        if pool is None or pool.pid != os.getpid():
+            pool = ConnectionPool(kwargs, max_size, max_idle_seconds)
+            _pools[key] = pool
+    return pool
+
+
+def get_connection_pool_stats():
+    with _pools_lock:
+        pools = [(key, pool) for (key, pool) in _pools.items() if pool.pid == os.getpid()]
+    return {_pool_label(key): pool.get_stats() for (key, pool) in pools}
+
+
 @contextmanager
-def get_psycopg_cursor(operation='read', autocommit=True, **kwargs):
+def get_psycopg_cursor(operation='read', autocommit=True, cursor_name=None, pool=None, **kwargs):
     connection = None
     cursor = None
-    if operation == 'write':
-        cursor_factory = None
-    else:
+    if operation == 'read':
         cursor_factory = psycopg2.extras.DictCursor
+    else:
+        # Rows of write operations, and of reads into column arrays, come back as plain tuples.
+        cursor_factory = None
     try:
-        if kwargs.get('uri'):
-            connection = psycopg2.connect(kwargs['uri'])
+        if pool:
+            connection = pool.acquire()
         else:
-            connection = psycopg2.connect(**kwargs)
+            connection = _connect(kwargs)
         # Autocommit is required for EXTERNAL TABLE creation and deletion.
-        if autocommit:
-            connection.autocommit = True
-        yield connection.cursor(cursor_factory=cursor_factory)
+        connection.autocommit = autocommit
+        # A named cursor is created server-side, and returns rows to the client only as they are fetched.
+        cursor = connection.cursor(name=cursor_name, cursor_factory=cursor_factory)
+        yield cursor
     finally:
-        if cursor is not None:
-            cursor.close()
+        if cursor is not None and not cursor.closed:
+            try:
+                cursor.close()
+            except psycopg2.Error:
+                pass
         if connection is not None:
-            connection.close()
+            if pool:
+                pool.release(connection)
+            else:
+                connection.close()
+
+
+@contextmanager
+def sid_list(connection, sids, max_array_length, dialect):
+    """Yield SQL to fill the parentheses of 'sid = ANY(...)', restricting a query to the given SIDs.
+
+    Up to max_array_length SIDs are rendered as an array literal. A longer list is instead loaded into a temporary table
+    in the connection's session, which keeps statement text small and gives the planner a relation with statistics to
+    join against. The dialect of the connection, 'postgres' or 'redshift', determines how the table is built. The table
+    is dropped on exit, since pooled connections outlive the query. Yields None if SIDs are unspecified.
+    """
+    if dialect not in ('postgres', 'redshift'):
+        raise ValueError(f'Unknown SQL dialect: {dialect}')
+    if sids is None:
+        yield None
+        return
+    if len(sids) <= max_array_length:
+        yield psycopg2.sql.Literal(list(sids))
+        return
+    table = f'nessie_sids_{uuid.uuid4().hex}'
+    with connection.cursor() as cursor:
+        if dialect == 'redshift':
+            # Redshift accepts COPY only from external sources, and has no indexes; a sort key serves instead.
+            cursor.execute(f'CREATE TEMPORARY TABLE {table} (sid VARCHAR NOT NULL) DISTSTYLE ALL SORTKEY (sid)')
+            psycopg2.extras.execute_values(cursor, f'INSERT INTO {table} (sid) VALUES %s', [(sid,) for sid in sids], page_size=5000)
+        else:
+            cursor.execute(f'CREATE TEMPORARY TABLE {table} (sid VARCHAR NOT NULL)')
+            cursor.copy_expert(f'COPY {table} (sid) FROM STDIN', io.StringIO(''.join(f'{sid}\n' for sid in sids)))
+            cursor.execute(f'CREATE INDEX ON {table} (sid)')
+        cursor.execute(f'ANALYZE {table}')
+    try:
+        yield psycopg2.sql.SQL(f'SELECT sid FROM {table}')
+    finally:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE IF EXISTS {table}')
+        except psycopg2.Error:
+            # The transaction has failed, and the table goes with it when rolled back on release.
+            pass
+
+
+def sql_text(sql, cursor):
+    # Composed SQL renders as a repr unless given a connection context.
+    if isinstance(sql, psycopg2.sql.Composable):
+        return sql.as_string(cursor)
+    return str(sql)
+
+
+def _connect(kwargs):
+    if kwargs.get('uri'):
+        return psycopg2.connect(kwargs['uri'])
+    else:
+        return psycopg2.connect(**kwargs)
+
+
+def _is_alive(connection):
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not connection.autocommit:
+            connection.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _pool_key(kwargs):
+    return tuple(sorted((k, v) for k, v in kwargs.items()))
+
+
+def _pool_label(key):
+    kwargs = dict(key)
+    if kwargs.get('uri'):
+        # Keep credentials out of the label.
+        return re.sub(r'//[^@/]*@', '//', kwargs['uri'])
+    return f"{kwargs.get('host')}:{kwargs.get('port')}/{kwargs.get('dbname')}"
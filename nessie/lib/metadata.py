@@ -24,6 +24,7 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 
 from datetime import datetime
+import json
 import os
 
 from flask import current_app as app
@@ -131,33 +132,31 @@ def create_background_job_status(job_id):
     )
 
 
-def update_background_job_status(job_id, status, details=None):
+def update_background_job_status(job_id, status, details=None, phases=None):
     if details:
         details = details[:4096]
     sql = f"""UPDATE {_rds_schema()}.background_job_status
-             SET status=%s, updated_at=current_timestamp, details=%s
+             SET status=%s, updated_at=current_timestamp, details=%s, phases=%s
              WHERE job_id=%s"""
     return rds.execute(
         sql,
-        params=(status, details, job_id),
+        params=(status, details, json.dumps(phases) if phases else None, job_id),
     )
 
 
 def update_registration_import_status(successes, failures):
     rds.execute(
-        f'DELETE FROM {_rds_schema()}.registration_import_status WHERE sid = ANY(%s)',
-        params=(successes + failures, ),
+        f'DELETE FROM {_rds_schema()}.registration_import_status WHERE sid = ANY({{sids}})',
+        sids=successes + failures,
     )
     now = datetime.utcnow().isoformat()
     success_records = [tuple([sid, 'success', now]) for sid in successes]
     failure_records = [tuple([sid, 'failure', now]) for sid in failures]
     rows = success_records + failure_records
     with rds.transaction() as transaction:
-        result = transaction.insert_bulk(
-            f"""INSERT INTO {_rds_schema()}.registration_import_status
-                (sid, status, updated_at)
-                VALUES %s
-            """,
+        result = transaction.copy_rows(
+            f'{_rds_schema()}.registration_import_status',
+            ['sid', 'status', 'updated_at'],
             rows,
         )
         if result:
@@ -167,10 +166,36 @@ def update_registration_import_status(successes, failures):
             app.logger.error('Error saving merged feed status updates to RDS.')
 
 
+def update_merged_feed_fingerprints(fingerprints, deleted_sids, replace_all=False):
+    now = datetime.utcnow().isoformat()
+    rows = [tuple([sid, fingerprint, now]) for sid, fingerprint in fingerprints.items()]
+    with rds.transaction() as transaction:
+        if replace_all:
+            result = transaction.execute(f'TRUNCATE {_rds_schema()}.merged_feed_fingerprints')
+        else:
+            result = transaction.execute(
+                f'DELETE FROM {_rds_schema()}.merged_feed_fingerprints WHERE sid = ANY({{sids}})',
+                sids=list(fingerprints.keys()) + deleted_sids,
+            )
+        if result and rows:
+            result = transaction.copy_rows(
+                f'{_rds_schema()}.merged_feed_fingerprints',
+                ['sid', 'fingerprint', 'updated_at'],
+                rows,
+            )
+        if result:
+            transaction.commit()
+            return True
+        else:
+            transaction.rollback()
+            app.logger.error('Error saving merged feed fingerprints to RDS.')
+            return False
+
+
 def update_photo_import_status(successes, failures, photo_not_found):
     rds.execute(
-        f'DELETE FROM {_rds_schema()}.photo_import_status WHERE sid = ANY(%s)',
-        params=(successes + failures + photo_not_found, ),
+        f'DELETE FROM {_rds_schema()}.photo_import_status WHERE sid = ANY({{sids}})',
+        sids=successes + failures + photo_not_found,
     )
     now = datetime.utcnow().isoformat()
     success_records = [tuple([sid, 'success', now]) for sid in successes]
@@ -178,11 +203,9 @@ def update_photo_import_status(successes, failures, photo_not_found):
     photo_not_found_records = [tuple([sid, 'photo_not_found', now]) for sid in photo_not_found]
     rows = success_records + failure_records + photo_not_found_records
     with rds.transaction() as transaction:
-        result = transaction.insert_bulk(
-            f"""INSERT INTO {_rds_schema()}.photo_import_status
-                (sid, status, updated_at)
-                VALUES %s
-            """,
+        result = transaction.copy_rows(
+            f'{_rds_schema()}.photo_import_status',
+            ['sid', 'status', 'updated_at'],
             rows,
         )
         if result:
@@ -205,13 +228,13 @@ def queue_merged_enrollment_term_jobs(master_job_id, term_ids):
             now,
         ])
     with rds.transaction() as transaction:
-        insert_result = transaction.insert_bulk(
-            f"""INSERT INTO {_rds_schema()}.merged_enrollment_term_job_queue
-               (master_job_id, term_id, status, instance_id, created_at, updated_at)
-                VALUES %s""",
+        insert_result = transaction.copy_rows(
+            f'{_rds_schema()}.merged_enrollment_term_job_queue',
+            ['master_job_id', 'term_id', 'status', 'instance_id', 'created_at', 'updated_at'],
             [insertable_tuple(term_id) for term_id in term_ids],
         )
-        if insert_result:
+        # Listening workers are notified when the transaction commits.
+        if insert_result and transaction.execute('SELECT pg_notify(%s, %s)', (merged_enrollment_term_job_channel(), master_job_id)):
             transaction.commit()
             return True
         else:
@@ -219,6 +242,14 @@ def queue_merged_enrollment_term_jobs(master_job_id, term_ids):
             return False
 
 
+def merged_enrollment_term_job_channel():
+    return f'{_rds_schema()}_merged_enrollment_term_jobs'
+
+
+def merged_enrollment_term_status_channel():
+    return f'{_rds_schema()}_merged_enrollment_term_status'
+
+
 def poll_merged_enrollment_term_job_queue():
     result = rds.fetch(
         f"""UPDATE {_rds_schema()}.merged_enrollment_term_job_queue
@@ -254,12 +285,17 @@ def get_merged_enrollment_term_job_status(master_job_id):
 def update_merged_enrollment_term_job_status(job_id, status, details):
     if details:
         details = details[:4096]
-    sql = f"""UPDATE {_rds_schema()}.merged_enrollment_term_job_queue
-             SET status=%s, updated_at=current_timestamp, details=%s
-             WHERE id=%s"""
+    # The master job, listening on the status channel, is notified of the update.
+    sql = f"""WITH updated AS (
+                UPDATE {_rds_schema()}.merged_enrollment_term_job_queue
+                SET status=%s, updated_at=current_timestamp, details=%s
+                WHERE id=%s
+                RETURNING master_job_id
+             )
+             SELECT pg_notify(%s, master_job_id) FROM updated"""
     return rds.execute(
         sql,
-        params=(status, details, job_id),
+        params=(status, details, job_id, merged_enrollment_term_status_channel()),
     )
 
 
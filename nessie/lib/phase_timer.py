@@ -0,0 +1,139 @@
+"""
+Copyright ©2019. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from contextlib import contextmanager
+import os
+import resource
+import threading
+import time
+
+"""Per-phase timing and resource usage for background jobs."""
+
+# How often resident set size is sampled while a phase runs.
+RSS_SAMPLE_INTERVAL_SECONDS = 0.1
+
+
+class Phase():
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = None
+        self.error = False
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.child_cpu_seconds = None
+        self.peak_rss_mb = None
+
+    def add_rows(self, count):
+        self.rows = (self.rows or 0) + count
+
+    def to_api_json(self):
+        return {
+            'name': self.name,
+            'wallSeconds': self.wall_seconds,
+            'cpuSeconds': self.cpu_seconds,
+            'childCpuSeconds': self.child_cpu_seconds,
+            'peakRssMb': self.peak_rss_mb,
+            'rows': self.rows,
+            'error': self.error,
+        }
+
+
+class PhaseTimer():
+    """Record wall time, CPU time, peak RSS and row counts for named phases of a job.
+
+    CPU time is that of the whole process, so phases running concurrently in other threads are counted together. Child
+    CPU time covers worker processes that have exited by the end of the phase. Peak RSS is the largest resident set size
+    of this process (not its children) sampled while the phase ran; it is left empty where /proc is unavailable.
+    """
+
+    def __init__(self):
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        phase = Phase(name)
+        self.phases.append(phase)
+        start_wall = time.monotonic()
+        start_usage = resource.getrusage(resource.RUSAGE_SELF)
+        start_child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        rss_sampler = _RssSampler()
+        rss_sampler.start()
+        try:
+            yield phase
+        except Exception:
+            phase.error = True
+            raise
+        finally:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            phase.wall_seconds = round(time.monotonic() - start_wall, 3)
+            phase.cpu_seconds = round(_cpu_seconds(usage) - _cpu_seconds(start_usage), 3)
+            phase.child_cpu_seconds = round(_cpu_seconds(child_usage) - _cpu_seconds(start_child_usage), 3)
+            rss_sampler.stop()
+            if rss_sampler.peak_rss is not None:
+                phase.peak_rss_mb = round(rss_sampler.peak_rss / (1024 * 1024), 1)
+
+    def summary(self):
+        return ', '.join(f'{p.name} {p.wall_seconds}s wall, {p.cpu_seconds}s cpu' for p in self.phases)
+
+    def to_api_json(self):
+        return [p.to_api_json() for p in self.phases]
+
+
+def _cpu_seconds(usage):
+    return usage.ru_utime + usage.ru_stime
+
+
+def _current_rss():
+    # The second field of /proc/self/statm is resident set size in pages. Unlike getrusage's ru_maxrss, which is the
+    # high-water mark for the life of the process, this lets memory use be attributed to the phase that caused it.
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class _RssSampler(threading.Thread):
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak_rss = _current_rss()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while self.peak_rss is not None and not self._stopped.wait(RSS_SAMPLE_INTERVAL_SECONDS):
+            self._sample()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        self._sample()
+
+    def _sample(self):
+        rss = _current_rss()
+        if rss is not None and self.peak_rss is not None:
+            self.peak_rss = max(self.peak_rss, rss)
@@ -27,10 +27,23 @@ from flask import current_app as app
 from nessie.externals import rds, redshift, s3
 from nessie.lib.berkeley import canvas_terms, reverse_term_ids, term_name_for_sis_id
 from nessie.lib.mockingdata import fixture
+from nessie.lib.query_cache import bump_epoch, cached_query
+from nessie.lib.util import columns_from_rows
 
 # Lazy init to support testing.
 data_loch_db = None
 
+# NumPy types of columns in Canvas enrollment query results.
+CANVAS_ENROLLMENT_DTYPES = {
+    'canvas_course_id': 'int64',
+    'canvas_course_term': object,
+    'uid': object,
+    'canvas_user_id': 'int64',
+    'current_score': 'float64',
+    'last_activity_at': 'float64',
+    'sis_enrollment_status': object,
+}
+
 
 def advisee_schema():
     return app.config['REDSHIFT_SCHEMA_ADVISEE']
@@ -76,6 +89,12 @@ def undergrads_schema():
     return app.config['REDSHIFT_SCHEMA_UNDERGRADS']
 
 
+def bump_student_population_epoch():
+    # Called by jobs that rebuild population schemas, so that later jobs see the new population.
+    bump_epoch('student_population')
+
+
+@cached_query('student_population')
 def get_all_student_ids():
     sql = f"""SELECT sid FROM {asc_schema()}.students
         UNION SELECT sid FROM {coe_schema()}.students
@@ -85,12 +104,12 @@ def get_all_student_ids():
 
 
 def get_advisee_ids(csids=None):
-    csid_filter = 'WHERE sid = ANY(%s)' if csids is not None else ''
+    csid_filter = 'WHERE sid = ANY({sids})' if csids is not None else ''
     sql = f"""SELECT ldap_uid, sid
               FROM {calnet_schema()}.persons
               {csid_filter}
               ORDER BY sid"""
-    return redshift.fetch(sql, params=(csids,))
+    return redshift.fetch(sql, sids=csids)
 
 
 @fixture('query_advisee_student_profile_feeds.csv')
@@ -121,7 +140,7 @@ def get_advisee_student_profile_elements():
                 ON reg.sid = ldap.sid
               ORDER BY ldap.sid
         """
-    return redshift.fetch(sql)
+    return redshift.iter_fetch(sql)
 
 
 @fixture('query_advisee_enrolled_canvas_sites.csv')
@@ -156,7 +175,7 @@ def get_advisee_submissions_sorted(term_id):
 
 
 @fixture('query_enrollments_in_advisee_canvas_sites.csv')
-def get_all_enrollments_in_advisee_canvas_sites():
+def get_all_enrollments_in_advisee_canvas_sites(columnar=False):
     sql = f"""SELECT
                 mem.course_id as canvas_course_id,
                 mem.course_term as canvas_course_term,
@@ -179,7 +198,18 @@ def get_all_enrollments_in_advisee_canvas_sites():
               )
               ORDER BY mem.course_id, mem.canvas_user_id
         """
-    return redshift.fetch(sql)
+    if columnar:
+        return redshift.fetch_columns(sql, CANVAS_ENROLLMENT_DTYPES)
+    return redshift.iter_fetch(sql)
+
+
+def get_enrollment_columns_in_advisee_canvas_sites():
+    """Return Canvas enrollments in advisee sites as NumPy arrays keyed by column name, sorted by course."""
+    enrollments = get_all_enrollments_in_advisee_canvas_sites(columnar=True)
+    # Fixture responses in test environments are rows.
+    if isinstance(enrollments, list):
+        enrollments = columns_from_rows(enrollments, CANVAS_ENROLLMENT_DTYPES)
+    return enrollments
 
 
 @fixture('query_advisee_sis_enrollments.csv')
@@ -196,7 +226,7 @@ def get_all_advisee_sis_enrollments():
               WHERE enr.sis_term_id=ANY('{{{','.join(reverse_term_ids(include_future_terms=True, include_legacy_terms=True))}}}')
               ORDER BY enr.sis_term_id DESC, ldap.sid, enr.sis_course_name, enr.sis_primary DESC, enr.sis_instruction_format, enr.sis_section_num
         """
-    return redshift.fetch(sql)
+    return redshift.iter_fetch(sql)
 
 
 @fixture('query_advisee_enrollment_drops.csv')
@@ -208,7 +238,7 @@ def get_all_advisee_enrollment_drops():
               WHERE dr.sis_term_id=ANY('{{{','.join(reverse_term_ids(include_legacy_terms=True))}}}')
               ORDER BY dr.sis_term_id DESC, dr.sid, dr.sis_course_name
             """
-    return redshift.fetch(sql)
+    return redshift.iter_fetch(sql)
 
 
 def get_all_advisee_term_gpas():
@@ -219,7 +249,7 @@ def get_all_advisee_term_gpas():
               WHERE gp.term_id=ANY('{{{','.join(reverse_term_ids(include_legacy_terms=True))}}}')
               ORDER BY gp.term_id, gp.sid DESC
         """
-    return redshift.fetch(sql)
+    return redshift.iter_fetch(sql)
 
 
 def get_enrolled_canvas_sites_for_term(term_id):
@@ -302,10 +332,10 @@ def get_non_advisee_api_feeds(sids):
               FROM {student_schema()}.sis_api_profiles_hist_enr sis
               LEFT JOIN {student_schema()}.hist_enr_last_registrations reg
                 ON reg.sid = sis.sid
-              WHERE sis.sid=ANY(%s)
+              WHERE sis.sid = ANY({{sids}})
               ORDER BY sis.sid
         """
-    return redshift.fetch(sql, params=(sids,))
+    return redshift.iter_fetch(sql, sids=sids)
 
 
 def get_non_advisee_sis_enrollments(sids, term_id):
@@ -315,31 +345,37 @@ def get_non_advisee_sis_enrollments(sids, term_id):
                   enr.sis_course_title, enr.sis_course_name,
                   enr.sis_section_id, enr.sis_primary, enr.sis_instruction_format, enr.sis_section_num
               FROM {intermediate_schema()}.sis_enrollments enr
-              WHERE enr.sid=ANY(%s)
+              WHERE enr.sid = ANY({{sids}})
                 AND enr.sis_term_id='{term_id}'
               ORDER BY enr.sis_term_id DESC, enr.sid, enr.sis_course_name, enr.sis_primary DESC, enr.sis_instruction_format, enr.sis_section_num
         """
-    return redshift.fetch(sql, params=(sids,))
+    return redshift.iter_fetch(sql, sids=sids)
 
 
 def get_non_advisee_enrollment_drops(sids, term_id):
     sql = f"""SELECT dr.*
               FROM {intermediate_schema()}.sis_dropped_classes AS dr
-              WHERE dr.sid = ANY(%s)
+              WHERE dr.sid = ANY({{sids}})
                 AND dr.sis_term_id = '{term_id}'
               ORDER BY dr.sid, dr.sis_course_name
         """
-    return redshift.fetch(sql, params=(sids,))
+    return redshift.fetch(sql, sids=sids)
 
 
 def get_non_advisee_term_gpas(sids, term_id):
     sql = f"""SELECT gp.sid, gp.term_id, gp.gpa, gp.units_taken_for_gpa
               FROM {student_schema()}.hist_enr_term_gpas gp
-              WHERE gp.sid = ANY(%s)
+              WHERE gp.sid = ANY({{sids}})
                 AND gp.term_id = '{term_id}'
               ORDER BY gp.sid
         """
-    return redshift.fetch(sql, params=(sids,))
+    return redshift.fetch(sql, sids=sids)
+
+
+def get_merged_feed_fingerprints():
+    sql = f"""SELECT sid, fingerprint
+        FROM {metadata_schema()}.merged_feed_fingerprints"""
+    return rds.fetch(sql)
 
 
 def get_sids_with_registration_imports():
@@ -352,7 +388,7 @@ def get_sids_with_registration_imports():
 def get_active_sids_with_oldest_registration_imports(limit):
     active_sids = [r['sid'] for r in get_all_student_ids()]
     sql = f"""SELECT sid FROM {metadata_schema()}.registration_import_status
-        WHERE sid = ANY(%s)
+        WHERE sid = ANY({{sids}})
         AND status = 'success'
         ORDER BY updated_at LIMIT %s"""
-    return rds.fetch(sql, params=(active_sids, limit))
+    return rds.fetch(sql, params=(limit,), sids=active_sids)
@@ -0,0 +1,102 @@
+"""
+Copyright ©2019. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from functools import wraps
+import threading
+import time
+
+from flask import current_app as app
+
+"""In-process cache of query results shared by background jobs, with expiry and explicit invalidation."""
+
+_lock = threading.Lock()
+
+# Results are cached per name and arguments. An entry is valid while unexpired and while its name's epoch is
+# unchanged; jobs that rebuild the underlying tables bump the epoch.
+_entries = {}
+_epochs = {}
+_load_locks = {}
+
+
+def cached_query(name):
+    """Decorate a query function so that its results are reused until QUERY_CACHE_TTL_SECONDS pass or bump_epoch(name).
+
+    Results of None, indicating a failed query, are not cached. Callers receive a shallow copy of the cached list.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args):
+            ttl = app.config['QUERY_CACHE_TTL_SECONDS']
+            if not ttl:
+                return func(*args)
+            key = (name, args)
+            with _lock:
+                load_lock = _load_locks.setdefault(key, threading.Lock())
+            # Concurrent callers of a cold entry wait on the first caller's query rather than repeating it.
+            with load_lock:
+                result = _get_entry(key)
+                if result is None:
+                    epoch = _get_epoch(name)
+                    result = func(*args)
+                    if result is None:
+                        return None
+                    _set_entry(key, epoch, ttl, result)
+            return list(result)
+        return wrapper
+    return decorator
+
+
+def bump_epoch(name):
+    """Invalidate all cached results under name."""
+    with _lock:
+        _epochs[name] = _epochs.get(name, 0) + 1
+        for key in [k for k in _entries if k[0] == name]:
+            del _entries[key]
+    app.logger.info(f'Query cache epoch for {name} bumped to {_epochs[name]}.')
+
+
+def clear_query_cache():
+    with _lock:
+        _entries.clear()
+
+
+def _get_entry(key):
+    with _lock:
+        entry = _entries.get(key)
+        if entry and entry['epoch'] == _epochs.get(key[0], 0) and entry['expires_at'] > time.monotonic():
+            return entry['result']
+        return None
+
+
+def _get_epoch(name):
+    with _lock:
+        return _epochs.get(name, 0)
+
+
+def _set_entry(key, epoch, ttl, result):
+    with _lock:
+        # An epoch bumped while the query ran leaves its result unsafe to cache.
+        if epoch == _epochs.get(key[0], 0):
+            _entries[key] = {'epoch': epoch, 'expires_at': time.monotonic() + ttl, 'result': result}
@@ -0,0 +1,88 @@
+"""
+Copyright ©2019. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import re
+from threading import Lock
+
+"""In-process registry of query statistics, keyed by normalized SQL."""
+
+
+_metrics = {}
+_lock = Lock()
+
+# Longest fingerprint kept, so that generated SQL of unbounded length does not bloat the registry.
+MAX_FINGERPRINT_LENGTH = 1000
+
+
+def fingerprint_sql(sql):
+    """Reduce SQL to a normalized form in which literal values, whitespace and case no longer distinguish queries."""
+    text = str(sql)
+    # Comments, then string literals (including array literals and credentials) and numbers, become placeholders.
+    text = re.sub(r'--[^\n]*', ' ', text)
+    # Temporary tables holding long SID lists are named uniquely per call.
+    text = re.sub(r'\bnessie_sids_[0-9a-f]{32}\b', 'nessie_sids_?', text)
+    text = re.sub(r"'(?:[^']|'')*'", '?', text)
+    text = re.sub(r'\b\d+(\.\d+)?\b', '?', text)
+    # Lists of placeholders, as in IN clauses or multi-row VALUES, collapse to a single placeholder.
+    text = re.sub(r'\?(\s*,\s*\?)+', '?', text)
+    text = ' '.join(text.split()).lower()
+    return text[:MAX_FINGERPRINT_LENGTH]
+
+
+def get_query_metrics():
+    """Return statistics for each query fingerprint, costliest first."""
+    with _lock:
+        metrics = [dict(m) for m in _metrics.values()]
+    return sorted(metrics, key=lambda m: m['total_seconds'], reverse=True)
+
+
+def record_query(database, sql, elapsed, rows=None, error=False):
+    key = (database, fingerprint_sql(sql))
+    with _lock:
+        metric = _metrics.get(key)
+        if metric is None:
+            metric = {
+                'database': database,
+                'fingerprint': key[1],
+                'calls': 0,
+                'errors': 0,
+                'rows': 0,
+                'total_seconds': 0.0,
+                'max_seconds': 0.0,
+            }
+            _metrics[key] = metric
+        metric['calls'] += 1
+        metric['total_seconds'] += elapsed
+        metric['max_seconds'] = max(metric['max_seconds'], elapsed)
+        # Drivers report a row count of -1 where none is available.
+        if rows and rows > 0:
+            metric['rows'] += rows
+        if error:
+            metric['errors'] += 1
+
+
+def reset_query_metrics():
+    with _lock:
+        _metrics.clear()
@@ -0,0 +1,135 @@
+"""
+Copyright ©2019. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from flask import current_app as app
+from nessie.lib.util import dblink_sid_filter
+
+"""Delta sync of RDS index tables from their Redshift sources over dblink."""
+
+# Changed SIDs are passed to Redshift as a literal array. Beyond this many, the table is reloaded in full instead.
+MAX_DELTA_SIDS = 20000
+
+
+def delta_sync_rds_table(transaction, rds_schema, rds_dblink_to_redshift, redshift_schema, table, columns, distinct=False):
+    """Bring an RDS table keyed by sid into line with the Redshift table of the same name, sending only changed rows.
+
+    Columns are (name, type) pairs, the first being sid. For each SID, a hash of all its rows is computed on both
+    sides, and only hashes cross dblink for comparison. Rows for SIDs whose hashes differ are then deleted from RDS and
+    re-inserted from Redshift. A hash mismatch caused by differences in text rendering between the two databases costs
+    no more than a redundant re-insert.
+
+    Returns lists of inserted, updated and deleted SIDs, with a 'reloaded' flag set if the number of changes was too
+    large for a delta and every row was replaced; or None on error.
+    """
+    select_clause = 'SELECT DISTINCT' if distinct else 'SELECT'
+    column_names = ', '.join(name for (name, column_type) in columns)
+    row_hash = _row_hash_sql(columns)
+    changes = transaction.fetch(
+        f"""SELECT COALESCE(redshift_hashes.sid, rds_hashes.sid) AS sid,
+            CASE WHEN rds_hashes.sid IS NULL THEN 'inserted' WHEN redshift_hashes.sid IS NULL THEN 'deleted' ELSE 'updated' END AS action
+        FROM dblink('{rds_dblink_to_redshift}',$REDSHIFT$
+            SELECT sid, MD5({_redshift_string_agg('row_hash')}) AS sid_hash
+            FROM (
+                SELECT sid, {row_hash} AS row_hash
+                FROM ({select_clause} {column_names} FROM {redshift_schema}.{table}) source_rows
+            ) row_hashes
+            GROUP BY sid
+          $REDSHIFT$)
+        AS redshift_hashes (sid VARCHAR, sid_hash VARCHAR)
+        FULL OUTER JOIN (
+            SELECT sid, MD5(STRING_AGG(row_hash, ',' ORDER BY row_hash)) AS sid_hash
+            FROM (SELECT sid, {row_hash} AS row_hash FROM {rds_schema}.{table}) row_hashes
+            GROUP BY sid
+        ) rds_hashes
+        ON redshift_hashes.sid = rds_hashes.sid
+        WHERE redshift_hashes.sid_hash IS DISTINCT FROM rds_hashes.sid_hash""",
+    )
+    if changes is None:
+        return None
+    changed_sids = {'inserted': [], 'updated': [], 'deleted': [], 'reloaded': False}
+    for row in changes:
+        changed_sids[row['action']].append(row['sid'])
+    stale_sids = changed_sids['updated'] + changed_sids['deleted']
+    fresh_sids = changed_sids['inserted'] + changed_sids['updated']
+    if len(fresh_sids) > MAX_DELTA_SIDS:
+        app.logger.info(f'{len(fresh_sids)} changed SIDs in {rds_schema}.{table}; will reload in full.')
+        changed_sids['reloaded'] = True
+        if not transaction.execute(f'TRUNCATE {rds_schema}.{table}'):
+            return None
+    elif stale_sids and not transaction.execute(f'DELETE FROM {rds_schema}.{table} WHERE sid = ANY({{sids}})', sids=stale_sids):
+        return None
+    if fresh_sids:
+        column_definitions = ',\n'.join(f'{name} {column_type}' for (name, column_type) in columns)
+        result = transaction.execute(
+            f"""INSERT INTO {rds_schema}.{table} ({column_names}) (
+            SELECT *
+            FROM dblink('{rds_dblink_to_redshift}',$REDSHIFT$
+                {select_clause} {column_names}
+                FROM {redshift_schema}.{table}
+                {'' if changed_sids['reloaded'] else dblink_sid_filter(fresh_sids)}
+              $REDSHIFT$)
+            AS redshift_{table} (
+                {column_definitions}
+            ));""",
+        )
+        if not result:
+            return None
+    app.logger.info(
+        f"Delta sync of {rds_schema}.{table}: {len(changed_sids['inserted'])} inserted, {len(changed_sids['updated'])} updated, "
+        f"{len(changed_sids['deleted'])} deleted.",
+    )
+    return changed_sids
+
+
+def changed_sids_union(*changed_sids_results):
+    """Return all SIDs changed in any of the given delta sync results, or None if any table was reloaded in full."""
+    if any(result['reloaded'] for result in changed_sids_results):
+        return None
+    sids = set()
+    for result in changed_sids_results:
+        sids.update(result['inserted'] + result['updated'] + result['deleted'])
+    return sorted(sids)
+
+
+def _redshift_string_agg(expression):
+    # The Postgres stand-in for Redshift in test environments has no LISTAGG.
+    if app.config['NESSIE_ENV'] == 'test':
+        return f"STRING_AGG({expression}, ',' ORDER BY {expression})"
+    return f"LISTAGG({expression}, ',') WITHIN GROUP (ORDER BY {expression})"
+
+
+def _row_hash_sql(columns):
+    # Each column is hashed separately so that NULLs are distinguished from empty strings, and so that concatenation of
+    # long text columns stays within Redshift's VARCHAR limit. Expressions are written to run alike on Redshift and RDS.
+    column_hashes = []
+    for (name, column_type) in columns:
+        if column_type == 'BOOLEAN':
+            value = f"CASE WHEN {name} THEN 't' WHEN NOT {name} THEN 'f' END"
+        elif column_type in ('VARCHAR', 'TEXT'):
+            value = name
+        else:
+            value = f'{name}::VARCHAR'
+        column_hashes.append(f"COALESCE(MD5({value}), 'null')")
+    return f"MD5({' || '.join(column_hashes)})"
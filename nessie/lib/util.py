@@ -31,11 +31,27 @@ import re
 from dateutil.rrule import DAILY, rrule
 from flask import current_app as app
 from nessie.lib.berkeley import earliest_term_id
+import numpy
 import pytz
 
 """Generic utilities."""
 
 
+def columns_from_rows(rows, dtypes):
+    """Convert a list of row dicts to a dict of NumPy arrays keyed by column name, as returned by redshift.fetch_columns."""
+    return {column: numpy.array([row.get(column) for row in rows], dtype=dtype) for column, dtype in dtypes.items()}
+
+
+def dblink_sid_filter(sids):
+    """Return a WHERE clause restricting a Redshift query to the given SIDs, or an empty string if SIDs are unspecified.
+
+    Queries passed through dblink cannot take bound parameters, so the SIDs are rendered as an array literal.
+    """
+    if not sids:
+        return ''
+    return f"WHERE sid = ANY('{{{','.join(sids)}}}')"
+
+
 def encoded_tsv_row(elements):
     return '\t'.join([str(e) for e in elements]).encode()
 
@@ -51,6 +67,17 @@ def get_args_dict(func, *args, **kw):
     return resp
 
 
+def group_offsets(keys):
+    """Return the positions at which runs of equal values in a sorted NumPy array begin, followed by its length.
+
+    Rows of group i are then the slice offsets[i]:offsets[i + 1].
+    """
+    if not len(keys):
+        return numpy.array([0])
+    boundaries = numpy.flatnonzero(keys[1:] != keys[:-1]) + 1
+    return numpy.concatenate(([0], boundaries, [len(keys)]))
+
+
 def localize_datetime(dt):
     return dt.astimezone(pytz.timezone(app.config['TIMEZONE']))
 
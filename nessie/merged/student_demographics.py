@@ -24,7 +24,15 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 from collections import defaultdict
 
-from nessie.lib.util import encoded_tsv_row
+from nessie.lib.rds_delta import delta_sync_rds_table
+from nessie.lib.util import dblink_sid_filter, encoded_tsv_row
+
+# Columns of RDS demographics tables copied from Redshift, for delta sync.
+RDS_DEMOGRAPHICS_COLUMNS = {
+    'demographics': [('sid', 'VARCHAR'), ('gender', 'VARCHAR'), ('minority', 'BOOLEAN')],
+    'ethnicities': [('sid', 'VARCHAR'), ('ethnicity', 'VARCHAR')],
+    'visas': [('sid', 'VARCHAR'), ('visa_status', 'VARCHAR'), ('visa_type', 'VARCHAR')],
+}
 
 UNDERREPRESENTED_GROUPS = {'Black/African American', 'Hispanic/Latino', 'American Indian/Alaska Native'}
 
@@ -42,14 +50,27 @@ def add_demographics_rows(sid, feed, rows_map):
     return parsed
 
 
-def refresh_rds_demographics(rds_schema, rds_dblink_to_redshift, redshift_schema, transaction):
-    if not transaction.execute(f'TRUNCATE {rds_schema}.demographics'):
+def refresh_rds_demographics(rds_schema, rds_dblink_to_redshift, redshift_schema, transaction, sids=None, delta=False):
+    if delta:
+        for table, columns in RDS_DEMOGRAPHICS_COLUMNS.items():
+            if delta_sync_rds_table(transaction, rds_schema, rds_dblink_to_redshift, redshift_schema, table, columns) is None:
+                return False
+        return True
+
+    def _delete_rows(table):
+        if sids:
+            return transaction.execute(f'DELETE FROM {rds_schema}.{table} WHERE sid = ANY({{sids}})', sids=sids)
+        else:
+            return transaction.execute(f'TRUNCATE {rds_schema}.{table}')
+
+    if not _delete_rows('demographics'):
         return False
     sql = f"""INSERT INTO {rds_schema}.demographics (
             SELECT *
             FROM dblink('{rds_dblink_to_redshift}',$REDSHIFT$
                 SELECT sid, gender, minority
                 FROM {redshift_schema}.demographics
+                {dblink_sid_filter(sids)}
               $REDSHIFT$)
             AS redshift_demographics (
                 sid VARCHAR,
@@ -58,13 +79,14 @@ def refresh_rds_demographics(rds_schema, rds_dblink_to_redshift, redshift_schema
             ));"""
     if not transaction.execute(sql):
         return False
-    if not transaction.execute(f'TRUNCATE {rds_schema}.ethnicities'):
+    if not _delete_rows('ethnicities'):
         return False
     sql = f"""INSERT INTO {rds_schema}.ethnicities (
             SELECT *
             FROM dblink('{rds_dblink_to_redshift}',$REDSHIFT$
                 SELECT sid, ethnicity
                 FROM {redshift_schema}.ethnicities
+                {dblink_sid_filter(sids)}
               $REDSHIFT$)
             AS redshift_ethnicities (
                 sid VARCHAR,
@@ -72,13 +94,14 @@ def refresh_rds_demographics(rds_schema, rds_dblink_to_redshift, redshift_schema
             ));"""
     if not transaction.execute(sql):
         return False
-    if not transaction.execute(f'TRUNCATE {rds_schema}.visas'):
+    if not _delete_rows('visas'):
         return False
     sql = f"""INSERT INTO {rds_schema}.visas (
             SELECT *
             FROM dblink('{rds_dblink_to_redshift}',$REDSHIFT$
                 SELECT sid, visa_status, visa_type
                 FROM {redshift_schema}.visas
+                {dblink_sid_filter(sids)}
               $REDSHIFT$)
             AS redshift_visas (
                 sid VARCHAR,
@@ -0,0 +1,115 @@
+"""
+Copyright ©2019. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import json
+
+from flask import current_app as app, Flask
+from nessie.lib.util import encoded_tsv_row
+from nessie.logger import initialize_logger
+from nessie.merged.sis_profile import parse_merged_sis_profile
+from nessie.merged.sis_profile_v1 import parse_merged_sis_profile_v1
+from nessie.merged.student_demographics import add_demographics_rows
+
+"""Merged student profile feeds, as generated in the job process or in worker processes."""
+
+# Config keys needed by profile parsing and logging in worker processes.
+WORKER_CONFIG_KEYS = [
+    'LOGGING_FORMAT',
+    'LOGGING_LEVEL',
+    'LOGGING_LOCATION',
+    'LOGGING_PROPAGATION_LEVEL',
+    'STUDENT_V1_API_PREFERRED',
+]
+
+# Worker processes are spawned rather than forked, since forking the multithreaded app process can copy locks held by
+# other threads (scheduler, connection pools, S3 clients) into the child. A spawned worker imports only this module,
+# which reads no config at import time, and builds a minimal app of its own from the config keys it needs.
+_worker_app = None
+
+
+def worker_config():
+    return {key: app.config[key] for key in WORKER_CONFIG_KEYS}
+
+
+def initialize_worker_process(config):
+    global _worker_app
+    _worker_app = Flask(__name__.split('.')[0])
+    _worker_app.config.update(config)
+    initialize_logger(_worker_app)
+
+
+def generate_profile_rows_in_worker(feed_elements_batch, tables):
+    with _worker_app.app_context():
+        rows = {table: [] for table in tables}
+        profiles_generated = [bool(generate_student_profile_feed(feed_elements, rows)) for feed_elements in feed_elements_batch]
+    return rows, profiles_generated
+
+
+def generate_student_profile_feed(feed_elements, rows):
+    sid = feed_elements['sid']
+    uid = feed_elements['ldap_uid']
+    if not uid:
+        return
+    if app.config['STUDENT_V1_API_PREFERRED']:
+        sis_profile = parse_merged_sis_profile_v1(feed_elements)
+    else:
+        sis_profile = parse_merged_sis_profile(feed_elements)
+    demographics = feed_elements.get('demographics_feed') and json.loads(feed_elements.get('demographics_feed'))
+    if demographics:
+        demographics = add_demographics_rows(sid, demographics, rows)
+
+    merged_profile = {
+        'sid': sid,
+        'uid': uid,
+        'firstName': feed_elements.get('first_name'),
+        'lastName': feed_elements.get('last_name'),
+        'name': ' '.join([feed_elements.get('first_name'), feed_elements.get('last_name')]),
+        'canvasUserId': feed_elements.get('canvas_user_id'),
+        'canvasUserName': feed_elements.get('canvas_user_name'),
+        'sisProfile': sis_profile,
+        'demographics': demographics,
+    }
+    rows['student_profiles'].append(encoded_tsv_row([sid, json.dumps(merged_profile)]))
+
+    if sis_profile:
+        first_name = merged_profile['firstName'] or ''
+        last_name = merged_profile['lastName'] or ''
+        level = str(sis_profile.get('level', {}).get('code') or '')
+        gpa = str(sis_profile.get('cumulativeGPA') or '')
+        units = str(sis_profile.get('cumulativeUnits') or '')
+        transfer = str(sis_profile.get('transfer') or False)
+        expected_grad_term = str(sis_profile.get('expectedGraduationTerm', {}).get('id') or '')
+
+        rows['student_academic_status'].append(
+            encoded_tsv_row([sid, uid, first_name, last_name, level, gpa, units, transfer, expected_grad_term]),
+        )
+
+        for plan in sis_profile.get('plans', []):
+            if plan.get('status') == 'Active':
+                rows['student_majors'].append(encoded_tsv_row([sid, plan['description']]))
+        for hold in sis_profile.get('holds', []):
+            rows['student_holds'].append(encoded_tsv_row([sid, json.dumps(hold)]))
+
+    return merged_profile
@@ -28,16 +28,42 @@ import operator
 
 from flask import current_app as app
 from nessie.externals import s3
+from nessie.jobs.background_job import BackgroundJobError
 from nessie.lib import berkeley, queries
+from nessie.lib.util import group_offsets
+
+# Canvas enrollment columns kept in the site map for course analytics.
+ENROLLMENT_ANALYTICS_COLUMNS = ['canvas_user_id', 'current_score', 'last_activity_at']
 
 
 def upload_student_term_maps(advisees_by_sid):
     (enrollment_terms_map, canvas_site_map) = generate_student_term_maps(advisees_by_sid)
-    feed_path = app.config['LOCH_S3_BOAC_ANALYTICS_DATA_PATH'] + '/feeds/'
+    # Each map is written as gzipped JSON lines, one [key, value] pair (by SID or Canvas course id) per line, so that
+    # workers can parse it record by record.
     for term_id, enrollment_term_map in enrollment_terms_map.items():
-        s3.upload_json(enrollment_term_map, feed_path + f'enrollment_term_map_{term_id}.json')
+        s3.upload_jsonl_gz(enrollment_term_map.items(), student_term_map_key('enrollment_term_map', term_id))
     for term_id, canvas_site in canvas_site_map.items():
-        s3.upload_json(canvas_site, feed_path + f'canvas_site_map_{term_id}.json')
+        s3.upload_jsonl_gz(canvas_site.items(), student_term_map_key('canvas_site_map', term_id))
+
+
+def student_term_map_key(map_name, term_id, legacy_json=False):
+    feed_path = app.config['LOCH_S3_BOAC_ANALYTICS_DATA_PATH'] + '/feeds/'
+    extension = 'json' if legacy_json else 'jsonl.gz'
+    return feed_path + f'{map_name}_{term_id}.{extension}'
+
+
+def get_student_term_map_items(map_name, term_id):
+    """Return an iterator of (key, value) pairs from a term map, or None if the map cannot be retrieved.
+
+    Maps in the compressed line-delimited format are parsed incrementally. Maps written as a single JSON document
+    by earlier versions of upload_student_term_maps are read in full.
+    """
+    s3_key = student_term_map_key(map_name, term_id)
+    if s3.object_exists(s3_key):
+        records = s3.get_object_jsonl_gz(s3_key)
+        return records and (tuple(record) for record in records)
+    term_map = s3.get_object_json(student_term_map_key(map_name, term_id, legacy_json=True))
+    return term_map and iter(term_map.items())
 
 
 def generate_student_term_maps(advisees_by_sid):
@@ -146,15 +172,20 @@ def get_canvas_site_maps():
 
 
 def merge_memberships_into_site_map(site_map):
-    # Collect the bCourses enrollments of interest.
-    canvas_enrollments = queries.get_all_enrollments_in_advisee_canvas_sites()
-    for key, group in groupby(canvas_enrollments, key=operator.itemgetter('canvas_course_id')):
-        canvas_site_id = key
-        enrollments = list(group)
-        sis_term_id = berkeley.sis_term_id_for_name(enrollments[0].get('canvas_course_term'))
+    # Collect the bCourses enrollments of interest as column arrays sorted by course. Each site gets slices of the
+    # columns needed for analytics, from which a DataFrame can be built without per-row Python objects.
+    canvas_enrollments = queries.get_enrollment_columns_in_advisee_canvas_sites()
+    if canvas_enrollments is None:
+        # Carrying on would publish every site without enrollments, and so blank analytics.
+        raise BackgroundJobError('Failed to retrieve Canvas enrollments in advisee sites.')
+    canvas_course_ids = canvas_enrollments['canvas_course_id']
+    offsets = group_offsets(canvas_course_ids)
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        canvas_site_id = int(canvas_course_ids[start])
+        sis_term_id = berkeley.sis_term_id_for_name(canvas_enrollments['canvas_course_term'][start])
         site = site_map.get(sis_term_id, {}).get(canvas_site_id)
         if site:
-            site['enrollments'] = enrollments
+            site['enrollments'] = {column: canvas_enrollments[column][start:end] for column in ENROLLMENT_ANALYTICS_COLUMNS}
         else:
             app.logger.warn(f'Did not find canvas_course_id {canvas_site_id} in site map for term {sis_term_id}')
     return site_map
@@ -168,12 +199,22 @@ def merge_canvas_data(canvas_site_map, advisee_site_map, all_advisees_terms_map,
             term_feed = all_advisees_terms_map.get(term_id, {}).get(sid)
             if not term_feed:
                 continue
+            sections_by_ccn = index_term_feed_sections(term_feed)
             for membership in sites:
-                merge_canvas_site_membership(membership, sid, canvas_user_id, term_feed, canvas_sites_for_term)
+                merge_canvas_site_membership(membership, sid, canvas_user_id, term_feed, canvas_sites_for_term, sections_by_ccn)
     return all_advisees_terms_map
 
 
-def merge_canvas_site_membership(membership, sid, canvas_user_id, term_feed, canvas_sites_for_term):
+def index_term_feed_sections(term_feed):
+    # Map each CCN to the (enrollment index, section) pairs in which it appears, in term feed order.
+    sections_by_ccn = {}
+    for index, enrollment in enumerate(term_feed['enrollments']):
+        for sis_section in enrollment['sections']:
+            sections_by_ccn.setdefault(sis_section.get('ccn'), []).append((index, sis_section))
+    return sections_by_ccn
+
+
+def merge_canvas_site_membership(membership, sid, canvas_user_id, term_feed, canvas_sites_for_term, sections_by_ccn=None):
     enrollments_matched = set()
     canvas_course_id = membership['canvas_course_id']
     canvas_site = canvas_sites_for_term.get(canvas_course_id)
@@ -192,18 +233,18 @@ def merge_canvas_site_membership(membership, sid, canvas_user_id, term_feed, can
     }
     if canvas_user_id:
         canvas_site['adviseeEnrollments'].append(canvas_user_id)
+    if sections_by_ccn is None:
+        sections_by_ccn = index_term_feed_sections(term_feed)
     for canvas_ccn in canvas_sections:
         # There is no particularly intuitive unique identifier for a 'class enrollment', and so we resort to
         # list position.
-        for index, enrollment in enumerate(term_feed['enrollments']):
-            for sis_section in enrollment['sections']:
-                if canvas_ccn == sis_section.get('ccn'):
-                    sis_section['canvasCourseIds'] = sis_section.get('canvasCourseIds', [])
-                    sis_section['canvasCourseIds'].append(canvas_course_id)
-                    # Do not add the same site multiple times to the same enrollment.
-                    if index not in enrollments_matched:
-                        enrollments_matched.add(index)
-                        enrollment['canvasSites'].append(canvas_site_element)
+        for index, sis_section in sections_by_ccn.get(canvas_ccn, []):
+            sis_section['canvasCourseIds'] = sis_section.get('canvasCourseIds', [])
+            sis_section['canvasCourseIds'].append(canvas_course_id)
+            # Do not add the same site multiple times to the same enrollment.
+            if index not in enrollments_matched:
+                enrollments_matched.add(index)
+                term_feed['enrollments'][index]['canvasSites'].append(canvas_site_element)
     if not enrollments_matched:
         term_feed['unmatchedCanvasSites'].append(canvas_site_element)
 
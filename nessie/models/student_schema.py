@@ -23,6 +23,8 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+from gzip import GzipFile
+import tempfile
 
 from flask import current_app as app
 from nessie.externals import redshift, s3
@@ -34,6 +36,107 @@ import psycopg2.sql
 """Higher-level logic for staged student schema in Redshift."""
 
 
+class StagingRowSink:
+    """Collect TSV rows for a staging table in gzipped temporary files, so that memory use does not grow with row count.
+
+    Rows are appended one at a time, as to a list, and dealt in turn to one file per COPY part. The files are uploaded
+    to S3 when the table is written to staging.
+    """
+
+    def __init__(self, table, term_id=None):
+        self.table = table
+        self.term_id = term_id
+        self.row_count = 0
+        (self.manifest_key, self.part_keys) = staging_manifest_keys(table, term_id)
+        self._files = [tempfile.TemporaryFile() for part_key in self.part_keys]
+        self._gzipped = [GzipFile(None, 'wb', fileobj=part_file) for part_file in self._files]
+
+    def __len__(self):
+        return self.row_count
+
+    def append(self, row):
+        self._gzipped[self.row_count % len(self._gzipped)].write(row + b'\n')
+        self.row_count += 1
+
+    def close(self):
+        for gzipped, part_file in zip(self._gzipped, self._files):
+            gzipped.close()
+            part_file.close()
+
+    def upload(self):
+        """Upload parts that received rows (or the first part, if none did), returning their keys or None on error."""
+        uploads = []
+        for part, (gzipped, part_file) in enumerate(zip(self._gzipped, self._files)):
+            # Closing the gzip stream writes its trailer but leaves the underlying file open.
+            gzipped.close()
+            if part == 0 or part < self.row_count:
+                # Be kind; rewind
+                part_file.seek(0)
+                uploads.append((self.part_keys[part], part_file))
+        if not s3.upload_files(uploads):
+            return None
+        return [part_key for part_key, part_file in uploads]
+
+
+class S3StagingRowSink(StagingRowSink):
+    """Stream gzipped TSV rows for a staging table straight to S3 by multipart upload, one COPY part at a time.
+
+    Only one part is open at once, so that memory use is bounded by a single multipart buffer per table rather than one
+    per part. Each part takes rows up to STAGING_S3_PART_SIZE uncompressed bytes before it is closed and the next begun,
+    and so a large table still splits into enough parts for slices to load in parallel.
+    """
+
+    def __init__(self, table, term_id=None):
+        self.table = table
+        self.term_id = term_id
+        self.row_count = 0
+        self._s3_stem = staging_s3_stem(table, term_id)
+        self._part_size = app.config['STAGING_S3_PART_SIZE']
+        self.manifest_key = f'{self._s3_stem}.manifest'
+        self.part_keys = []
+        # A part's upload stream is opened on first append to it, so that an empty table leaves no partial object behind.
+        self._stream = None
+        self._gzipped = None
+        self._part_bytes = 0
+
+    def append(self, row):
+        if self._stream is None:
+            part_key = redshift.copy_part_key(self._s3_stem, len(self.part_keys))
+            self._stream = s3.get_upload_stream(part_key, min_part_size=s3.MIN_PART_SIZE)
+            self._gzipped = GzipFile(None, 'wb', fileobj=self._stream)
+            self.part_keys.append(part_key)
+        self._gzipped.write(row + b'\n')
+        self._part_bytes += len(row) + 1
+        self.row_count += 1
+        if self._part_bytes >= self._part_size:
+            self.close()
+
+    def close(self):
+        if self._stream is not None:
+            self._gzipped.close()
+            self._stream.close()
+            self._gzipped = None
+            self._stream = None
+            self._part_bytes = 0
+
+    def upload(self):
+        self.close()
+        part_keys = list(self.part_keys)
+        if not part_keys:
+            part_keys = [redshift.copy_part_key(self._s3_stem, 0)]
+            if not s3.upload_tsv_rows_gz([], part_keys[0]):
+                return None
+        app.logger.info(f'S3 upload complete: {len(part_keys)} parts of {self.manifest_key}')
+        return part_keys
+
+
+def get_row_sink(table, term_id=None):
+    if app.config['STAGING_ROW_SINK'] == 's3':
+        return S3StagingRowSink(table, term_id)
+    else:
+        return StagingRowSink(table, term_id)
+
+
 def redshift_schema():
     return app.config['REDSHIFT_SCHEMA_STUDENT']
 
@@ -51,10 +154,14 @@ def drop_staged_enrollment_term(term_id):
     )
 
 
-def refresh_all_from_staging(tables):
+def refresh_all_from_staging(tables, sids=None):
+    # Full refreshes swap in tables built from staging, unless configured to copy rows into the existing tables.
+    if sids is None and app.config['STUDENT_SCHEMA_TABLE_SWAP']:
+        swap_all_from_staging(tables)
+        return
     with redshift.transaction() as transaction:
         for table in tables:
-            refresh_from_staging(table, None, None, transaction)
+            refresh_from_staging(table, None, sids, transaction)
         if not transaction.commit():
             raise BackgroundJobError(f'Final transaction commit failed for {redshift_schema()}.')
 
@@ -121,6 +228,39 @@ def refresh_from_staging(table, term_id, sids, transaction, truncate_staging=Tru
         app.logger.info(f'Truncated staging table {staging_schema()}.{table}.')
 
 
+def swap_all_from_staging(tables):
+    """Replace tables with the contents of their staging tables, leaving the staging tables empty.
+
+    For each table, a shadow table is created alongside the destination, and the staging table's storage is moved into
+    it by ALTER TABLE APPEND, without rows being rewritten. Once every shadow table is built, all take their
+    destinations' names in a single transaction, so that readers see either all old tables or all new. Grants on the new
+    tables come from the schema's default privileges.
+    """
+    for table in tables:
+        identifiers = _swap_identifiers(table)
+        if not (
+            redshift.execute('DROP TABLE IF EXISTS {schema}.{shadow}', **identifiers)
+            and redshift.execute('CREATE TABLE {schema}.{shadow} (LIKE {schema}.{table})', **identifiers)
+            and redshift.append_from_table(redshift_schema(), f'{table}_shadow', staging_schema(), table)
+        ):
+            raise BackgroundJobError(f'Failed to build {redshift_schema()}.{table} from staging schema.')
+    with redshift.transaction() as transaction:
+        for table in tables:
+            identifiers = _swap_identifiers(table)
+            swapped = (
+                transaction.execute('DROP TABLE IF EXISTS {schema}.{retired}', **identifiers)
+                and transaction.execute('ALTER TABLE {schema}.{table} RENAME TO {retired}', **identifiers)
+                and transaction.execute('ALTER TABLE {schema}.{shadow} RENAME TO {table}', **identifiers)
+                and transaction.execute('DROP TABLE {schema}.{retired}', **identifiers)
+            )
+            if not swapped:
+                transaction.rollback()
+                raise BackgroundJobError(f'Failed to swap {redshift_schema()}.{table} for table built from staging schema.')
+        if not transaction.commit():
+            raise BackgroundJobError(f'Swap transaction commit failed for {redshift_schema()}.')
+    app.logger.info(f'Swapped {len(tables)} tables in {redshift_schema()} for tables built from staging schema.')
+
+
 def truncate_staging_table(table):
     redshift.execute(
         'TRUNCATE {schema}.{table}',
@@ -129,6 +269,19 @@ def truncate_staging_table(table):
     )
 
 
+def vacuum_and_analyze(tables):
+    """Vacuum and analyze the given tables, rather than the whole database."""
+    for table in tables:
+        identifiers = {
+            'schema': psycopg2.sql.Identifier(redshift_schema()),
+            'table': psycopg2.sql.Identifier(table),
+        }
+        # VACUUM cannot run inside a transaction block, and so is executed on its own.
+        if not (redshift.execute('VACUUM {schema}.{table}', **identifiers) and redshift.execute('ANALYZE {schema}.{table}', **identifiers)):
+            app.logger.warning(f'Failed to vacuum and analyze {redshift_schema()}.{table}.')
+    app.logger.info(f"Vacuumed and analyzed {len(tables)} tables in {redshift_schema()}.")
+
+
 def unload_enrollment_terms(term_ids):
     query = resolve_sql_template_string(
         """
@@ -149,57 +302,47 @@ def unload_enrollment_terms(term_ids):
         raise BackgroundJobError('Error on Redshift unload: aborting job.')
 
 
+def staging_manifest_keys(table, term_id=None):
+    return redshift.copy_manifest_keys(staging_s3_stem(table, term_id))
+
+
+def staging_s3_stem(table, term_id=None):
+    stem = f'staging_{table}_{term_id}' if term_id else f'staging_{table}'
+    return f'{get_s3_sis_api_daily_path()}/{stem}'
+
+
 def upload_to_staging(table, rows, term_id=None):
-    if term_id:
-        tsv_filename = f'staging_{table}_{term_id}.tsv'
+    """Upload rows to S3, split into parts listed by a COPY manifest, and copy them into the staging table.
+
+    Rows may be supplied either as a list of encoded TSV rows or as a StagingRowSink.
+    """
+    (manifest_key, part_keys) = staging_manifest_keys(table, term_id)
+    app.logger.info(f'Will stash {len(rows)} feeds in S3: {manifest_key}')
+    if isinstance(rows, StagingRowSink):
+        uploaded_keys = rows.upload()
+        uploaded = bool(uploaded_keys) and s3.upload_copy_manifest(uploaded_keys, manifest_key)
     else:
-        tsv_filename = f'staging_{table}.tsv'
-    s3_key = f'{get_s3_sis_api_daily_path()}/{tsv_filename}'
-    app.logger.info(f'Will stash {len(rows)} feeds in S3: {s3_key}')
-    if not s3.upload_tsv_rows(rows, s3_key):
+        uploaded = s3.upload_tsv_rows_gz_manifest(rows, manifest_key, part_keys)
+    if not uploaded:
         raise BackgroundJobError('Error on S3 upload: aborting job.')
-
-    app.logger.info('Will copy S3 feeds into Redshift...')
-    query = resolve_sql_template_string(
-        """
-        COPY {staging_schema}.{table}
-            FROM '{loch_s3_sis_api_data_path}/{tsv_filename}'
-            IAM_ROLE '{redshift_iam_role}'
-            DELIMITER '\\t';
-        """,
-        staging_schema=staging_schema(),
-        table=table,
-        tsv_filename=tsv_filename,
-    )
-    if not redshift.execute(query):
-        raise BackgroundJobError('Error on Redshift copy: aborting job.')
+    copy_to_staging(table, term_id)
 
 
 def upload_file_to_staging(table, term_file, row_count, term_id):
-    if term_id:
-        tsv_filename = f'staging_{table}_{term_id}.tsv'
-    else:
-        tsv_filename = f'staging_{table}.tsv'
-    s3_key = f'{get_s3_sis_api_daily_path()}/{tsv_filename}'
-    app.logger.info(f'Will stash {row_count} feeds in S3: {s3_key}')
+    (manifest_key, part_keys) = staging_manifest_keys(table, term_id)
+    app.logger.info(f'Will stash {row_count} feeds in S3: {manifest_key}')
     # Be kind; rewind
     term_file.seek(0)
-    if not s3.upload_data(term_file, s3_key):
+    rows = (line.rstrip(b'\n') for line in term_file)
+    if not s3.upload_tsv_rows_gz_manifest(rows, manifest_key, part_keys):
         raise BackgroundJobError('Error on S3 upload: aborting job.')
+    copy_to_staging(table, term_id)
+
 
+def copy_to_staging(table, term_id):
     app.logger.info('Will copy S3 feeds into Redshift...')
-    query = resolve_sql_template_string(
-        """
-        COPY {staging_schema}.{table}
-            FROM '{loch_s3_sis_api_data_path}/{tsv_filename}'
-            IAM_ROLE '{redshift_iam_role}'
-            DELIMITER '\\t';
-        """,
-        staging_schema=staging_schema(),
-        table=table,
-        tsv_filename=tsv_filename,
-    )
-    if not redshift.execute(query):
+    (manifest_key, part_keys) = staging_manifest_keys(table, term_id)
+    if not redshift.copy_tsv_from_s3(f'{staging_schema()}.{table}', manifest_key, gzip=True, manifest=True):
         raise BackgroundJobError('Error on Redshift copy: aborting job.')
 
 
@@ -226,3 +369,12 @@ def write_file_to_staging(table, term_file, row_count, term_id=None):
     upload_file_to_staging(table, term_file, row_count, term_id)
     verify_table(table)
     return True
+
+
+def _swap_identifiers(table):
+    return {
+        'schema': psycopg2.sql.Identifier(redshift_schema()),
+        'table': psycopg2.sql.Identifier(table),
+        'shadow': psycopg2.sql.Identifier(f'{table}_shadow'),
+        'retired': psycopg2.sql.Identifier(f'{table}_retired'),
+    }
@@ -60,9 +60,13 @@ CREATE TABLE IF NOT EXISTS {rds_schema_metadata}.background_job_status
     instance_id VARCHAR,
     created_at TIMESTAMP NOT NULL,
     updated_at TIMESTAMP NOT NULL,
-    details VARCHAR(4096)
+    details VARCHAR(4096),
+    -- Timings and resource usage of job phases, as a JSON array.
+    phases JSON
 );
 
+ALTER TABLE {rds_schema_metadata}.background_job_status ADD COLUMN IF NOT EXISTS phases JSON;
+
 CREATE TABLE IF NOT EXISTS {rds_schema_metadata}.canvas_sync_job_status
 (
     job_id VARCHAR NOT NULL,
@@ -113,6 +117,14 @@ CREATE TABLE IF NOT EXISTS {rds_schema_metadata}.registration_import_status
     updated_at TIMESTAMP NOT NULL
 );
 
+CREATE TABLE IF NOT EXISTS {rds_schema_metadata}.merged_feed_fingerprints
+(
+    sid VARCHAR NOT NULL PRIMARY KEY,
+    -- Hash of the input feed elements from which the student's merged profile was last generated.
+    fingerprint VARCHAR NOT NULL,
+    updated_at TIMESTAMP NOT NULL
+);
+
 CREATE TABLE IF NOT EXISTS {rds_schema_metadata}.photo_import_status
 (
     sid VARCHAR NOT NULL PRIMARY KEY,
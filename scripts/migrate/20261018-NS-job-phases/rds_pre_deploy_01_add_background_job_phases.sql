@@ -0,0 +1,6 @@
+BEGIN TRANSACTION;
+
+-- Background job status updates write phase timings to this column, and so it must exist before the code is deployed.
+ALTER TABLE metadata.background_job_status ADD COLUMN IF NOT EXISTS phases JSON;
+
+COMMIT;
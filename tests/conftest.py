@@ -81,6 +81,7 @@ def metadata_db(app):
         status VARCHAR NOT NULL,
         instance_id VARCHAR,
         details VARCHAR(4096),
+        phases JSON,
         created_at TIMESTAMP NOT NULL,
         updated_at TIMESTAMP NOT NULL
     )""")
@@ -114,6 +115,12 @@ def metadata_db(app):
         status VARCHAR NOT NULL,
         updated_at TIMESTAMP NOT NULL
     );""")
+    rds.execute(f"""CREATE TABLE IF NOT EXISTS {rds_schema}.merged_feed_fingerprints
+    (
+        sid VARCHAR NOT NULL PRIMARY KEY,
+        fingerprint VARCHAR NOT NULL,
+        updated_at TIMESTAMP NOT NULL
+    );""")
     rds.execute(f"""CREATE TABLE IF NOT EXISTS {rds_schema}.merged_enrollment_term_job_queue
     (
        id SERIAL PRIMARY KEY,
@@ -23,7 +23,8 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
-from tests.util import credentials, get_basic_auth, post_basic_auth
+from nessie.externals import rds
+from tests.util import credentials, delete_basic_auth, get_basic_auth, post_basic_auth
 
 
 class TestAdminController:
@@ -44,6 +45,32 @@ class TestAdminController:
         assert response.status_code == 200
         assert response.json == []
 
+    def test_connection_pools(self, app, client, metadata_db):
+        """Reports statistics for each database connection pool in use."""
+        response = get_basic_auth(client=client, path='/api/admin/connection_pools', credentials=credentials(app))
+        assert response.status_code == 200
+        assert len(response.json)
+        for stats in response.json.values():
+            assert stats['max_size'] == app.config['DB_POOL_MAX_SIZE']
+            assert stats['in_use'] == 0
+
+    def test_query_metrics(self, app, client, metadata_db):
+        """Reports statistics for queries run, and resets them on request."""
+        rds.fetch('SELECT 1 AS one')
+        rds.fetch('SELECT 2 AS one')
+        response = get_basic_auth(client=client, path='/api/admin/query_metrics', credentials=credentials(app))
+        assert response.status_code == 200
+        metric = next(m for m in response.json if m['fingerprint'] == 'select ? as one')
+        assert metric['database'] == 'rds'
+        assert metric['calls'] == 2
+        assert metric['rows'] == 2
+        assert metric['errors'] == 0
+        assert metric['max_seconds'] <= metric['total_seconds']
+
+        response = delete_basic_auth(client=client, path='/api/admin/query_metrics', credentials=credentials(app))
+        assert response.status_code == 200
+        assert response.json == []
+
     def test_failures_from_last_sync(self, app, client):
         """Returns jobs runnable via Admin Console."""
         response = get_basic_auth(client=client, path='/api/admin/runnable_jobs', credentials=credentials(app))
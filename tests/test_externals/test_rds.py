@@ -0,0 +1,79 @@
+"""
+Copyright ©2019. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from datetime import datetime
+
+from nessie.externals import rds
+from nessie.lib.query_metrics import get_query_metrics, reset_query_metrics
+from tests.util import override_config
+
+
+class TestRds:
+
+    def test_copy_rows(self, app, metadata_db):
+        """Loads rows through COPY, escaping special characters and NULLs."""
+        schema = app.config['RDS_SCHEMA_METADATA']
+        rds.execute(f'CREATE TABLE {schema}.copy_test (id INTEGER, note VARCHAR, flag BOOLEAN, created_at TIMESTAMP)')
+        rows = [
+            (1, 'plain', True, datetime(2019, 10, 1, 12, 30)),
+            (2, 'tab\there, newline\nthere, backslash \\N', False, None),
+            (3, None, None, '2019-10-02T08:00:00'),
+        ]
+        with rds.transaction() as transaction:
+            assert transaction.copy_rows(f'{schema}.copy_test', ['id', 'note', 'flag', 'created_at'], iter(rows)) == 'COPY 3'
+            transaction.commit()
+        results = rds.fetch(f'SELECT * FROM {schema}.copy_test ORDER BY id')
+        assert results[0] == {'id': 1, 'note': 'plain', 'flag': True, 'created_at': datetime(2019, 10, 1, 12, 30)}
+        assert results[1] == {'id': 2, 'note': 'tab\there, newline\nthere, backslash \\N', 'flag': False, 'created_at': None}
+        assert results[2] == {'id': 3, 'note': None, 'flag': None, 'created_at': datetime(2019, 10, 2, 8, 0)}
+
+    def test_sid_filter(self, app, metadata_db):
+        """Filters by SID lists inline when short and through a temporary table when long."""
+        schema = app.config['RDS_SCHEMA_METADATA']
+        rds.execute(f'CREATE TABLE {schema}.sid_test (sid VARCHAR)')
+        rds.execute(f"INSERT INTO {schema}.sid_test VALUES ('11667051'), ('2345678901'), ('3456789012')")
+        sql = f'SELECT sid FROM {schema}.sid_test WHERE sid = ANY({{sids}}) ORDER BY sid'
+        assert rds.fetch(sql, sids=['11667051', '3456789012']) == [{'sid': '11667051'}, {'sid': '3456789012'}]
+        assert rds.fetch(sql, sids=[]) == []
+        with override_config(app, 'SID_ARRAY_MAX_LENGTH', 1):
+            with rds.transaction() as transaction:
+                assert transaction.execute(f'DELETE FROM {schema}.sid_test WHERE sid = ANY({{sids}})', sids=['11667051', '2345678901'])
+                transaction.commit()
+            assert rds.fetch("SELECT COUNT(*) FROM pg_tables WHERE tablename LIKE 'nessie_sids_%'") == [{'count': 0}]
+        assert rds.fetch(f'SELECT sid FROM {schema}.sid_test') == [{'sid': '3456789012'}]
+
+    def test_sid_filter_fingerprint(self, app, metadata_db):
+        """Records long SID list queries under one fingerprint, whatever their temporary table names."""
+        schema = app.config['RDS_SCHEMA_METADATA']
+        rds.execute(f'CREATE TABLE {schema}.sid_fingerprint_test (sid VARCHAR)')
+        sql = f'SELECT sid FROM {schema}.sid_fingerprint_test WHERE sid = ANY({{sids}})'
+        reset_query_metrics()
+        with override_config(app, 'SID_ARRAY_MAX_LENGTH', 1):
+            rds.fetch(sql, sids=['11667051', '2345678901'])
+            rds.fetch(sql, sids=['11667051', '2345678901'])
+        metrics = [m for m in get_query_metrics() if 'sid_fingerprint_test' in m['fingerprint']]
+        assert len(metrics) == 1
+        assert metrics[0]['calls'] == 2
+        assert 'nessie_sids_?' in metrics[0]['fingerprint']
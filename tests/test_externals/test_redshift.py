@@ -23,13 +23,22 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+import logging
+
 from nessie.externals import redshift
+from nessie.lib.db import get_connection_pool_stats
+from nessie.lib.query_metrics import get_query_metrics, reset_query_metrics
 from nessie.lib.util import resolve_sql_template
+import numpy
 import psycopg2.sql
 import pytest
 from tests.util import capture_app_logs, override_config
 
 
+def _connections_in_use():
+    return sum(stats['in_use'] for stats in get_connection_pool_stats().values())
+
+
 @pytest.fixture()
 def schema(app):
     schema = psycopg2.sql.Identifier(app.config['REDSHIFT_SCHEMA_BOAC'])
@@ -55,6 +64,102 @@ class TestRedshift:
                 redshift.execute('SELECT 1')
                 assert 'could not translate host name "H.C. Earwicker" to address' in caplog.text
 
+    def test_iter_fetch(self, app, schema):
+        """Streams query results from a server-side cursor in batches."""
+        schema = psycopg2.sql.Identifier(app.config['REDSHIFT_SCHEMA_BOAC'])
+        redshift.execute('CREATE TABLE {schema}.streamed AS SELECT generate_series(1, 25) AS n', schema=schema)
+        rows = redshift.iter_fetch('SELECT n FROM {schema}.streamed ORDER BY n', fetch_size=10, schema=schema)
+        assert [r['n'] for r in rows] == list(range(1, 26))
+
+    def test_iter_fetch_discarded(self, app, schema):
+        """Releases the connection of a streaming query whose results are discarded unread or partly read."""
+        schema = psycopg2.sql.Identifier(app.config['REDSHIFT_SCHEMA_BOAC'])
+        redshift.execute('CREATE TABLE {schema}.streamed AS SELECT generate_series(1, 25) AS n', schema=schema)
+        in_use = _connections_in_use()
+        rows = redshift.iter_fetch('SELECT n FROM {schema}.streamed ORDER BY n', fetch_size=10, schema=schema)
+        assert _connections_in_use() == in_use + 1
+        del rows
+        assert _connections_in_use() == in_use
+        rows = redshift.iter_fetch('SELECT n FROM {schema}.streamed ORDER BY n', fetch_size=10, schema=schema)
+        assert next(rows)['n'] == 1
+        rows.close()
+        assert _connections_in_use() == in_use
+        assert list(rows) == []
+
+    def test_fetch_columns(self, app):
+        """Fetches query results as typed column arrays, with NULLs in float columns as NaN."""
+        sql = 'SELECT n, n / 2.0 AS half, NULLIF(n, 2)::FLOAT AS sparse FROM generate_series(1, 3) AS n ORDER BY n'
+        columns = redshift.fetch_columns(sql, {'n': 'int64', 'half': 'float64', 'sparse': 'float64'}, fetch_size=2)
+        assert columns['n'].dtype == numpy.int64
+        assert columns['n'].tolist() == [1, 2, 3]
+        assert columns['half'].tolist() == [0.5, 1.0, 1.5]
+        assert numpy.isnan(columns['sparse'][1])
+
+    def test_fetch_columns_null_integer(self, app, caplog):
+        """Returns None and logs errors when a NULL turns up in an integer column."""
+        sql = 'SELECT NULLIF(n, 2) AS n FROM generate_series(1, 3) AS n'
+        in_use = _connections_in_use()
+        with capture_app_logs(app):
+            assert redshift.fetch_columns(sql, {'n': 'int64'}) is None
+            assert 'Failed to convert Redshift column n to int64' in caplog.text
+        assert _connections_in_use() == in_use
+
+    def test_iter_fetch_logs_sql_text(self, app, caplog):
+        """Logs composed SQL of a streaming query as text."""
+        caplog.set_level(logging.DEBUG)
+        with capture_app_logs(app):
+            rows = redshift.iter_fetch('SELECT {n} AS n', n=psycopg2.sql.Literal(1))
+            assert list(rows) == [{'n': 1}]
+            assert 'Redshift query opened server-side cursor' in caplog.text
+            assert 'SELECT 1 AS n' in caplog.text
+            assert 'Composed' not in caplog.text
+
+    def test_iter_fetch_error_handling(self, app, caplog):
+        """Returns None and logs errors on a failed streaming query."""
+        with capture_app_logs(app):
+            assert redshift.iter_fetch('SELECT * FROM not_a_table') is None
+            assert 'relation "not_a_table" does not exist' in caplog.text
+
+    def test_ddl_statement_dependencies(self):
+        """Orders DDL statements by the objects they read and write."""
+        statements = [
+            'CREATE SCHEMA s',
+            '/* Comments are ignored. */ CREATE TABLE s.a AS (SELECT * FROM t.x)',
+            'CREATE TABLE s.b AS (SELECT * FROM t.y)',
+            'CREATE TABLE s.c AS (SELECT * FROM s.a JOIN t.y ON s.a.id = t.y.id)',
+            'DROP TABLE t.y',
+            'CREATE TEMP TABLE tmp AS (SELECT * FROM s.c)',
+            'INSERT INTO s.d SELECT * FROM tmp',
+            'INSERT INTO s.e SELECT * FROM s.d',
+        ]
+        assert redshift.ddl_statement_dependencies(statements) == [None, {0}, {0}, {0, 1}, {0, 2, 3}, None, None, {6}]
+
+    def test_execute_ddl_script_concurrently(self, app, ensure_drop_schema):
+        """Runs independent DDL statements concurrently, and dependent statements in order."""
+        schema = app.config['REDSHIFT_SCHEMA_BOAC']
+        ddl = f"""DROP SCHEMA IF EXISTS {schema} CASCADE;
+            CREATE SCHEMA {schema};
+            CREATE TABLE {schema}.odds AS (SELECT generate_series(1, 9, 2) AS n);
+            CREATE TABLE {schema}.evens AS (SELECT generate_series(2, 10, 2) AS n);
+            CREATE TABLE {schema}.numbers AS (SELECT n FROM {schema}.odds UNION SELECT n FROM {schema}.evens);
+            INSERT INTO {schema}.numbers VALUES (11);
+            """
+        assert redshift.execute_ddl_script(ddl, max_concurrency=3) is True
+        result = redshift.fetch(f'SELECT COUNT(*) FROM {schema}.numbers')
+        assert result[0]['count'] == 11
+
+    def test_execute_ddl_script_aborts_on_error(self, app, caplog, ensure_drop_schema):
+        """Starts no further DDL statements after one fails."""
+        schema = app.config['REDSHIFT_SCHEMA_BOAC']
+        ddl = f"""CREATE SCHEMA IF NOT EXISTS {schema};
+            CREATE TABLE {schema}.broken AS (SELECT * FROM not_a_table);
+            CREATE TABLE {schema}.after AS (SELECT * FROM {schema}.broken);
+            """
+        with capture_app_logs(app):
+            assert redshift.execute_ddl_script(ddl, max_concurrency=3) is False
+            assert 'aborting remainder of script' in caplog.text
+        assert redshift.fetch(f'SELECT * FROM {schema}.after') is None
+
     @pytest.mark.testext
     def test_schema_creation_drop(self, app, caplog, ensure_drop_schema):
         """Can create and drop schemata on a real Redshift instance."""
@@ -82,3 +187,19 @@ class TestRedshift:
         result = redshift.fetch('SELECT COUNT(*) FROM {schema}.students', schema=schema)
         assert len(result) == 1
         assert result[0]['count'] == 7
+
+    @pytest.mark.testext
+    def test_sid_filter(self, app, schema):
+        """Filters by long SID lists through a temporary table on a real Redshift instance."""
+        schema = psycopg2.sql.Identifier(app.config['REDSHIFT_SCHEMA_BOAC'])
+        redshift.execute('CREATE TABLE {schema}.sid_test (sid VARCHAR)', schema=schema)
+        redshift.execute("INSERT INTO {schema}.sid_test VALUES ('11667051'), ('2345678901'), ('3456789012')", schema=schema)
+        sql = 'SELECT sid FROM {schema}.sid_test WHERE sid = ANY({sids}) ORDER BY sid'
+        reset_query_metrics()
+        with override_config(app, 'SID_ARRAY_MAX_LENGTH', 1):
+            assert redshift.fetch(sql, schema=schema, sids=['11667051', '3456789012']) == [{'sid': '11667051'}, {'sid': '3456789012'}]
+            rows = redshift.iter_fetch(sql, schema=schema, sids=['2345678901', '3456789012'])
+            assert list(rows) == [{'sid': '2345678901'}, {'sid': '3456789012'}]
+        metrics = [m for m in get_query_metrics() if 'sid_test' in m['fingerprint']]
+        assert metrics[0]['calls'] == 2
+        assert 'nessie_sids_?' in metrics[0]['fingerprint']
@@ -23,11 +23,14 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
-from botocore.exceptions import ConnectionError
-from nessie.externals import s3
+from datetime import datetime, timedelta, timezone
+import re
+
+from botocore.exceptions import ClientError, ConnectionError
+from nessie.externals import aws, s3
 import pytest
 import responses
-from tests.util import capture_app_logs, mock_s3
+from tests.util import capture_app_logs, mock_s3, override_config
 
 
 @pytest.fixture
@@ -41,6 +44,57 @@ def bad_bucket(app):
 class TestS3:
     """S3 client with mocked external connections."""
 
+    def test_shared_client(self, app):
+        """Reuses assumed-role credentials and clients between calls."""
+        with mock_s3(app):
+            credentials = aws.get_credentials()
+            client = s3.get_client()
+            assert s3.get_client() is client
+            assert aws.get_credentials() is credentials
+            aws.clear_cache()
+            assert s3.get_client() is not client
+
+    def test_credentials_refresh(self, app, monkeypatch):
+        """Renews assumed-role credentials within the refresh margin of expiry, while sessions and clients stay shared."""
+        now = datetime.now(timezone.utc)
+        renewals = []
+
+        def _assume_role(role_arn):
+            # The first credentials expire within the refresh margin; their renewal does not.
+            expiry = now + (timedelta(hours=1) if renewals else timedelta(seconds=aws.CREDENTIALS_REFRESH_MARGIN_SECONDS / 4))
+            renewals.append(role_arn)
+            return {'access_key': f'key-{len(renewals)}', 'secret_key': 'secret', 'token': 'token', 'expiry_time': expiry.isoformat()}
+
+        monkeypatch.setattr(aws, '_assume_role', _assume_role)
+        aws.clear_cache()
+        try:
+            client = s3.get_client()
+            session_credentials = aws.get_session().get_credentials()
+            assert session_credentials is aws.get_credentials()
+            assert session_credentials.get_frozen_credentials().access_key == 'key-2'
+            assert session_credentials.get_frozen_credentials().access_key == 'key-2'
+            assert renewals == [app.config['AWS_APP_ROLE_ARN']] * 2
+            assert s3.get_client() is client
+        finally:
+            aws.clear_cache()
+
+    def test_credentials_no_early_refresh(self, app, monkeypatch):
+        """Keeps assumed-role credentials that expire outside the refresh margin, though inside botocore's default."""
+        expiry = datetime.now(timezone.utc) + timedelta(seconds=aws.CREDENTIALS_REFRESH_MARGIN_SECONDS * 2)
+        renewals = []
+
+        def _assume_role(role_arn):
+            renewals.append(role_arn)
+            return {'access_key': f'key-{len(renewals)}', 'secret_key': 'secret', 'token': 'token', 'expiry_time': expiry.isoformat()}
+
+        monkeypatch.setattr(aws, '_assume_role', _assume_role)
+        aws.clear_cache()
+        try:
+            assert aws.get_session().get_credentials().get_frozen_credentials().access_key == 'key-1'
+            assert len(renewals) == 1
+        finally:
+            aws.clear_cache()
+
     def test_list_keys_matching_prefix(self, app):
         """Lists keys matching prefix."""
         bucket = app.config['LOCH_S3_BUCKET']
@@ -58,6 +112,149 @@ class TestS3:
             assert f'{prefix}/requests-bbb.gz' in response
             assert f'{prefix}/requests-ccc.gz' in response
 
+    def test_reconcile_prefixes(self, app):
+        """Lists prefixes once, across sub-prefixes, and reports missing and size-mismatched keys."""
+        bucket = app.config['LOCH_S3_BUCKET']
+        with mock_s3(app) as m:
+            m.Object(bucket, 'source/1/a.txt').put(Body=b'some data')
+            m.Object(bucket, 'source/1/b.txt').put(Body=b'some more data')
+            m.Object(bucket, 'source/2/c.txt').put(Body=b'yet more data')
+            m.Object(bucket, 'destination/1/a.txt').put(Body=b'some data')
+            m.Object(bucket, 'destination/2/c.txt').put(Body=b'truncated')
+            m.Object(bucket, 'destination/3/d.txt').put(Body=b'utterly unrelated data')
+
+            source_sizes = s3.get_object_sizes_with_prefix('source')
+            assert source_sizes == {'source/1/a.txt': 9, 'source/1/b.txt': 14, 'source/2/c.txt': 13}
+            dest_sizes = s3.get_object_sizes_with_prefix('destination', sub_prefixes=['/1', '/2'])
+            assert dest_sizes == {'destination/1/a.txt': 9, 'destination/2/c.txt': 9}
+
+            reconciliation = s3.reconcile_keys(source_sizes, dest_sizes, lambda key: key.replace('source', 'destination', 1))
+            assert reconciliation == {'missing': ['source/1/b.txt'], 'size_mismatched': ['source/2/c.txt']}
+
+    def test_copy_many(self, app):
+        """Copies objects concurrently, reporting results per destination key."""
+        bucket = app.config['LOCH_S3_BUCKET']
+        with mock_s3(app) as m:
+            for i in range(5):
+                m.Object(bucket, f'source/file-{i}.txt').put(Body=f'contents {i}'.encode())
+            copies = [(bucket, f'source/file-{i}.txt', bucket, f'destination/file-{i}.txt') for i in range(6)]
+            results = s3.copy_many(copies, max_threads=3)
+            assert results == {(bucket, f'destination/file-{i}.txt'): i < 5 for i in range(6)}
+            assert s3.get_object_text('destination/file-4.txt') == 'contents 4'
+
+    def test_copy_many_expired_token(self, app, monkeypatch):
+        """Retries copies that fail on an expired token."""
+        bucket = app.config['LOCH_S3_BUCKET']
+        with mock_s3(app) as m:
+            m.Object(bucket, 'source/file-0.txt').put(Body=b'contents 0')
+            client = s3.get_client()
+            copy_object = client.copy_object
+            expired = []
+
+            def _copy_object(**kwargs):
+                if not expired:
+                    expired.append(kwargs['Key'])
+                    raise ClientError({'Error': {'Code': 'ExpiredToken', 'Message': 'The provided token has expired.'}}, 'CopyObject')
+                return copy_object(**kwargs)
+
+            monkeypatch.setattr(client, 'copy_object', _copy_object)
+            monkeypatch.setattr(s3.time, 'sleep', lambda seconds: None)
+            results = s3.copy_many([(bucket, 'source/file-0.txt', bucket, 'destination/file-0.txt')])
+            assert results == {(bucket, 'destination/file-0.txt'): True}
+            assert expired == ['destination/file-0.txt']
+
+    def test_copy_many_by_size(self, app, monkeypatch):
+        """Copies objects in parts if listed or HEAD sizes exceed the single-copy limit, and fails on other invalid requests."""
+        bucket = app.config['LOCH_S3_BUCKET']
+        with mock_s3(app) as m:
+            for i in range(3):
+                m.Object(bucket, f'source/file-{i}.txt').put(Body=f'contents {i}'.encode())
+            client = s3.get_client()
+            copy_object = client.copy_object
+            multipart_copies = []
+
+            def _copy(source, dest_bucket, dest_key, **kwargs):
+                multipart_copies.append(dest_key)
+                return copy_object(Bucket=dest_bucket, Key=dest_key, CopySource=source)
+
+            def _copy_object(**kwargs):
+                if kwargs['Key'] == 'destination/file-2.txt':
+                    raise ClientError({'Error': {'Code': 'InvalidRequest', 'Message': 'Invalid copy request.'}}, 'CopyObject')
+                return copy_object(**kwargs)
+
+            monkeypatch.setattr(client, 'copy', _copy)
+            monkeypatch.setattr(client, 'copy_object', _copy_object)
+            monkeypatch.setattr(s3, 'MAX_SINGLE_COPY_SIZE', 10)
+            copies = [(bucket, f'source/file-{i}.txt', bucket, f'destination/file-{i}.txt') for i in range(3)]
+            results = s3.copy_many(copies, source_sizes={'source/file-0.txt': 11})
+            assert results == {
+                (bucket, 'destination/file-0.txt'): True,
+                (bucket, 'destination/file-1.txt'): True,
+                (bucket, 'destination/file-2.txt'): False,
+            }
+            assert multipart_copies == ['destination/file-0.txt']
+            assert s3.get_object_text('destination/file-1.txt') == 'contents 1'
+
+    def test_upload_stream(self, app):
+        """Streams written content to an S3 object."""
+        bucket = app.config['LOCH_S3_BUCKET']
+        key = 'sis-api-data/daily/staging_student_profiles.tsv'
+        with mock_s3(app) as m:
+            with s3.get_upload_stream(key) as stream:
+                for i in range(3):
+                    stream.write(f'{i}\tprofile\n'.encode())
+            assert m.Object(bucket, key).get()['Body'].read() == b'0\tprofile\n1\tprofile\n2\tprofile\n'
+
+    def test_tsv_rows_gz(self, app):
+        """Streams TSV rows from an iterator to a gzipped object."""
+        key = 'sis-api-data/daily/staging_student_profiles.tsv.gz'
+        rows = (f'{i}\tprofile'.encode() for i in range(3))
+        with mock_s3(app):
+            assert s3.upload_tsv_rows_gz(rows, key)
+            assert s3.get_unzipped_text_reader(key).read() == '0\tprofile\n1\tprofile\n2\tprofile\n'
+
+    def test_tsv_rows_gz_manifest(self, app):
+        """Deals TSV rows to gzipped parts and lists the parts in a COPY manifest."""
+        manifest_key = 'sis-api-data/daily/staging_student_profiles.manifest'
+        part_keys = [f'sis-api-data/daily/staging_student_profiles_{part:04}.tsv.gz' for part in range(4)]
+        rows = (f'{i}\tprofile'.encode() for i in range(3))
+        with mock_s3(app):
+            assert s3.upload_tsv_rows_gz_manifest(rows, manifest_key, part_keys)
+            entries = s3.get_object_json(manifest_key)['entries']
+            assert entries == [{'url': s3.build_s3_url(key), 'mandatory': True} for key in part_keys[0:3]]
+            assert s3.get_unzipped_text_reader(part_keys[0]).read() == '0\tprofile\n'
+            assert s3.get_unzipped_text_reader(part_keys[2]).read() == '2\tprofile\n'
+            assert not s3.object_exists(part_keys[3])
+
+    def test_upload_from_url_ranged(self, app):
+        """Syncs a file from a URL honoring Range requests in parts, checking the size of the result."""
+        bucket = app.config['LOCH_S3_BUCKET']
+        url = 'https://canvas-data.example.com/requests/part-00000.gz'
+        key = 'canvas/requests/part-00000.gz'
+        body = bytes(range(256)) * 24576
+
+        def ranged_response(request):
+            (start, end) = [int(i) for i in re.match(r'bytes=(\d+)-(\d+)', request.headers['Range']).groups()]
+            return (206, {'Content-Range': f'bytes {start}-{end}/{len(body)}'}, body[start:end + 1])
+
+        with override_config(app, 'LOCH_S3_RANGED_SYNC_PART_SIZE', 5 * 1024 * 1024):
+            with mock_s3(app) as m:
+                responses.add_callback(responses.GET, url, callback=ranged_response)
+                opened_headers = []
+                assert s3.upload_from_url_ranged(url, key, on_stream_opened=opened_headers.append)['ContentLength'] == len(body)
+                assert opened_headers == [{'Content-Length': str(len(body))}]
+                assert m.Object(bucket, key).get()['Body'].read() == body
+
+    def test_jsonl_gz_round_trip(self, app):
+        """Streams records to gzipped JSON lines and reads them back one at a time."""
+        key = 'boac-analytics/feeds/enrollment_term_map_2178.jsonl.gz'
+        records = [['11667051', {'termId': '2178', 'enrollments': []}], ['2345678901', {'termId': '2178', 'enrollments': [{'units': 4}]}]]
+        with mock_s3(app):
+            assert s3.upload_jsonl_gz(iter(records), key)
+            reader = s3.get_object_jsonl_gz(key)
+            assert next(reader) == records[0]
+            assert list(reader) == records[1:]
+
 
 @pytest.mark.testext
 class TestS3Testext:
@@ -0,0 +1,85 @@
+"""
+Copyright ©2019. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from nessie.externals import rds
+from nessie.jobs.background_job import BackgroundJob, ChainedBackgroundJob
+
+
+class PhasedJob(BackgroundJob):
+
+    def run(self):
+        with self.phase('transform') as phase:
+            sum(i * i for i in range(100000))
+            phase.add_rows(10)
+            phase.add_rows(5)
+        with self.phase('load'):
+            pass
+        return 'Phased job complete.'
+
+
+class TestBackgroundJob:
+
+    def test_phases_saved_with_status(self, app, metadata_db):
+        """Saves phase timings alongside job status."""
+        job = PhasedJob()
+        assert job.run_wrapped() == 'Phased job complete.'
+        schema = app.config['RDS_SCHEMA_METADATA']
+        rows = rds.fetch(f'SELECT * FROM {schema}.background_job_status WHERE job_id = %s', params=[job.job_id])
+        phases = rows[0]['phases']
+        assert [p['name'] for p in phases] == ['transform', 'load']
+        assert phases[0]['rows'] == 15
+        assert phases[1]['rows'] is None
+        for phase in phases:
+            assert phase['wallSeconds'] >= 0
+            assert phase['cpuSeconds'] >= 0
+            assert phase['peakRssMb'] > 0
+            assert phase['error'] is False
+
+    def test_peak_rss_per_phase(self):
+        """Reports the peak RSS reached during each phase, not the high-water mark of the process so far."""
+        job = PhasedJob()
+        with job.phase('allocate'):
+            ballast = b'x' * (128 * 1024 * 1024)
+        del ballast
+        with job.phase('release'):
+            pass
+        (allocate, release) = job.phase_timer.to_api_json()
+        assert allocate['peakRssMb'] - release['peakRssMb'] > 64
+
+    def test_failed_phase(self):
+        """Marks the phase in which an error was raised."""
+        job = PhasedJob()
+        try:
+            with job.phase('fetch'):
+                raise ValueError('boom')
+        except ValueError:
+            pass
+        assert job.phase_timer.to_api_json()[0]['error'] is True
+
+    def test_chained_phases(self, app, metadata_db):
+        """Times each step of a chained job."""
+        job = ChainedBackgroundJob(steps=[PhasedJob(), PhasedJob()])
+        assert job.run_wrapped(steps=job.job_args['steps'])
+        assert [p['name'] for p in job.phase_timer.to_api_json()] == ['PhasedJob', 'PhasedJob']
@@ -0,0 +1,102 @@
+"""
+Copyright ©2019. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from timeit import default_timer as timer
+
+from nessie.jobs.generate_merged_student_feeds import feed_elements_fingerprint, GenerateMergedStudentFeeds, PROFILE_TABLES
+from nessie.lib.queries import get_advisee_student_profile_elements
+from tests.util import override_config
+
+# Copies of the fixture students, under distinct SIDs, that make up the benchmark workload.
+BENCHMARK_COPIES = 200
+
+
+def _generate_profile_rows(app, process_count, all_feed_elements=None):
+    job = GenerateMergedStudentFeeds()
+    job.successes = []
+    job.failures = []
+    rows = {table: [] for table in PROFILE_TABLES}
+    advisees_by_canvas_id = {}
+    advisees_by_sid = {}
+    with override_config(app, 'MERGED_PROFILE_PROCESSES', process_count):
+        if all_feed_elements is None:
+            all_feed_elements = get_advisee_student_profile_elements()
+        job.generate_profile_rows(all_feed_elements, rows, advisees_by_canvas_id, advisees_by_sid)
+    return rows, advisees_by_canvas_id, advisees_by_sid, job.successes, job.failures
+
+
+class TestGenerateMergedStudentFeeds:
+
+    def test_generate_profile_rows(self, app):
+        """Generates profile rows and advisee maps for each student with a UID."""
+        rows, advisees_by_canvas_id, advisees_by_sid, successes, failures = _generate_profile_rows(app, 1)
+        assert len(successes) > 0
+        assert len(rows['student_profiles']) == len(successes)
+        assert advisees_by_canvas_id[10001] == {'sid': '2141', 'uid': '2040'}
+        assert advisees_by_sid['2141'] == {'canvas_user_id': 10001}
+
+    def test_generate_profile_rows_in_processes(self, app):
+        """Generates the same rows, in the same order, when profile parsing is spread across processes."""
+        assert _generate_profile_rows(app, 2) == _generate_profile_rows(app, 1)
+
+    def test_profile_generation_benchmark(self, app, capsys):
+        """Times profile generation in one process against several, which must generate the same rows."""
+        workload = [
+            dict(feed_elements, sid=f"{feed_elements['sid']}-{copy}")
+            for copy in range(BENCHMARK_COPIES)
+            for feed_elements in get_advisee_student_profile_elements()
+        ]
+        results = {}
+        timings = {}
+        for process_count in [1, 2, 4]:
+            start = timer()
+            results[process_count] = _generate_profile_rows(app, process_count, workload)
+            timings[process_count] = timer() - start
+        assert results[2] == results[1]
+        assert results[4] == results[1]
+        with capsys.disabled():
+            summary = ', '.join(f'{process_count} process(es) {seconds:.2f}s' for process_count, seconds in timings.items())
+            print(f'\nGenerated {len(workload)} student profiles: {summary}')
+
+    def test_changed_feed_elements(self, app):
+        """Passes on only the feed elements whose fingerprints have changed, while still mapping unchanged advisees."""
+        all_feed_elements = get_advisee_student_profile_elements()
+        previous_fingerprints = {feed_elements['sid']: feed_elements_fingerprint(feed_elements) for feed_elements in all_feed_elements}
+        all_feed_elements[1]['last_name'] = 'Heyer-Jones'
+
+        job = GenerateMergedStudentFeeds()
+        job.successes = []
+        job.failures = []
+        job.fingerprints = {}
+        job.changed_sids = []
+        advisees_by_canvas_id = {}
+        advisees_by_sid = {}
+        changed = list(job.changed_feed_elements(all_feed_elements, previous_fingerprints, advisees_by_canvas_id, advisees_by_sid))
+        assert [feed_elements['sid'] for feed_elements in changed] == ['2141']
+        assert job.changed_sids == ['2141']
+        assert job.fingerprints['2141'] != previous_fingerprints['2141']
+        assert '2141' not in advisees_by_sid
+        assert advisees_by_sid['11667051'] == {'canvas_user_id': 9000100}
+        assert len(job.successes) + len(job.failures) == len(all_feed_elements) - 1
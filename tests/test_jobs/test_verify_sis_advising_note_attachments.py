@@ -146,3 +146,17 @@ class TestVerifySisAdvisingNoteAttachments:
         assert (
             'Total number of failed attachment syncs from sis-data/sis-sftp/incremental/advising-notes/attachment-files/2018 is 1'
         ) in caplog.text
+
+    def test_attachments_outside_sid_folders(self, app, sis_note_tables):
+        """Fails rather than skipping destination keys that the listing by leading SID digit would miss."""
+        (bucket, source_prefix, dest_prefix) = get_s3_refs(app)
+        with mock_s3(app, bucket=bucket) as m3:
+            m3.Object(bucket, f'{source_prefix}/2017/01/18/12345678_00012_1.pdf').put(Body=b'a note attachment')
+            m3.Object(bucket, f'{dest_prefix}/12345678/12345678_00012_1.pdf').put(Body=b'a note attachment')
+            m3.Object(bucket, f'{dest_prefix}/misfiled/23456789_00003_1.png').put(Body=b'another note attachment')
+            m3.Object(bucket, f'{dest_prefix}/34567890_00014_2.xls').put(Body=b'yet another note attachment')
+            with pytest.raises(BackgroundJobError) as e:
+                VerifySisAdvisingNoteAttachments().run()
+        assert f'Found attachments outside SID folders in {dest_prefix}:' in str(e.value)
+        assert f'{dest_prefix}/34567890_00014_2.xls' in str(e.value)
+        assert f'{dest_prefix}/misfiled/' in str(e.value)
@@ -30,6 +30,8 @@ import operator
 from nessie.lib import analytics, queries
 from nessie.lib.mockingdata import MockRows, register_mock
 from nessie.merged.student_terms import get_canvas_site_maps, merge_memberships_into_site_map
+import pandas
+from scipy.stats import percentileofscore
 
 
 class TestAnalytics:
@@ -75,12 +77,13 @@ class TestAnalyticsFromAssignmentsSubmitted:
     canvas_user_id = 9000100
     canvas_course_id = 7654321
 
-    def digest_for_user(self, user_id):
+    def digest_for_user(self, user_id, distribution_cache=None):
         enrollment_term_map = mock_enrollment_term_map(self.user_sid, self.canvas_course_id)
         analytics.merge_assignment_submissions_for_user(
             enrollment_term_map[self.user_sid],
             user_id,
             get_relative_submission_counts(),
+            distribution_cache,
         )
         return enrollment_term_map[self.user_sid]['enrollments'][0]['canvasSites'][0]['analytics']['assignmentsSubmitted']
 
@@ -121,6 +124,23 @@ class TestAnalyticsFromAssignmentsSubmitted:
             assert best['displayPercentile'] == '100th'
             assert best['student']['raw'] == 3
 
+    def test_distribution_cache(self, app):
+        """Reuses a cached course distribution for each advisee sharing the same view of the course."""
+        distribution_cache = analytics.CourseDistributionCache()
+        for user_id in [self.canvas_user_id, 9000070, 9000071]:
+            assert self.digest_for_user(user_id, distribution_cache) == self.digest_for_user(user_id)
+        assert distribution_cache.misses == 1
+        assert distribution_cache.hits == 2
+
+    def test_site_map_enrollment_columns(self, app):
+        """Slices column arrays of Canvas enrollments by course."""
+        enrollments = self.canvas_site_map(app)[self.sis_term_id][self.canvas_course_id]['enrollments']
+        assert list(enrollments.keys()) == ['canvas_user_id', 'current_score', 'last_activity_at']
+        assert len(enrollments['canvas_user_id']) == 331
+        position = enrollments['canvas_user_id'].tolist().index(self.canvas_user_id)
+        assert enrollments['current_score'][position] == 84
+        assert enrollments['last_activity_at'][position] == 1535275620
+
     def test_when_no_data(self, app):
         mr = MockRows(io.StringIO('reference_user_id,sid,canvas_course_id,canvas_user_id,submissions_turned_in'))
         with register_mock(queries.get_advisee_submissions_sorted, mr):
@@ -231,3 +251,22 @@ class TestStudentAnalytics:
         assert mean['raw'] < 1535340481
         assert mean['percentile'] == 50
         assert mean['roundedUpPercentile'] < 50
+
+    def test_course_rankings_match_individual_calculations(self, app):
+        """Vectorized course rankings agree with per-student calculations."""
+        enrollments = self.canvas_site_map(app)[self.sis_term_id][self.canvas_course_id]['enrollments']
+        df = pandas.DataFrame(enrollments, columns=['canvas_user_id', 'current_score', 'last_activity_at'])
+        distributions = analytics.get_distributions_for_metric(df, ['current_score', 'last_activity_at'])
+        for metric in ['current_score', 'last_activity_at']:
+            dfcol = distributions[metric]['dfcol']
+            rankings = analytics.rankings_for_course(distributions, metric)
+            ranks = dfcol.rank(pct=True, method='max')
+            for position, value in enumerate(dfcol.values):
+                assert int(rankings['rounded_up_percentiles'][position]) == int(ranks.values[position] * 100)
+                assert rankings['matrixy_percentiles'][position] == percentileofscore(
+                    distributions[metric]['unique_scores'],
+                    value,
+                    kind='strict',
+                )
+                expected_zscore = analytics.zscore(distributions[metric]['dfcol_normalized'], value)
+                assert analytics.zptile(rankings['zscores'][position]) == analytics.zptile(expected_zscore)
@@ -0,0 +1,77 @@
+"""
+Copyright ©2019. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from nessie.lib.db import ConnectionPool, get_psycopg_cursor
+
+
+class TestConnectionPool:
+
+    def test_reuses_connections(self, app):
+        """Reuses idle connections, closing those beyond max size."""
+        pool = ConnectionPool({'uri': app.config['SQLALCHEMY_DATABASE_URI']}, max_size=1, max_idle_seconds=60)
+        with get_psycopg_cursor(pool=pool) as cursor:
+            cursor.execute('SELECT 1')
+            with get_psycopg_cursor(pool=pool) as nested_cursor:
+                nested_cursor.execute('SELECT 1')
+        stats = pool.get_stats()
+        assert stats['created'] == 2
+        assert stats['overflow'] == 1
+        assert stats['idle'] == 1
+        with get_psycopg_cursor(pool=pool) as cursor:
+            cursor.execute('SELECT 1')
+            assert pool.get_stats()['in_use'] == 1
+        stats = pool.get_stats()
+        assert stats['created'] == 2
+        assert stats['reused'] == 1
+        assert stats['in_use'] == 0
+        pool.close_all()
+
+    def test_replaces_dead_and_idle_connections(self, app):
+        """Replaces connections that have been closed or left idle too long."""
+        pool = ConnectionPool({'uri': app.config['SQLALCHEMY_DATABASE_URI']}, max_size=1, max_idle_seconds=60)
+        with get_psycopg_cursor(pool=pool) as cursor:
+            connection = cursor.connection
+        connection.close()
+        with get_psycopg_cursor(pool=pool) as cursor:
+            cursor.execute('SELECT 1')
+        assert pool.get_stats()['dead'] == 1
+
+        pool.max_idle_seconds = 0
+        with get_psycopg_cursor(pool=pool) as cursor:
+            cursor.execute('SELECT 1')
+        stats = pool.get_stats()
+        assert stats['evicted'] == 1
+        assert stats['created'] == 3
+        pool.close_all()
+
+    def test_rolls_back_on_release(self, app):
+        """Does not return connections to the pool mid-transaction."""
+        pool = ConnectionPool({'uri': app.config['SQLALCHEMY_DATABASE_URI']}, max_size=1, max_idle_seconds=60)
+        with get_psycopg_cursor(autocommit=False, pool=pool) as cursor:
+            cursor.execute('SELECT 1')
+        with get_psycopg_cursor(pool=pool) as cursor:
+            assert cursor.connection.get_transaction_status() == 0
+            assert cursor.connection.autocommit is True
+        pool.close_all()
@@ -0,0 +1,49 @@
+"""
+Copyright ©2019. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from nessie.externals import rds
+from nessie.lib import metadata
+
+
+class TestMergedEnrollmentTermJobQueue:
+
+    def test_notifies_on_queue_and_status_update(self, app, metadata_db):
+        """Notifies listening workers of queued jobs, and the master job of status updates."""
+        with rds.notification_listener(metadata.merged_enrollment_term_job_channel(), fallback_interval=1) as job_listener:
+            with rds.notification_listener(metadata.merged_enrollment_term_status_channel(), fallback_interval=1) as status_listener:
+                assert metadata.queue_merged_enrollment_term_jobs('generate_feeds_123', ['2178', '2182'])
+                assert job_listener.wait(5) == ['generate_feeds_123']
+
+                job = metadata.poll_merged_enrollment_term_job_queue()
+                assert job['master_job_id'] == 'generate_feeds_123'
+                metadata.update_merged_enrollment_term_job_status(job['id'], 'success', 'Generated merged feeds.')
+                assert status_listener.wait(5) == ['generate_feeds_123']
+                statuses = [row['status'] for row in metadata.get_merged_enrollment_term_job_status('generate_feeds_123')]
+                assert sorted(statuses) == ['created', 'success']
+
+    def test_listener_times_out(self, app, metadata_db):
+        """Returns no payloads when nothing is queued before timeout."""
+        with rds.notification_listener(metadata.merged_enrollment_term_job_channel(), fallback_interval=1) as listener:
+            assert listener.wait(0.1) == []
@@ -0,0 +1,77 @@
+"""
+Copyright ©2019. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from nessie.lib.query_cache import bump_epoch, cached_query, clear_query_cache
+from tests.util import override_config
+
+
+class TestQueryCache:
+
+    def test_cached_until_epoch_bumped(self, app):
+        """Reuses results until the epoch is bumped."""
+        calls = []
+
+        @cached_query('test_population')
+        def get_sids():
+            calls.append(1)
+            return [{'sid': '11667051'}]
+
+        clear_query_cache()
+        with override_config(app, 'QUERY_CACHE_TTL_SECONDS', 60):
+            assert get_sids() == [{'sid': '11667051'}]
+            assert get_sids() == [{'sid': '11667051'}]
+            assert len(calls) == 1
+            bump_epoch('test_population')
+            get_sids()
+            assert len(calls) == 2
+
+    def test_failures_not_cached(self, app):
+        """Does not cache a failed query."""
+        calls = []
+
+        @cached_query('test_failure')
+        def get_sids():
+            calls.append(1)
+            return None
+
+        clear_query_cache()
+        with override_config(app, 'QUERY_CACHE_TTL_SECONDS', 60):
+            assert get_sids() is None
+            assert get_sids() is None
+            assert len(calls) == 2
+
+    def test_disabled(self, app):
+        """Runs the query on every call when the TTL is zero."""
+        calls = []
+
+        @cached_query('test_disabled')
+        def get_sids():
+            calls.append(1)
+            return []
+
+        with override_config(app, 'QUERY_CACHE_TTL_SECONDS', 0):
+            get_sids()
+            get_sids()
+            assert len(calls) == 2
@@ -0,0 +1,58 @@
+"""
+Copyright ©2019. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from nessie.lib.query_metrics import fingerprint_sql, get_query_metrics, record_query, reset_query_metrics
+
+
+class TestQueryMetrics:
+
+    def test_fingerprint_sql(self):
+        """Normalizes literals, comments and whitespace."""
+        sql = """SELECT * FROM student.student_profiles -- all profiles
+            WHERE sid = ANY('{11667051,2345678901}') AND units IN (1, 2.5)  LIMIT 10"""
+        assert fingerprint_sql(sql) == 'select * from student.student_profiles where sid = any(?) and units in (?) limit ?'
+        assert fingerprint_sql("SELECT 'it''s'") == 'select ?'
+        assert fingerprint_sql('SELECT sid FROM nessie_sids_0123456789abcdef0123456789abcdef') == 'select sid from nessie_sids_?'
+
+    def test_record_query(self):
+        """Aggregates calls under a fingerprint."""
+        reset_query_metrics()
+        record_query('redshift', 'SELECT 1', 0.5, rows=1)
+        record_query('redshift', 'select  2', 1.5, rows=-1)
+        record_query('redshift', 'SELECT 3', 0.25, error=True)
+        record_query('rds', 'SELECT 1', 0.1, rows=1)
+        metrics = get_query_metrics()
+        assert len(metrics) == 2
+        assert metrics[0] == {
+            'database': 'redshift',
+            'fingerprint': 'select ?',
+            'calls': 3,
+            'errors': 1,
+            'rows': 1,
+            'total_seconds': 2.25,
+            'max_seconds': 1.5,
+        }
+        reset_query_metrics()
+        assert get_query_metrics() == []
@@ -0,0 +1,50 @@
+"""
+Copyright ©2019. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from nessie.externals import rds
+from nessie.lib.rds_delta import _row_hash_sql, changed_sids_union
+
+
+class TestRdsDelta:
+
+    def test_row_hash(self, app):
+        """Hashes rows so that NULLs, empty strings and booleans are told apart."""
+        row_hash = _row_hash_sql([('sid', 'VARCHAR'), ('gpa', 'NUMERIC'), ('transfer', 'BOOLEAN')])
+        rows = rds.fetch(
+            f"""SELECT sid, {row_hash} AS row_hash
+            FROM (VALUES ('1', 3.5, TRUE), ('2', 3.5, FALSE), ('3', 3.5, NULL), ('4', NULL, NULL), ('', NULL, NULL), (NULL, NULL, NULL))
+            AS t (sid, gpa, transfer)""",
+        )
+        hashes = [row['row_hash'] for row in rows]
+        assert len(set(hashes)) == 6
+        assert rds.fetch(f"SELECT {row_hash} AS row_hash FROM (VALUES ('1', 3.5, TRUE)) AS t (sid, gpa, transfer)")[0]['row_hash'] == hashes[0]
+
+    def test_changed_sids_union(self):
+        """Combines changed SIDs across tables, unless any table was reloaded."""
+        academic_status = {'inserted': ['3'], 'updated': ['1'], 'deleted': [], 'reloaded': False}
+        profiles = {'inserted': ['3'], 'updated': ['2'], 'deleted': ['4'], 'reloaded': False}
+        assert changed_sids_union(academic_status, profiles) == ['1', '2', '3', '4']
+        assert changed_sids_union({'inserted': [], 'updated': [], 'deleted': [], 'reloaded': False}) == []
+        assert changed_sids_union(academic_status, dict(profiles, reloaded=True)) is None
@@ -24,14 +24,34 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 
 from datetime import datetime
+import math
 
 import mock
 from nessie.lib import util
+import numpy
 
 
 class TestUtil:
     """Generic utilities."""
 
+    def test_columns_from_rows(self):
+        """Converts row dicts to typed column arrays."""
+        columns = util.columns_from_rows(
+            [{'id': 1, 'score': 2.5, 'name': 'a'}, {'id': 2, 'score': None}],
+            {'id': 'int64', 'score': 'float64', 'name': object},
+        )
+        assert columns['id'].dtype == numpy.int64
+        assert columns['id'].tolist() == [1, 2]
+        assert columns['score'][0] == 2.5
+        assert math.isnan(columns['score'][1])
+        assert columns['name'].tolist() == ['a', None]
+
+    def test_group_offsets(self):
+        """Finds the boundaries of runs of equal keys."""
+        assert util.group_offsets(numpy.array([7, 7, 8, 9, 9, 9])).tolist() == [0, 2, 3, 6]
+        assert util.group_offsets(numpy.array([7])).tolist() == [0, 1]
+        assert util.group_offsets(numpy.array([])).tolist() == [0]
+
     def test_vacuum_whitespace(self):
         """Cleans up leading, trailing, and repeated whitespace."""
         assert util.vacuum_whitespace('  Firstname    Lastname   ') == 'Firstname Lastname'
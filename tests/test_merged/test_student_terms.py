@@ -23,7 +23,13 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
-from nessie.merged.student_terms import generate_student_term_maps, merge_enrollment
+from nessie.externals import s3
+from nessie.jobs.background_job import BackgroundJobError
+from nessie.lib import queries
+from nessie.merged.student_terms import generate_student_term_maps, get_student_term_map_items, merge_enrollment
+from nessie.merged.student_terms import merge_memberships_into_site_map, student_term_map_key
+import pytest
+from tests.util import mock_s3
 
 
 class TestMergedSisEnrollments:
@@ -69,6 +75,24 @@ class TestMergedSisEnrollments:
         assert (enrollments[2]['sections'][0]['canvasCourseIds']) == [7654323, 7654330]
         assert (enrollments[2]['sections'][1]['canvasCourseIds']) == [7654330]
 
+    def test_canvas_enrollments_failure(self, app, monkeypatch):
+        """Fails rather than merging a site map without Canvas enrollments."""
+        monkeypatch.setattr(queries, 'get_enrollment_columns_in_advisee_canvas_sites', lambda: None)
+        with pytest.raises(BackgroundJobError) as e:
+            merge_memberships_into_site_map({'2178': {7654320: {}}})
+        assert 'Failed to retrieve Canvas enrollments in advisee sites.' in str(e.value)
+
+    def test_term_map_items(self, app):
+        """Reads term maps in compressed line-delimited format, falling back to legacy JSON."""
+        enrollment_term_map = {self.oski_sid: {'termId': '2178', 'enrollments': []}}
+        with mock_s3(app):
+            s3.upload_json(enrollment_term_map, student_term_map_key('enrollment_term_map', '2178', legacy_json=True))
+            assert dict(get_student_term_map_items('enrollment_term_map', '2178')) == enrollment_term_map
+            records = [[self.oski_sid, {'termId': '2178', 'enrollments': [{'units': 4}]}]]
+            s3.upload_jsonl_gz(records, student_term_map_key('enrollment_term_map', '2178'))
+            assert dict(get_student_term_map_items('enrollment_term_map', '2178'))[self.oski_sid]['enrollments'] == [{'units': 4}]
+            assert get_student_term_map_items('enrollment_term_map', '2172') is None
+
     def test_reasonable_precision(self, app):
         enrollments = [
             {
@@ -0,0 +1,91 @@
+"""
+Copyright ©2019. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import logging
+
+from nessie.externals import redshift, s3
+from nessie.jobs.background_job import BackgroundJobError
+from nessie.models import student_schema
+import pytest
+from tests.util import capture_app_logs, mock_s3, override_config
+
+
+def get_rows(schema, table):
+    return redshift.fetch(f'SELECT * FROM {schema}.{table} ORDER BY sid')
+
+
+def stage_row(schema, table, sid, feed):
+    redshift.execute(f'INSERT INTO {schema}_staging.{table} VALUES (%s, %s)', params=(sid, feed))
+
+
+class TestStudentSchema:
+
+    def test_swap_all_from_staging(self, app, student_tables):
+        """Swaps in every table built from staging together, leaving staging tables empty."""
+        schema = app.config['REDSHIFT_SCHEMA_STUDENT']
+        stage_row(schema, 'student_profiles', '11667051', '{"swapped": true}')
+        stage_row(schema, 'student_holds', '11667051', '{"swapped": true}')
+
+        student_schema.refresh_all_from_staging(['student_profiles', 'student_holds'])
+
+        for table in ['student_profiles', 'student_holds']:
+            assert [row['sid'] for row in get_rows(schema, table)] == ['11667051']
+            assert get_rows(f'{schema}_staging', table) == []
+        leftover_tables = redshift.fetch(
+            'SELECT table_name FROM information_schema.tables WHERE table_schema = %s AND table_name ~ %s',
+            params=(schema, '_(shadow|retired)$'),
+        )
+        assert leftover_tables == []
+
+    def test_swap_all_from_staging_failure(self, app, student_tables):
+        """Swaps in no table if any table fails to build from staging."""
+        schema = app.config['REDSHIFT_SCHEMA_STUDENT']
+        profiles = get_rows(schema, 'student_profiles')
+        stage_row(schema, 'student_profiles', '11667051', '{"swapped": true}')
+
+        with pytest.raises(BackgroundJobError):
+            student_schema.swap_all_from_staging(['student_profiles', 'student_nonexistents'])
+        assert get_rows(schema, 'student_profiles') == profiles
+
+    def test_vacuum_and_analyze(self, app, caplog, student_tables):
+        """Vacuums and analyzes only the given tables."""
+        caplog.set_level(logging.INFO)
+        with capture_app_logs(app):
+            student_schema.vacuum_and_analyze(['student_profiles', 'student_holds'])
+        assert 'Failed to vacuum and analyze' not in caplog.text
+        assert f"Vacuumed and analyzed 2 tables in {app.config['REDSHIFT_SCHEMA_STUDENT']}." in caplog.text
+
+    def test_s3_row_sink(self, app):
+        """Streams rows to one S3 part at a time, beginning the next part once the current one is full."""
+        rows = [f'{sid}\tprofile'.encode() for sid in range(10000000, 10000005)]
+        with mock_s3(app), override_config(app, 'STAGING_ROW_SINK', 's3'), override_config(app, 'STAGING_S3_PART_SIZE', 34):
+            row_sink = student_schema.get_row_sink('student_profiles')
+            for row in rows:
+                row_sink.append(row)
+            part_keys = row_sink.upload()
+            assert len(row_sink) == 5
+            assert part_keys == [student_schema.staging_s3_stem('student_profiles') + f'_{part:04}.tsv.gz' for part in range(3)]
+            assert s3.get_unzipped_text_reader(part_keys[0]).read() == '10000000\tprofile\n10000001\tprofile\n'
+            assert s3.get_unzipped_text_reader(part_keys[2]).read() == '10000004\tprofile\n'
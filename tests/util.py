@@ -30,7 +30,7 @@ import logging
 
 import boto3
 import moto
-from nessie.externals import rds
+from nessie.externals import aws, rds
 
 
 @contextmanager
@@ -48,10 +48,15 @@ def capture_app_logs(app):
 
 @contextmanager
 def mock_s3(app, bucket=None):
-    with moto.mock_s3(), moto.mock_sts():
-        s3 = boto3.resource('s3', app.config['LOCH_S3_REGION'])
-        s3.create_bucket(Bucket=bucket or app.config['LOCH_S3_BUCKET'])
-        yield s3
+    # Clients cached outside the mock, or holding mock credentials, must not be reused.
+    aws.clear_cache()
+    try:
+        with moto.mock_s3(), moto.mock_sts():
+            s3 = boto3.resource('s3', app.config['LOCH_S3_REGION'])
+            s3.create_bucket(Bucket=bucket or app.config['LOCH_S3_BUCKET'])
+            yield s3
+    finally:
+        aws.clear_cache()
 
 
 @contextmanager